@@ -0,0 +1,33 @@
+"""add_stats_aggregation_watermarks
+
+Revision ID: 5c0e7a4d9f21
+Revises: b1ffc21e29a4
+Create Date: 2026-10-16 14:37:05.118202
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0e7a4d9f21'
+down_revision: Union[str, None] = 'b1ffc21e29a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Persisted high-water marks for incremental PromptStats aggregation
+    op.create_table(
+        'stats_aggregation_watermarks',
+        sa.Column('period_type', sa.String(20), nullable=False),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('period_type'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_aggregation_watermarks')
@@ -0,0 +1,129 @@
+"""partition_product_api_logs_and_prompt_events
+
+Revision ID: a4f8c2d6e1b3
+Revises: e7d4b2a91c38
+Create Date: 2026-10-16 17:21:09.342871
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f8c2d6e1b3'
+down_revision: Union[str, None] = 'e7d4b2a91c38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of now; the scheduler keeps extending this (PARTITION_PRECREATE_MONTHS)
+PRECREATE_MONTHS = 3
+
+FOREIGN_KEYS = {
+    'product_api_logs': [
+        ('api_key_id', 'product_api_keys', None),
+        ('prompt_id', 'prompts', None),
+        ('prompt_version_id', 'prompt_versions', None),
+    ],
+    'prompt_events': [
+        ('workspace_id', 'workspaces', 'CASCADE'),
+        ('prompt_id', 'prompts', None),
+        ('prompt_version_id', 'prompt_versions', None),
+    ],
+}
+
+INDEXES = {
+    'product_api_logs': [
+        ('ix_product_api_logs_id', ['id']),
+        ('ix_product_api_logs_api_key_id', ['api_key_id']),
+        ('ix_product_api_logs_request_id', ['request_id']),
+        ('ix_product_api_logs_trace_id', ['trace_id']),
+        ('ix_product_api_logs_prompt_id', ['prompt_id']),
+        ('ix_product_api_logs_prompt_version_id', ['prompt_version_id']),
+        ('ix_product_api_logs_created_at', ['created_at']),
+    ],
+    'prompt_events': [
+        ('ix_prompt_events_trace_id', ['trace_id']),
+        ('idx_events_workspace_created', ['workspace_id', 'created_at']),
+        ('idx_events_prompt_outcome', ['prompt_id', 'outcome', 'created_at']),
+    ],
+}
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def _month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _partition_table(table: str) -> None:
+    """Swap table for a monthly RANGE (created_at) partitioned copy holding the same rows"""
+    legacy = f'{table}_unpartitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+    op.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey')
+
+    # The partition key must be set, and be part of the primary key
+    op.execute(f'UPDATE {legacy} SET created_at = now() WHERE created_at IS NULL')
+    op.execute(f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL')
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()")
+    op.create_primary_key(f'{table}_pkey', table, ['id', 'created_at'])
+    for column, referred_table, ondelete in FOREIGN_KEYS[table]:
+        op.create_foreign_key(f'{table}_{column}_fkey', table, referred_table, [column], ['id'], ondelete=ondelete)
+
+    # One partition per month from the oldest row up to PRECREATE_MONTHS ahead
+    oldest = op.get_bind().execute(sa.text(f'SELECT min(created_at) FROM {legacy}')).scalar()
+    now = datetime.now(timezone.utc)
+    month = _month_start(min(oldest, now) if oldest else now)
+    last = _add_months(_month_start(now), PRECREATE_MONTHS)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+    op.execute(f'DROP TABLE {legacy}')
+
+    # Indexes on the parent are created on every partition
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False)
+
+
+def _unpartition_table(table: str) -> None:
+    partitioned = f'{table}_partitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+    op.execute(f'ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey')
+    for name, _ in INDEXES[table]:
+        op.execute(f'ALTER INDEX {name} RENAME TO {name}_partitioned')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {partitioned} INCLUDING DEFAULTS)')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned}')
+    op.execute(f'DROP TABLE {partitioned} CASCADE')
+
+    op.create_primary_key(f'{table}_pkey', table, ['id'])
+    for column, referred_table, ondelete in FOREIGN_KEYS[table]:
+        op.create_foreign_key(f'{table}_{column}_fkey', table, referred_table, [column], ['id'], ondelete=ondelete)
+    # request_id stays non-unique: duplicates may have been logged while partitioned
+    for name, columns in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False)
+
+
+def upgrade() -> None:
+    # Monthly range partitions on created_at: time-window queries prune to the months they
+    # touch and retention drops whole partitions (app/services/partitions.py).
+    # Rows are copied once; on very large tables run this in a maintenance window.
+    _partition_table('product_api_logs')
+    _partition_table('prompt_events')
+
+
+def downgrade() -> None:
+    _unpartition_table('prompt_events')
+    _unpartition_table('product_api_logs')
@@ -0,0 +1,36 @@
+"""add_unique_user_date_to_user_api_usage
+
+Revision ID: b1ffc21e29a4
+Revises: 138e74552494
+Create Date: 2026-10-16 10:12:41.203518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1ffc21e29a4'
+down_revision: Union[str, None] = '138e74552494'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Merge duplicate (user_id, date) rows, keeping the highest count
+    op.execute("""
+        DELETE FROM user_api_usage a
+        USING user_api_usage b
+        WHERE a.user_id = b.user_id
+          AND a.date = b.date
+          AND (a.api_requests_count, a.id::text) < (b.api_requests_count, b.id::text)
+    """)
+
+    # One row per user per day, so quota flushes can upsert
+    op.create_unique_constraint('uq_user_api_usage_user_date', 'user_api_usage', ['user_id', 'date'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_user_api_usage_user_date', 'user_api_usage', type_='unique')
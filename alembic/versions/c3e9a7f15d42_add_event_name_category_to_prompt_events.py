@@ -0,0 +1,64 @@
+"""add_event_name_category_to_prompt_events
+
+Revision ID: c3e9a7f15d42
+Revises: a4f8c2d6e1b3
+Create Date: 2026-10-16 19:40:12.518264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e9a7f15d42'
+down_revision: Union[str, None] = 'a4f8c2d6e1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Promote the custom event name/category out of event_metadata
+    op.add_column('prompt_events', sa.Column('event_name', sa.String(length=100), nullable=True))
+    op.add_column('prompt_events', sa.Column('category', sa.String(length=100), nullable=True))
+    op.execute("""
+        UPDATE prompt_events
+        SET event_name = event_metadata->>'event_name',
+            category = event_metadata->>'category'
+        WHERE event_metadata ? 'event_name' OR event_metadata ? 'category'
+    """)
+    op.create_index(
+        'idx_events_workspace_name_created', 'prompt_events',
+        ['workspace_id', 'event_name', 'category', 'created_at'], unique=False
+    )
+
+    # Unique (trace_id, event_name, category) lives in a separate table: a unique index on
+    # the partitioned prompt_events would have to include the partition key created_at
+    op.create_table(
+        'prompt_event_keys',
+        sa.Column('trace_id', sa.String(length=100), nullable=False),
+        sa.Column('event_name', sa.String(length=100), nullable=False),
+        sa.Column('category', sa.String(length=100), nullable=False),
+        sa.Column('event_id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('trace_id', 'event_name', 'category')
+    )
+    op.create_index('idx_event_keys_created', 'prompt_event_keys', ['created_at'], unique=False)
+
+    # Existing duplicates stay in prompt_events; the earliest event of each key owns it
+    op.execute("""
+        INSERT INTO prompt_event_keys (trace_id, event_name, category, event_id, created_at)
+        SELECT DISTINCT ON (trace_id, event_name, category) trace_id, event_name, category, id, created_at
+        FROM prompt_events
+        WHERE event_name IS NOT NULL AND category IS NOT NULL
+        ORDER BY trace_id, event_name, category, created_at, id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_event_keys_created', table_name='prompt_event_keys')
+    op.drop_table('prompt_event_keys')
+    op.drop_index('idx_events_workspace_name_created', table_name='prompt_events')
+    op.drop_column('prompt_events', 'category')
+    op.drop_column('prompt_events', 'event_name')
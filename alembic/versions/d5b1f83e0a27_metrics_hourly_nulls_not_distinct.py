@@ -0,0 +1,96 @@
+"""metrics_hourly_nulls_not_distinct
+
+Revision ID: d5b1f83e0a27
+Revises: c3e9a7f15d42
+Create Date: 2026-10-16 21:05:44.103672
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b1f83e0a27'
+down_revision: Union[str, None] = 'c3e9a7f15d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OLD_CONSTRAINT = 'prompt_metrics_hourly_workspace_id_prompt_id_prompt_version_key'
+NEW_CONSTRAINT = 'uq_metrics_hourly_bucket'
+
+
+def upgrade() -> None:
+    # Merge buckets that were created twice; with NULL prompt/version ids the old
+    # constraint never matched, so concurrent select-or-create could duplicate them
+    op.execute("""
+        WITH ranked AS (
+            SELECT id,
+                   first_value(id) OVER w AS keep_id,
+                   row_number() OVER w AS rn
+            FROM prompt_metrics_hourly
+            WINDOW w AS (PARTITION BY workspace_id, prompt_id, prompt_version_id, hour_bucket
+                         ORDER BY created_at, id)
+        ),
+        merged AS (
+            SELECT r.keep_id,
+                   sum(m.total_requests) AS total_requests,
+                   sum(m.successful_outcomes) AS successful_outcomes,
+                   sum(m.failed_outcomes) AS failed_outcomes,
+                   sum(m.partial_outcomes) AS partial_outcomes,
+                   sum(m.abandoned_outcomes) AS abandoned_outcomes,
+                   sum(m.total_revenue) AS total_revenue,
+                   sum(m.total_value) AS total_value,
+                   sum(m.conversion_count) AS conversion_count,
+                   max(m.unique_users) AS unique_users,
+                   sum(m.token_cost) AS token_cost,
+                   sum(m.error_count) AS error_count
+            FROM ranked r
+            JOIN prompt_metrics_hourly m ON m.id = r.id
+            GROUP BY r.keep_id
+            HAVING count(*) > 1
+        )
+        UPDATE prompt_metrics_hourly m
+        SET total_requests = merged.total_requests,
+            successful_outcomes = merged.successful_outcomes,
+            failed_outcomes = merged.failed_outcomes,
+            partial_outcomes = merged.partial_outcomes,
+            abandoned_outcomes = merged.abandoned_outcomes,
+            total_revenue = merged.total_revenue,
+            total_value = merged.total_value,
+            conversion_count = merged.conversion_count,
+            unique_users = merged.unique_users,
+            token_cost = merged.token_cost,
+            error_count = merged.error_count
+        FROM merged
+        WHERE m.id = merged.keep_id
+    """)
+    op.execute("""
+        DELETE FROM prompt_metrics_hourly m
+        USING (
+            SELECT id, row_number() OVER (
+                PARTITION BY workspace_id, prompt_id, prompt_version_id, hour_bucket
+                ORDER BY created_at, id
+            ) AS rn
+            FROM prompt_metrics_hourly
+        ) ranked
+        WHERE m.id = ranked.id AND ranked.rn > 1
+    """)
+
+    # One row per bucket even when prompt_id / prompt_version_id are NULL, so the
+    # event pipeline can upsert with ON CONFLICT (PostgreSQL 15+)
+    op.drop_constraint(OLD_CONSTRAINT, 'prompt_metrics_hourly', type_='unique')
+    op.create_unique_constraint(
+        NEW_CONSTRAINT, 'prompt_metrics_hourly',
+        ['workspace_id', 'prompt_id', 'prompt_version_id', 'hour_bucket'],
+        postgresql_nulls_not_distinct=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint(NEW_CONSTRAINT, 'prompt_metrics_hourly', type_='unique')
+    op.create_unique_constraint(
+        OLD_CONSTRAINT, 'prompt_metrics_hourly',
+        ['workspace_id', 'prompt_id', 'prompt_version_id', 'hour_bucket']
+    )
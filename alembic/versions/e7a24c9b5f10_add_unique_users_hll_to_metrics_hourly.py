@@ -0,0 +1,27 @@
+"""add_unique_users_hll_to_metrics_hourly
+
+Revision ID: e7a24c9b5f10
+Revises: d5b1f83e0a27
+Create Date: 2026-10-16 22:18:07.642915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a24c9b5f10'
+down_revision: Union[str, None] = 'd5b1f83e0a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing buckets keep their unique_users count; they have no registers to merge
+    op.add_column('prompt_metrics_hourly', sa.Column('unique_users_hll', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('prompt_metrics_hourly', 'unique_users_hll')
@@ -0,0 +1,29 @@
+"""add_latency_sketch_to_prompt_stats
+
+Revision ID: e7d4b2a91c38
+Revises: 5c0e7a4d9f21
+Create Date: 2026-10-16 16:02:48.574113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d4b2a91c38'
+down_revision: Union[str, None] = '5c0e7a4d9f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Mergeable latency quantile sketch per aggregated period
+    # (rows aggregated before this migration get one when re-aggregated, e.g. with --historical)
+    op.add_column('prompt_stats', sa.Column('latency_sketch', postgresql.JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('prompt_stats', 'latency_sketch')
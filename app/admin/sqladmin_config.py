@@ -18,6 +18,7 @@ from sqlalchemy.orm import selectinload, aliased
 from app.core.database import sync_engine, SyncSessionLocal
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
+from app.core.product_auth import invalidate_request_principal
 from app.models.user import User
 from app.models.workspace import Workspace
 from app.models.prompt import Prompt, PromptVersion, Tag
@@ -160,7 +161,10 @@ class UserAdmin(ModelView, model=User):
                 session.refresh(user)
                 return user
 
-        return await run_in_threadpool(_update_sync)
+        user = await run_in_threadpool(_update_sync)
+        # Activation / superuser changes must reach API keys cached by every worker
+        await invalidate_request_principal(user_id=pk)
+        return user
 
     async def delete_model(self, request: Request, pk: str) -> bool:
         """Custom delete method to handle workspace ownership transfer before user deletion."""
@@ -232,7 +236,10 @@ class UserAdmin(ModelView, model=User):
                 return True
 
         try:
-            return await run_in_threadpool(_delete_sync)
+            deleted = await run_in_threadpool(_delete_sync)
+            if deleted:
+                await invalidate_request_principal(user_id=pk)
+            return deleted
         except ValueError as e:
             # Re-raise ValueError to show an error message in admin interface
             raise e
@@ -647,6 +654,12 @@ class ProductAPIKeyAdmin(ModelView, model=ProductAPIKey):
     page_size = 25
     page_size_options = [10, 25, 50, 100]
 
+    async def after_model_change(self, data: dict, model: ProductAPIKey, is_created: bool, request: Request) -> None:
+        await invalidate_request_principal(model.key_hash)
+
+    async def after_model_delete(self, model: ProductAPIKey, request: Request) -> None:
+        await invalidate_request_principal(model.key_hash)
+
     def scaffold_list_query(self):
         """Custom list query that includes user for searching"""
         return (
@@ -767,6 +780,13 @@ class GlobalLimitsAdmin(ModelView, model=GlobalLimits):
     page_size = 25
     page_size_options = [10, 25, 50, 100]
 
+    async def after_model_change(self, data: dict, model: GlobalLimits, is_created: bool, request: Request) -> None:
+        # Default daily limits apply to every user without own limits
+        await invalidate_request_principal()
+
+    async def after_model_delete(self, model: GlobalLimits, request: Request) -> None:
+        await invalidate_request_principal()
+
 
 class UserLimitsAdmin(ModelView, model=UserLimits):
     """Admin interface for User Limits"""
@@ -810,6 +830,12 @@ class UserLimitsAdmin(ModelView, model=UserLimits):
     page_size = 25
     page_size_options = [10, 25, 50, 100]
 
+    async def after_model_change(self, data: dict, model: UserLimits, is_created: bool, request: Request) -> None:
+        await invalidate_request_principal(user_id=model.user_id)
+
+    async def after_model_delete(self, model: UserLimits, request: Request) -> None:
+        await invalidate_request_principal(user_id=model.user_id)
+
     def scaffold_list_query(self):
         """Custom list query that includes user for searching"""
         return (
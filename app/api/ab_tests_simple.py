@@ -12,6 +12,7 @@ from app.models.prompt import Prompt, PromptVersion
 from app.models.user import User
 from app.core.database import get_session as get_db
 from app.core.auth import get_current_user
+from app.services.ab_testing import ab_test_assigner
 
 router = APIRouter(prefix="/ab-tests-simple", tags=["ab-tests-simple"])
 
@@ -232,6 +233,7 @@ async def start_test_ab_test(
 
         await db.commit()
         await db.refresh(ab_test)
+        await ab_test_assigner.invalidate(ab_test.prompt_id)
 
         return {
             "id": str(ab_test.id),
@@ -269,6 +271,7 @@ async def stop_test_ab_test(
 
         await db.commit()
         await db.refresh(ab_test)
+        await ab_test_assigner.invalidate(ab_test.prompt_id)
 
         return {
             "id": str(ab_test.id),
@@ -306,6 +309,7 @@ async def complete_test_ab_test(
 
         await db.commit()
         await db.refresh(ab_test)
+        await ab_test_assigner.invalidate(ab_test.prompt_id)
 
         return {
             "id": str(ab_test.id),
@@ -337,6 +341,7 @@ async def delete_test_ab_test(
 
         await db.delete(ab_test)
         await db.commit()
+        await ab_test_assigner.invalidate(ab_test.prompt_id)
 
         return {"message": "A/B test deleted successfully"}
     except HTTPException:
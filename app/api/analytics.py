@@ -438,8 +438,8 @@ async def debug_monthly_events(
     start_date = end_date - timedelta(days=30)
 
     # Same query as in get_monthly_events_chart_data
-    event_name_field = func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown')
-    category_field = func.coalesce(PromptEvent.event_metadata['category'].astext, 'general')
+    event_name_field = func.coalesce(PromptEvent.event_name, 'unknown')
+    category_field = func.coalesce(PromptEvent.category, 'general')
     date_field = func.date(PromptEvent.created_at)
 
     events_data = await db.execute(
@@ -513,7 +513,7 @@ async def debug_buy_events(
         ).where(
             and_(
                 PromptEvent.workspace_id == workspace_id,
-                PromptEvent.event_metadata['event_name'].astext == 'buy'
+                PromptEvent.event_name == 'buy'
             )
         ).order_by(PromptEvent.created_at.desc())
     )
@@ -16,6 +16,7 @@ from app.models.workspace import Workspace
 from app.models.prompt import Prompt, PromptVersion, Tag, prompt_tags
 from app.models.llm import UserAPIKey
 from app.core.auth import get_current_user as get_authenticated_user
+from app.core.product_auth import invalidate_request_principal
 from app.core.config import settings
 import httpx
 
@@ -474,6 +475,7 @@ async def delete_account(
 
         # Commit all changes
         await session.commit()
+        await invalidate_request_principal(user_id=current_user.id)
 
         return {"message": "Account successfully deleted"}
 
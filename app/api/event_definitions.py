@@ -11,6 +11,7 @@ from app.models.analytics import EventDefinition
 from app.models.user import User
 from app.core.database import get_session as get_db
 from app.core.auth import get_current_user
+from app.services.event_registry import event_registry
 
 class EventDefinitionRequest(BaseModel):
     event_name: str
@@ -124,6 +125,7 @@ async def create_event_definition(
         db.add(definition)
         await db.commit()
         await db.refresh(definition)
+        await event_registry.invalidate(workspace_id)
 
         print(f"[EVENT_DEF] Created successfully: {definition.id}")
 
@@ -197,6 +199,7 @@ async def update_event_definition(
 
     await db.commit()
     await db.refresh(definition)
+    await event_registry.invalidate(workspace_id)
 
     return {"id": str(definition.id), "status": "updated"}
 
@@ -217,6 +220,7 @@ async def delete_event_definition(
 
     await db.delete(definition)
     await db.commit()
+    await event_registry.invalidate(workspace_id)
 
     return {"id": str(definition.id), "status": "deleted"}
 
@@ -1,14 +1,19 @@
 import json
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+import uuid
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import select, insert, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.analytics import PromptEvent, EventDefinition
-from app.services.analytics import process_event
+from app.models.analytics import PromptEvent, PromptEventKey
+from app.services.event_pipeline import event_pipeline
+from app.services.event_registry import event_registry
 from app.services.redis import redis_client
+from app.services.trace_ids import is_signed_trace_id, trace_id_codec
+from app.core.config import settings
 from app.core.database import get_session as get_db
 
 
@@ -20,6 +25,132 @@ def get_api_key():
 
 router = APIRouter()
 
+# Events whose trace is unknown are recorded in the test workspace
+TEST_WORKSPACE_ID = UUID("b6fc15b6-9ee7-448a-ae2d-0ef6a624bda7")
+
+
+def parse_trace_context(trace_data: Optional[str]) -> Tuple[UUID, Optional[UUID], Optional[UUID]]:
+    """(workspace_id, prompt_id, prompt_version_id) of a legacy trace stored by get-prompt"""
+    if not trace_data:
+        # For testing purposes, use the test workspace
+        # In production, this should be a real trace_id from prompt API
+        return TEST_WORKSPACE_ID, None, None
+
+    trace_context = json.loads(trace_data)
+    return (
+        UUID(trace_context["workspace_id"]),
+        UUID(trace_context["prompt_id"]),
+        UUID(trace_context.get("prompt_version_id")) if trace_context.get("prompt_version_id") else None
+    )
+
+
+INVALID_TRACE_ID = "invalid trace_id"
+
+
+async def resolve_traces(
+        trace_ids: List[str]
+) -> Dict[str, Optional[Tuple[UUID, Optional[UUID], Optional[UUID]]]]:
+    """
+    (workspace_id, prompt_id, prompt_version_id) of each trace ID. Signed IDs are
+    verified locally (None if the signature does not match: the event is refused);
+    legacy evt_ IDs are looked up in Redis with one MGET.
+    """
+    traces = {}
+    legacy = []
+    for trace_id in trace_ids:
+        if is_signed_trace_id(trace_id):
+            traces[trace_id] = trace_id_codec.decode(trace_id)
+        else:
+            legacy.append(trace_id)
+
+    if legacy:
+        values = await redis_client.mget([f"trace:{trace_id}" for trace_id in legacy])
+        for trace_id, value in zip(legacy, values):
+            traces[trace_id] = parse_trace_context(value)
+    return traces
+
+
+def build_event_row(
+        event: "EventRequest",
+        trace: Tuple[UUID, Optional[UUID], Optional[UUID]],
+        created_at: datetime
+) -> Dict[str, Any]:
+    """prompt_events row of a custom event"""
+    workspace_id, prompt_id, prompt_version_id = trace
+    return {
+        "id": uuid.uuid4(),
+        "workspace_id": workspace_id,
+        "trace_id": event.trace_id,
+        "prompt_id": prompt_id,
+        "prompt_version_id": prompt_version_id,
+        "event_type": "custom_event",
+        "event_name": event.event_name,
+        "category": event.category,
+        "outcome": "success",  # Default outcome for custom events
+        "session_id": event.fields.get("session_id"),
+        "user_id": event.fields.get("user_id"),
+        "event_metadata": {
+            "event_name": event.event_name,
+            "category": event.category,
+            "fields": event.fields
+        },
+        "business_metrics": event.fields.get("business_metrics"),
+        "error_details": None,
+        "created_at": created_at
+    }
+
+
+async def insert_events(
+        db: AsyncSession,
+        rows: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[Tuple[str, str, str], Tuple[UUID, datetime]]]:
+    """
+    Insert custom events whose (trace_id, event_name, category) is not recorded yet.
+
+    Each key is claimed in prompt_event_keys with INSERT ... ON CONFLICT DO NOTHING,
+    so concurrent duplicates cannot both be written. Returns the inserted rows and the
+    recorded (event_id, created_at) of every key that already existed.
+    The caller commits.
+    """
+    claimed = await db.execute(
+        pg_insert(PromptEventKey)
+        .values([
+            {
+                "trace_id": row["trace_id"],
+                "event_name": row["event_name"],
+                "category": row["category"],
+                "event_id": row["id"],
+                "created_at": row["created_at"],
+            }
+            for row in rows
+        ])
+        .on_conflict_do_nothing()
+        .returning(PromptEventKey.event_id)
+    )
+    claimed_ids = set(claimed.scalars())
+
+    inserted = [row for row in rows if row["id"] in claimed_ids]
+    if inserted:
+        await db.execute(insert(PromptEvent), inserted)
+
+    existing = {}
+    duplicate_keys = [
+        (row["trace_id"], row["event_name"], row["category"]) for row in rows if row["id"] not in claimed_ids
+    ]
+    if duplicate_keys:
+        result = await db.execute(
+            select(
+                PromptEventKey.trace_id, PromptEventKey.event_name, PromptEventKey.category,
+                PromptEventKey.event_id, PromptEventKey.created_at
+            ).where(
+                tuple_(PromptEventKey.trace_id, PromptEventKey.event_name, PromptEventKey.category).in_(duplicate_keys)
+            )
+        )
+        existing = {(trace_id, event_name, category): (event_id, created_at)
+                    for trace_id, event_name, category, event_id, created_at in result}
+
+    return inserted, existing
+
 
 class EventRequest(BaseModel):
     trace_id: str = Field(..., description="Trace ID from prompt response")
@@ -36,7 +167,6 @@ class EventRequest(BaseModel):
 @router.post("/events")
 async def track_event(
         event: EventRequest,
-        background_tasks: BackgroundTasks,
         db: AsyncSession = Depends(get_db)
 ):
     """
@@ -61,30 +191,14 @@ async def track_event(
     """
 
     try:
-        # Get trace context from Redis
-        trace_data = await redis_client.get(f"trace:{event.trace_id}")
-        if not trace_data:
-            # For testing purposes, create a dummy workspace_id
-            # In production, this should be a real trace_id from prompt API
-            workspace_id = UUID("b6fc15b6-9ee7-448a-ae2d-0ef6a624bda7")  # Test workspace
-            prompt_id = None  # No prompt ID for standalone events
-            prompt_version_id = None
-        else:
-            trace_context = json.loads(trace_data)
-            workspace_id = UUID(trace_context["workspace_id"])
-            prompt_id = UUID(trace_context["prompt_id"])
-            prompt_version_id = UUID(trace_context.get("prompt_version_id")) if trace_context.get("prompt_version_id") else None
+        # Get trace context (from the signed trace ID, or from Redis for legacy IDs)
+        trace = (await resolve_traces([event.trace_id]))[event.trace_id]
+        if trace is None:
+            raise HTTPException(status_code=400, detail=INVALID_TRACE_ID)
+        workspace_id, prompt_id, prompt_version_id = trace
 
         # Validate against event definition
-        event_def = await db.execute(
-            select(EventDefinition).where(
-                EventDefinition.workspace_id == workspace_id,
-                EventDefinition.event_name == event.event_name,
-                EventDefinition.category == event.category,
-                EventDefinition.is_active == True
-            )
-        )
-        event_def = event_def.scalar_one_or_none()
+        event_def = await event_registry.get(db, workspace_id, event.event_name, event.category)
 
         if not event_def:
             raise HTTPException(
@@ -92,69 +206,36 @@ async def track_event(
                 detail=f"Event definition not found for event_name='{event.event_name}' and category='{event.category}'"
             )
 
-        # Validate required fields
-        required_fields = event_def.required_fields or []
-        for field_def in required_fields:
-            field_name = field_def.get("name")
-            if field_name not in event.fields:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Required field '{field_name}' is missing"
-                )
-
-        # Prepare event metadata
-        event_metadata = {
-            "event_name": event.event_name,
-            "category": event.category,
-            "fields": event.fields
-        }
+        # Validate fields
+        error = event_def.validate(event.fields)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
-        # Check if event with this trace_id + event_name + category already exists
-        existing_event = await db.execute(
-            select(PromptEvent).where(
-                PromptEvent.trace_id == event.trace_id,
-                PromptEvent.event_metadata['event_name'].astext == event.event_name,
-                PromptEvent.event_metadata['category'].astext == event.category
-            )
-        )
-        existing_event = existing_event.scalar_one_or_none()
+        # Insert unless trace_id + event_name + category is already recorded
+        row = build_event_row(event, (workspace_id, prompt_id, prompt_version_id), datetime.now(timezone.utc))
+        inserted, existing = await insert_events(db, [row])
+        await db.commit()
 
-        if existing_event:
-            # Return existing event instead of creating duplicate
-            prompt_event = existing_event
+        if inserted:
+            event_id, created_at = row["id"], row["created_at"]
+            # Process event asynchronously (aggregations, alerts, etc.)
+            await event_pipeline.publish(inserted)
         else:
-            # Create new event record
-            prompt_event = PromptEvent(
-                workspace_id=workspace_id,
-                trace_id=event.trace_id,
-                prompt_id=prompt_id,
-                prompt_version_id=prompt_version_id,
-                event_type="custom_event",
-                outcome="success",  # Default outcome for custom events
-                session_id=event.fields.get("session_id"),
-                user_id=event.fields.get("user_id"),
-                event_metadata=event_metadata,
-                business_metrics=event.fields.get("business_metrics"),
-                error_details=None,
-                created_at=datetime.now()
-            )
-
-            db.add(prompt_event)
-            await db.commit()
-
-        # Process event asynchronously (aggregations, alerts, etc.)
-        background_tasks.add_task(process_event, str(prompt_event.id), workspace_id)
+            # Return existing event instead of creating duplicate
+            event_id, created_at = existing[(event.trace_id, event.event_name, event.category)]
 
         return {
             "status": "success",
-            "event_id": str(prompt_event.id),
+            "event_id": str(event_id),
             "trace_id": event.trace_id,
             "event_name": event.event_name,
             "category": event.category,
-            "timestamp": prompt_event.created_at.isoformat(),
-            "is_duplicate": existing_event is not None
+            "timestamp": created_at.isoformat(),
+            "is_duplicate": not inserted
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"Error in track_event: {str(e)}")
@@ -162,3 +243,113 @@ async def track_event(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+
+
+
+class EventBatchRequest(BaseModel):
+    events: List[EventRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.EVENT_BATCH_MAX_SIZE,
+        description="Events to track, each validated and deduplicated like POST /events"
+    )
+
+
+@router.post("/events/batch")
+async def track_events_batch(
+        batch: EventBatchRequest,
+        db: AsyncSession = Depends(get_db)
+):
+    """
+    Track up to EVENT_BATCH_MAX_SIZE events in one call
+
+    Each event is validated and deduplicated (trace_id + event_name + category) like
+    POST /events. Invalid events do not fail the batch: the response carries one
+    result per event, in request order, with status "created", "duplicate" or "error".
+
+    Example request:
+    {
+        "events": [
+            {"trace_id": "evt_abc123_1634567890_xyz", "event_name": "user_signup",
+             "category": "user_lifecycle", "fields": {"user_id": "user123"}},
+            {"trace_id": "evt_def456_1634567891_abc", "event_name": "purchase",
+             "category": "revenue", "fields": {"user_id": "user456", "amount": 49}}
+        ]
+    }
+    """
+
+    try:
+        events = batch.events
+
+        # Resolve every distinct trace (legacy ones with one MGET)
+        traces = await resolve_traces(list(dict.fromkeys(event.trace_id for event in events)))
+
+        # Definitions of every workspace in the batch
+        definitions = {}
+        for trace in traces.values():
+            if trace is not None and trace[0] not in definitions:
+                definitions[trace[0]] = await event_registry.get_workspace(db, trace[0])
+
+        results = []
+        rows = {}
+        now = datetime.now(timezone.utc)
+        for index, event in enumerate(events):
+            if traces[event.trace_id] is None:
+                results.append({"index": index, "status": "error", "error": INVALID_TRACE_ID})
+                continue
+            workspace_id = traces[event.trace_id][0]
+
+            event_def = definitions[workspace_id].get((event.event_name, event.category))
+            if not event_def:
+                results.append({
+                    "index": index,
+                    "status": "error",
+                    "error": f"Event definition not found for event_name='{event.event_name}' and category='{event.category}'"
+                })
+                continue
+
+            error = event_def.validate(event.fields)
+            if error:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+
+            # Repeats within the batch resolve to the first occurrence
+            dedupe_key = (event.trace_id, event.event_name, event.category)
+            if dedupe_key not in rows:
+                rows[dedupe_key] = build_event_row(event, traces[event.trace_id], now)
+            results.append({"index": index, "dedupe_key": dedupe_key})
+
+        # One ON CONFLICT insert; keys already recorded return their existing event
+        inserted, existing = await insert_events(db, list(rows.values())) if rows else ([], {})
+        await db.commit()
+
+        reported = set()
+        for result in results:
+            dedupe_key = result.pop("dedupe_key", None)
+            if dedupe_key is None:
+                continue
+            if dedupe_key in existing:
+                result["status"] = "duplicate"
+                result["event_id"] = str(existing[dedupe_key][0])
+            else:
+                result["status"] = "duplicate" if dedupe_key in reported else "created"
+                result["event_id"] = str(rows[dedupe_key]["id"])
+                reported.add(dedupe_key)
+
+        # Process events asynchronously (aggregations, alerts, etc.)
+        await event_pipeline.publish(inserted)
+
+        return {
+            "status": "success",
+            "created": len(inserted),
+            "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+            "errors": sum(1 for result in results if result["status"] == "error"),
+            "timestamp": now.isoformat(),
+            "results": results
+        }
+
+    except Exception as e:
+        import traceback
+        print(f"Error in track_events_batch: {str(e)}")
+        print(f"Traceback: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -10,6 +10,7 @@ from app.core.database import get_session
 from app.models.product_api_key import ProductAPIKey, ProductAPILog
 from app.models.user import User
 from app.core.auth import get_current_user
+from app.core.product_auth import invalidate_request_principal
 from app.services.statistics import StatisticsService
 
 router = APIRouter(prefix="/keys-for-external-use", tags=["keys for external use"])
@@ -240,6 +241,7 @@ async def update_product_api_key(
         
         await session.commit()
         await session.refresh(api_key)
+        await invalidate_request_principal(api_key.key_hash)
         
         return ProductAPIKeyResponse(**api_key.to_dict())
         
@@ -278,6 +280,7 @@ async def delete_product_api_key(
         
         await session.delete(api_key)
         await session.commit()
+        await invalidate_request_principal(api_key.key_hash)
         
     except HTTPException:
         raise
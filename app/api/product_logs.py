@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, delete, and_, func, desc
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from pydantic import BaseModel
@@ -295,39 +295,30 @@ async def clear_product_api_logs(
         # Calculate cutoff date
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=older_than_days)
         
-        # Base delete query - only user's API keys
-        stmt = select(ProductAPILog.id).join(ProductAPIKey).where(
-            and_(
-                ProductAPIKey.user_id == current_user.id,
-                ProductAPILog.created_at < cutoff_date
-            )
-        )
-        
+        # Only user's API keys
+        user_keys = select(ProductAPIKey.id).where(ProductAPIKey.user_id == current_user.id)
+
         # Apply API key filter if provided
         if api_key_id:
             try:
                 key_uuid = UUID(api_key_id)
-                stmt = stmt.where(ProductAPILog.api_key_id == key_uuid)
+                user_keys = user_keys.where(ProductAPIKey.id == key_uuid)
             except ValueError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Invalid API key ID format"
                 )
-        
-        # Get IDs to delete
-        result = await session.execute(stmt)
-        log_ids = [row[0] for row in result.fetchall()]
-        
-        if log_ids:
-            # Delete the logs
-            delete_stmt = select(ProductAPILog).where(ProductAPILog.id.in_(log_ids))
-            delete_result = await session.execute(delete_stmt)
-            logs_to_delete = delete_result.scalars().all()
-            
-            for log in logs_to_delete:
-                await session.delete(log)
-            
-            await session.commit()
+
+        # Single set-based DELETE; the created_at bound limits it to the older partitions
+        await session.execute(
+            delete(ProductAPILog).where(
+                and_(
+                    ProductAPILog.api_key_id.in_(user_keys),
+                    ProductAPILog.created_at < cutoff_date
+                )
+            ).execution_options(synchronize_session=False)
+        )
+        await session.commit()
         
     except HTTPException:
         raise
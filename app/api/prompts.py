@@ -13,6 +13,7 @@ from app.models.user import User
 from app.core.auth import get_current_user
 from app.services.statistics import StatisticsService
 from app.services.limits import LimitsService
+from app.services.prompt_cache import invalidate_prompt
 from app.schemas.prompt import (
     CreatePromptRequest,
     UpdatePromptRequest,
@@ -347,6 +348,8 @@ async def update_prompt(
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
 
+    previous_slug = prompt.slug
+
     # Update fields
     if prompt_data.name is not None:
         prompt.name = prompt_data.name
@@ -402,6 +405,7 @@ async def update_prompt(
     prompt.updated_by = current_user.id
 
     await session.commit()
+    await invalidate_prompt(prompt, previous_slug)
 
     # Reload with relationships
     query = select(Prompt).options(
@@ -441,6 +445,7 @@ async def delete_prompt(
 
     await session.delete(prompt)
     await session.commit()
+    await invalidate_prompt(prompt)
 
     return {"success": True, "message": "Prompt deleted successfully"}
 
@@ -521,6 +526,7 @@ async def create_prompt_version(
     prompt.updated_by = current_user.id
 
     await session.commit()
+    await invalidate_prompt(prompt)
 
     # Reload version
     query = select(PromptVersion).where(PromptVersion.id == new_version.id)
@@ -590,6 +596,7 @@ async def update_prompt_version(
         setattr(version, field, value)
 
     await session.commit()
+    await invalidate_prompt(prompt)
     print(f"[update_prompt_version] Committed changes")
 
     # Reload version
@@ -668,6 +675,7 @@ async def deploy_prompt_version(
     prompt.updated_by = current_user.id
 
     await session.commit()
+    await invalidate_prompt(prompt)
 
     return {
         "success": True,
@@ -732,6 +740,7 @@ async def undeploy_prompt_version(
         prompt.status = PromptStatus.DRAFT
 
     await session.commit()
+    await invalidate_prompt(prompt)
 
     # Convert status to frontend format
     status_mapping = {
@@ -796,6 +805,10 @@ async def deprecate_prompt_version(
 
     await session.commit()
 
+    prompt = await session.get(Prompt, version.prompt_id)
+    if prompt:
+        await invalidate_prompt(prompt)
+
     return {
         "success": True,
         "message": f"Version {version.version_number} has been deprecated",
@@ -879,6 +892,7 @@ async def delete_prompt_version(
     # Delete version
     await session.delete(version)
     await session.commit()
+    await invalidate_prompt(prompt)
 
     return {
         "success": True,
@@ -904,6 +918,8 @@ async def patch_prompt(
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
 
+    previous_slug = prompt.slug
+
     # Update only provided fields
     update_data = prompt_update.model_dump(exclude_unset=True)
 
@@ -914,6 +930,7 @@ async def patch_prompt(
     prompt.updated_by = current_user.id
 
     await session.commit()
+    await invalidate_prompt(prompt, previous_slug)
 
     # Reload with relationships
     query = select(Prompt).options(
@@ -977,6 +994,7 @@ async def patch_prompt_version(
         setattr(version, field, value)
 
     await session.commit()
+    await invalidate_prompt(prompt)
 
     # Reload version
     query = select(PromptVersion).options(
@@ -1,65 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
-from typing import Optional, Dict, Any, List
+from sqlalchemy.orm import joinedload, noload, selectinload
+from typing import Optional, Dict, Any, List, Iterable
 from pydantic import BaseModel, Field
 import hashlib
-import json
 from uuid import UUID
-import secrets
 import time
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.database import get_session
 from app.models.prompt import Prompt, VersionStatus
-from app.models.product_api_key import ProductAPIKey
-from app.core.product_auth import (
-    get_product_api_key,
-    get_user_from_api_key
-)
-from app.services.limits import LimitsService
-from app.services.redis import redis_client
-from app.models.analytics import ABTest
+from app.core.product_auth import RequestPrincipal, get_request_principal
+from app.services.quota import quota_engine
+from app.services.trace_ids import trace_id_codec
+from app.services.prompt_cache import prompt_cache, build_payload, selector_field, version_field
+from app.services.ab_testing import ab_test_assigner
+from app.core.metrics import get_prompt_stage, observe_get_prompt_stage
 
 
 # Публичный роутер только с двумя методами
 public_api_router = APIRouter(tags=["external api"])
 
+# Trace ID of a get-prompt response, also sent on 304 Not Modified (which has no body)
+TRACE_ID_HEADER = "X-Trace-Id"
 
-async def get_user_workspace(db: AsyncSession, user) -> UUID:
-    """Get the workspace ID for a user (either as owner or member)"""
-    from app.models.workspace import Workspace, workspace_members
-    from typing import Optional
 
-    # Find workspace where user is owner
-    q_owner = select(Workspace).where(Workspace.owner_id == user.id).order_by(Workspace.created_at.asc())
-    res = await db.execute(q_owner)
-    workspace: Optional[Workspace] = res.scalars().first()
+def get_principal_workspace(principal: RequestPrincipal) -> UUID:
+    """Get the workspace ID for the API key owner (either as owner or member)"""
+    if not principal.workspace_id:
+        raise HTTPException(status_code=404, detail="User has no workspace")
 
-    # If not owner, check if user is member
-    if not workspace:
-        q_member = (
-            select(Workspace)
-            .join(workspace_members, Workspace.id == workspace_members.c.workspace_id)
-            .where(workspace_members.c.user_id == user.id)
-            .order_by(Workspace.created_at.asc())
-        )
-        res = await db.execute(q_member)
-        workspace = res.scalars().first()
+    return principal.workspace_id
 
-    if not workspace:
-        raise HTTPException(status_code=404, detail="User has no workspace")
 
-    return workspace.id
+def generate_trace_id(workspace_id: UUID, prompt_id: UUID, prompt_version_id: UUID) -> str:
+    """Generate a unique trace ID that carries (and signs) the prompt context"""
+    return trace_id_codec.generate(workspace_id, prompt_id, prompt_version_id)
 
 
-def generate_trace_id(slug: str) -> str:
-    """Generate unique trace ID"""
-    timestamp = str(int(time.time()))
-    random_part = secrets.token_hex(4)
-    slug_hash = hashlib.sha1(slug.encode()).hexdigest()[:8]
-    return f"evt_{slug_hash}_{timestamp}_{random_part}"
+def prompt_etag(resolved: dict, source_name: str, ab_test_info: Optional[dict]) -> str:
+    """
+    Strong ETag of a get-prompt response: it changes with the resolved version (id
+    and updated_at) and the A/B assignment, but not with the per-request trace_id
+    """
+    parts = [resolved["prompt_version_id"], resolved["updated_at"] or "", source_name]
+    if ab_test_info:
+        parts += [ab_test_info["ab_test_id"], ab_test_info["ab_test_variant"]]
+    return '"%s"' % hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
 
 
 async def get_ab_test_version(session: AsyncSession, prompt_id: UUID, workspace_id: UUID) -> Optional[dict]:
@@ -69,61 +67,8 @@ async def get_ab_test_version(session: AsyncSession, prompt_id: UUID, workspace_
     Returns dict with version_id, test info, or None to use production version.
     """
     try:
-        # Find ONLY active A/B tests for this prompt (ignore completed tests)
-        # Get the most recent running test only
-        result = await session.execute(
-            select(ABTest).where(
-                and_(
-                    ABTest.prompt_id == prompt_id,
-                    ABTest.workspace_id == workspace_id,
-                    ABTest.status == 'running'  # Only running tests, not completed
-                )
-            ).order_by(ABTest.created_at.desc())
-        )
-
-        # Get only the first (most recent) running test
-        ab_test = result.scalars().first()
-
-        # Debug logging to understand what's happening
-        if not ab_test:
-            print(f"[A/B TEST DEBUG] No active tests found for prompt {prompt_id}, using production version")
-            return None
-
-        print(f"[A/B TEST DEBUG] Found running test: {ab_test.name} (ID: {ab_test.id}, Status: {ab_test.status}, Created: {ab_test.created_at})")
-
-        # Check if we've reached the total request limit
-        total_served = ab_test.version_a_requests + ab_test.version_b_requests
-
-        if total_served >= ab_test.total_requests:
-            # Automatically complete the test when limit is reached
-            if ab_test.status == 'running':
-                ab_test.status = 'completed'
-                ab_test.ended_at = datetime.utcnow()
-                await session.commit()
-            return None  # Use production version when test is exhausted
-
-        # Determine which version to serve for 50/50 split
-        # Use the version that has been served fewer times
-        if ab_test.version_a_requests <= ab_test.version_b_requests:
-            # Serve version A
-            ab_test.version_a_requests += 1
-            version_to_serve = ab_test.version_a_id
-            variant = "version_a"
-        else:
-            # Serve version B
-            ab_test.version_b_requests += 1
-            version_to_serve = ab_test.version_b_id
-            variant = "version_b"
-
-        await session.commit()
-
-        return {
-            "version_id": version_to_serve,
-            "ab_test_id": str(ab_test.id),
-            "ab_test_name": ab_test.name,
-            "ab_test_variant": variant
-        }
-
+        # Cached running test + atomic Redis counters; the ab_tests row is reconciled in the background
+        return await ab_test_assigner.assign(session, prompt_id, workspace_id)
     except Exception as e:
         print(f"Error in A/B testing: {e}")
         return None  # Fall back to production version
@@ -165,12 +110,231 @@ class PromptContentResponse(BaseModel):
     ab_test_variant: Optional[str] = Field(None, description="A/B test variant (version_a or version_b)")
 
 
+class PromptSelector(BaseModel):
+    """One prompt of a get-prompts request (same filters as get-prompt)"""
+    slug: str = Field(..., description="Prompt slug (required)")
+    version_number: Optional[int] = Field(None, description="Specific version number")
+    status: Optional[str] = Field(None, description="Version status filter (draft, testing, production, inactive, deprecated)")
+
+
+class GetPromptsRequest(BaseModel):
+    """Request model for resolving several prompts at once"""
+    source_name: str = Field(..., description="Source name - username who created the prompt (required)")
+    prompts: List[PromptSelector] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.GET_PROMPTS_MAX_ITEMS,
+        description="Prompts to resolve, each like a get-prompt request"
+    )
+
+
+class PromptResult(BaseModel):
+    """Outcome of one selector of a get-prompts request"""
+    index: int
+    slug: str
+    status_code: int = Field(..., description="200, or the status get-prompt would have returned for this selector")
+    prompt: Optional[PromptContentResponse] = None
+    error: Optional[Any] = Field(None, description="Error detail, as get-prompt would have returned it")
+
+
+class GetPromptsResponse(BaseModel):
+    """Response model for get-prompts: one result per selector, in request order"""
+    resolved: int
+    errors: int
+    results: List[PromptResult]
+
+
+def build_prompt_response(
+        resolved: dict,
+        source_name: str,
+        trace_id: str,
+        ab_test_info: Optional[dict]
+) -> PromptContentResponse:
+    """get-prompt response of a resolved payload"""
+    return PromptContentResponse(
+        slug=resolved["slug"],
+        source_name=source_name,
+        version_number=resolved["version_number"],
+        status=resolved["status"],
+        system_prompt=resolved["system_prompt"],
+        user_prompt=resolved["user_prompt"],
+        assistant_prompt=resolved["assistant_prompt"],
+        variables=resolved["variables"],
+        model_config=resolved["model_config"],
+        deployed_at=resolved["deployed_at"],
+        created_at=resolved["created_at"],
+        updated_at=resolved["updated_at"],
+        trace_id=trace_id,
+        # A/B Test information
+        ab_test_id=ab_test_info["ab_test_id"] if ab_test_info else None,
+        ab_test_name=ab_test_info["ab_test_name"] if ab_test_info else None,
+        ab_test_variant=ab_test_info["ab_test_variant"] if ab_test_info else None
+    )
+
+
+async def load_prompt(session: AsyncSession, principal: RequestPrincipal, prompt_request: GetPromptRequest) -> Prompt:
+    """Load the API key owner's prompt with all versions"""
+    # Use the user from API key to find prompts (source_name is just informational)
+    # Find prompt by slug and user (from API key)
+    prompt_stmt = select(Prompt).options(
+        selectinload(Prompt.versions)
+    ).where(
+        and_(
+            Prompt.slug == prompt_request.slug,
+            Prompt.created_by == principal.user_id
+        )
+    )
+
+    result = await session.execute(prompt_stmt)
+    prompt = result.scalar_one_or_none()
+
+    if not prompt:
+        raise prompt_not_found(principal, prompt_request.slug, prompt_request.source_name)
+
+    return prompt
+
+
+async def load_prompts(session: AsyncSession, principal: RequestPrincipal, slugs: Iterable[str]) -> Dict[str, Prompt]:
+    """Load several of the API key owner's prompts with all versions in one query, by slug"""
+    result = await session.execute(
+        select(Prompt).options(
+            joinedload(Prompt.versions),
+            noload(Prompt.tags)  # selectin by default; not part of the payload
+        ).where(
+            and_(
+                Prompt.slug.in_(list(slugs)),
+                Prompt.created_by == principal.user_id
+            )
+        )
+    )
+    return {prompt.slug: prompt for prompt in result.unique().scalars()}
+
+
+def prompt_not_found(principal: RequestPrincipal, slug: str, source_name: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail={
+            "error": "Prompt not found",
+            "message": f"No prompt with slug '{slug}' found for user '{principal.username}' (API key owner)",
+            "slug": slug,
+            "api_key_owner": principal.username,
+            "source_name": source_name
+        }
+    )
+
+
+def select_filtered_version(prompt: Prompt, prompt_request: GetPromptRequest):
+    """Pick the most recent version matching the version_number and/or status filters"""
+    candidates = prompt.versions
+
+    # Filter by version_number if specified
+    if prompt_request.version_number is not None:
+        candidates = [v for v in candidates if v.version_number == prompt_request.version_number]
+
+        if not candidates:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "error": "Version not found",
+                    "message": f"Version {prompt_request.version_number} not found for prompt '{prompt_request.slug}'",
+                    "version_number": prompt_request.version_number,
+                    "slug": prompt_request.slug,
+                    "available_versions": [v.version_number for v in prompt.versions]
+                }
+            )
+
+    # Filter by status if specified
+    if prompt_request.status:
+        try:
+            version_status = VersionStatus(prompt_request.status)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "error": "Invalid status value",
+                    "message": f"Status '{prompt_request.status}' is not valid",
+                    "provided_status": prompt_request.status,
+                    "valid_statuses": [s.value for s in VersionStatus]
+                }
+            )
+
+        candidates = [v for v in candidates if v.status == version_status]
+
+        if not candidates:
+            available_statuses = list(set([v.status.value for v in prompt.versions]))
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail={
+                    "error": "Version with status not found",
+                    "message": f"No version with status '{prompt_request.status}' found for prompt '{prompt_request.slug}'",
+                    "requested_status": prompt_request.status,
+                    "slug": prompt_request.slug,
+                    "available_statuses": available_statuses
+                }
+            )
+
+    # Get the most recent version from filtered candidates
+    return sorted(candidates, key=lambda v: v.created_at, reverse=True)[0]
+
+
+def select_production_version(prompt: Prompt, prompt_request: GetPromptRequest):
+    """Pick the deployed (production) version"""
+    production_versions = [v for v in prompt.versions if v.status == VersionStatus.PRODUCTION]
+
+    if not production_versions:
+        available_statuses = list(set([v.status.value for v in prompt.versions]))
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": "No deployed version found",
+                "message": f"No deployed (production) version found for prompt '{prompt_request.slug}'",
+                "slug": prompt_request.slug,
+                "available_statuses": available_statuses,
+                "suggestion": "Use 'version_number' or 'status' parameter to access specific versions"
+            }
+        )
+
+    return sorted(production_versions, key=lambda v: v.deployed_at or v.created_at, reverse=True)[0]
+
+
+async def resolve_version_by_id(
+        session: AsyncSession,
+        principal: RequestPrincipal,
+        slug: str,
+        prompt: Optional[Prompt],
+        prompt_id: UUID,
+        version_id: UUID
+) -> Optional[dict]:
+    """Resolve an A/B test version payload through the prompt cache"""
+    field = version_field(version_id)
+    resolved, generation = await prompt_cache.get(principal.user_id, slug, field)
+    if resolved is not None:
+        return resolved
+
+    if prompt is None:
+        result = await session.execute(
+            select(Prompt).options(selectinload(Prompt.versions)).where(Prompt.id == prompt_id)
+        )
+        prompt = result.scalar_one_or_none()
+        if not prompt:
+            return None
+
+    version = next((v for v in prompt.versions if v.id == version_id), None)
+    if not version:
+        return None
+
+    resolved = build_payload(prompt, version)
+    await prompt_cache.set(principal.user_id, slug, field, resolved, generation)
+    return resolved
+
+
 @public_api_router.post("/get-prompt", response_model=PromptContentResponse)
 async def get_prompt(
         request: Request,
+        http_response: Response,
         prompt_request: GetPromptRequest,
         session: AsyncSession = Depends(get_session),
-        api_key: ProductAPIKey = Depends(get_product_api_key)
+        principal: RequestPrincipal = Depends(get_request_principal)
 ):
     """
     Get prompt content by slug and source name
@@ -187,19 +351,26 @@ async def get_prompt(
     - If only slug and source_name provided: returns the deployed (production) version
     - If version_number or status specified: applies these filters without requiring deployed version
     - If status is "production", only deployed versions are returned
+
+    Conditional requests:
+    - Responses carry an ETag; send it back in If-None-Match to get an empty 304
+      when the resolved version is unchanged. The 304 (like every response) carries
+      a fresh trace ID in the X-Trace-Id header.
     """
     start_time = time.time()
 
-    # Store the request payload for logging
-    request_payload = prompt_request.model_dump()
+    # API key resolution ran in ProductAPILoggingMiddleware / get_request_principal
+    observe_get_prompt_stage("auth", getattr(request.state, "auth_seconds", 0.0))
 
+    quota_acquired = False
     try:
-        # Get user from API key
-        user = await get_user_from_api_key(api_key, session)
-
-        # Check API limits
-        limits_service = LimitsService(session)
-        can_request, current_count, max_requests, reset_time = await limits_service.check_api_limit(user.id)
+        # Check and count the request against the daily quota in one atomic step
+        # (superusers are unlimited but still counted)
+        with get_prompt_stage("quota"):
+            can_request, current_count, max_requests, reset_time, quota_grant = await quota_engine.acquire(
+                principal.user_id,
+                -1 if principal.is_superuser else principal.daily_limit
+            )
 
         if not can_request:
             # Note: Error logging is handled by ProductAPILoggingMiddleware
@@ -213,184 +384,85 @@ async def get_prompt(
                     "message": f"You have used {current_count} out of {max_requests} daily API requests. Your limit will reset at {reset_time.strftime('%Y-%m-%d %H:%M:%S UTC')}."
                 }
             )
-        # Use the user from API key to find prompts (source_name is just informational)
-        # Find prompt by slug and user (from API key)
-        prompt_stmt = select(Prompt).options(
-            selectinload(Prompt.versions)
-        ).where(
-            and_(
-                Prompt.slug == prompt_request.slug,
-                Prompt.created_by == user.id
-            )
-        )
-
-        result = await session.execute(prompt_stmt)
-        prompt = result.scalar_one_or_none()
+        quota_acquired = True
 
-        if not prompt:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail={
-                    "error": "Prompt not found",
-                    "message": f"No prompt with slug '{prompt_request.slug}' found for user '{user.username}' (API key owner)",
-                    "slug": prompt_request.slug,
-                    "api_key_owner": user.username,
-                    "source_name": prompt_request.source_name
-                }
-            )
-
-        # Find the appropriate version
-        target_version = None
+        # Resolve the prompt version payload, served from the prompt cache when warm
         ab_test_info = None
-
-        # Check if specific filters are provided
         has_filters = prompt_request.version_number is not None or prompt_request.status is not None
+        selector = selector_field(prompt_request.version_number, prompt_request.status)
 
         if has_filters:
-            # Apply filters - version_number and/or status
-            candidates = prompt.versions
-
-            # Filter by version_number if specified
-            if prompt_request.version_number is not None:
-                candidates = [v for v in candidates if v.version_number == prompt_request.version_number]
-
-                if not candidates:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail={
-                            "error": "Version not found",
-                            "message": f"Version {prompt_request.version_number} not found for prompt '{prompt_request.slug}'",
-                            "version_number": prompt_request.version_number,
-                            "slug": prompt_request.slug,
-                            "available_versions": [v.version_number for v in prompt.versions]
-                        }
-                    )
-
-            # Filter by status if specified
-            if prompt_request.status:
-                try:
-                    version_status = VersionStatus(prompt_request.status)
-                    candidates = [v for v in candidates if v.status == version_status]
-
-                    if not candidates:
-                        available_statuses = list(set([v.status.value for v in prompt.versions]))
-                        raise HTTPException(
-                            status_code=status.HTTP_404_NOT_FOUND,
-                            detail={
-                                "error": "Version with status not found",
-                                "message": f"No version with status '{prompt_request.status}' found for prompt '{prompt_request.slug}'",
-                                "requested_status": prompt_request.status,
-                                "slug": prompt_request.slug,
-                                "available_statuses": available_statuses
-                            }
-                        )
-
-                except ValueError:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail={
-                            "error": "Invalid status value",
-                            "message": f"Status '{prompt_request.status}' is not valid",
-                            "provided_status": prompt_request.status,
-                            "valid_statuses": [s.value for s in VersionStatus]
-                        }
-                    )
-
-            # Get the most recent version from filtered candidates
-            target_version = sorted(candidates, key=lambda v: v.created_at, reverse=True)[0]
+            with get_prompt_stage("prompt_lookup"):
+                resolved, generation = await prompt_cache.get(principal.user_id, prompt_request.slug, selector)
+                if resolved is None:
+                    prompt = await load_prompt(session, principal, prompt_request)
+                    resolved = build_payload(prompt, select_filtered_version(prompt, prompt_request))
+                    await prompt_cache.set(principal.user_id, prompt_request.slug, selector, resolved, generation)
 
         else:
             # Default: find deployed (production) version, but check for A/B tests first
+            with get_prompt_stage("prompt_lookup"):
+                resolved, generation = await prompt_cache.get(principal.user_id, prompt_request.slug, selector)
+                prompt = None
+                if resolved is None:
+                    prompt = await load_prompt(session, principal, prompt_request)
+                    prompt_id = prompt.id
+                else:
+                    prompt_id = UUID(resolved["prompt_id"])
 
             # Check for active A/B tests
-            workspace_id = await get_user_workspace(session, user)
-            ab_test_result = await get_ab_test_version(session, prompt.id, workspace_id)
-
-            if ab_test_result:
-                # Use A/B test version
-                ab_test_version = next((v for v in prompt.versions if v.id == ab_test_result["version_id"]), None)
-                if ab_test_version:
-                    target_version = ab_test_version
-                    ab_test_info = ab_test_result
-                else:
-                    # Fall back to production if A/B test version not found
-                    production_versions = [v for v in prompt.versions if v.status == VersionStatus.PRODUCTION]
-                    if production_versions:
-                        target_version = sorted(production_versions, key=lambda v: v.created_at, reverse=True)[0]
-            else:
-                # Use production version
-                production_versions = [v for v in prompt.versions if v.status == VersionStatus.PRODUCTION]
-
-                if not production_versions:
-                    available_statuses = list(set([v.status.value for v in prompt.versions]))
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail={
-                            "error": "No deployed version found",
-                            "message": f"No deployed (production) version found for prompt '{prompt_request.slug}'",
-                            "slug": prompt_request.slug,
-                            "available_statuses": available_statuses,
-                            "suggestion": "Use 'version_number' or 'status' parameter to access specific versions"
-                        }
+            with get_prompt_stage("ab_selection"):
+                workspace_id = get_principal_workspace(principal)
+                ab_test_result = await get_ab_test_version(session, prompt_id, workspace_id)
+
+                if ab_test_result:
+                    # Use A/B test version
+                    ab_test_payload = await resolve_version_by_id(
+                        session, principal, prompt_request.slug, prompt, prompt_id, ab_test_result["version_id"]
                     )
+                    if ab_test_payload:
+                        resolved = ab_test_payload
+                        ab_test_info = ab_test_result
 
-                target_version = sorted(production_versions, key=lambda v: v.deployed_at or v.created_at, reverse=True)[0]
-
-        trace_id = generate_trace_id(prompt_request.slug)
+            if ab_test_info is None and resolved is None:
+                # Use production version (also the fallback if the A/B test version is not found)
+                with get_prompt_stage("prompt_lookup"):
+                    resolved = build_payload(prompt, select_production_version(prompt, prompt_request))
+                    await prompt_cache.set(principal.user_id, prompt_request.slug, selector, resolved, generation)
 
         # Get user's workspace
-        workspace_id = await get_user_workspace(session, user)
-
-        trace_context = {
-            "prompt_id": str(prompt.id),
-            "prompt_version_id": str(target_version.id),
-            "workspace_id": str(workspace_id),
-            "slug": prompt_request.slug,
-            "source": request_payload["source_name"],
-            "created_at": datetime.utcnow().isoformat()
-        }
-        await redis_client.setex(
-            f"trace:{trace_id}",
-            30 * 24 * 60 * 60,  # 30 days in seconds
-            json.dumps(trace_context)
-        )
+        workspace_id = get_principal_workspace(principal)
 
-        # Create response
-        response = PromptContentResponse(
-            slug=prompt.slug,
-            source_name=prompt_request.source_name,
-            version_number=target_version.version_number,
-            status=target_version.status.value,
-            system_prompt=target_version.system_prompt,
-            user_prompt=target_version.user_prompt,
-            assistant_prompt=target_version.assistant_prompt,
-            variables=target_version.variables or [],
-            model_config=target_version.model_config or {},
-            deployed_at=target_version.deployed_at,
-            created_at=target_version.created_at,
-            updated_at=target_version.updated_at,
-            trace_id=trace_id,
-            # A/B Test information
-            ab_test_id=ab_test_info["ab_test_id"] if ab_test_info else None,
-            ab_test_name=ab_test_info["ab_test_name"] if ab_test_info else None,
-            ab_test_variant=ab_test_info["ab_test_variant"] if ab_test_info else None
+        # Events are attributed from the trace ID itself, nothing is stored per request
+        trace_id = generate_trace_id(
+            workspace_id, UUID(resolved["prompt_id"]), UUID(resolved["prompt_version_id"])
         )
 
-        # Increment API usage counter
-        await limits_service.increment_api_usage(user.id)
-
         # Note: Logging is handled by ProductAPILoggingMiddleware
         # Store metadata for middleware to use
-        request.state.prompt_id = prompt.id
-        request.state.prompt_version_id = target_version.id
+        request.state.prompt_id = UUID(resolved["prompt_id"])
+        request.state.prompt_version_id = UUID(resolved["prompt_version_id"])
         request.state.trace_id = trace_id
 
-        return response
+        # Bodies are per request (trace_id): caches must revalidate before reusing one
+        etag = prompt_etag(resolved, prompt_request.source_name, ab_test_info)
+        headers = {"ETag": etag, TRACE_ID_HEADER: trace_id, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        http_response.headers.update(headers)
+
+        # Create response
+        return build_prompt_response(resolved, prompt_request.source_name, trace_id, ab_test_info)
 
     except HTTPException as http_ex:
         # Note: Error logging is handled by ProductAPILoggingMiddleware
+        # Only successful requests count against the quota
+        if quota_acquired:
+            await quota_engine.release(quota_grant)
         raise
     except Exception as e:
+        if quota_acquired:
+            await quota_engine.release(quota_grant)
         error_msg = str(e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -398,6 +470,141 @@ async def get_prompt(
         )
 
 
+@public_api_router.post("/get-prompts", response_model=GetPromptsResponse)
+async def get_prompts(
+        request: Request,
+        prompts_request: GetPromptsRequest,
+        session: AsyncSession = Depends(get_session),
+        principal: RequestPrincipal = Depends(get_request_principal)
+):
+    """
+    Resolve up to GET_PROMPTS_MAX_ITEMS prompts in one call
+
+    Each selector (slug, optional version_number / status) is resolved like a
+    get-prompt request, A/B assignment included, and gets its own trace ID. One
+    selector failing does not fail the others: results carry a status_code and
+    either the prompt or the error. Every resolved prompt counts as one request
+    against the daily quota and is logged as its own product API log row.
+    """
+    selectors = prompts_request.prompts
+    source_name = prompts_request.source_name
+
+    # API key resolution ran in ProductAPILoggingMiddleware / get_request_principal
+    can_request, current_count, max_requests, reset_time, quota_grant = await quota_engine.acquire(
+        principal.user_id,
+        -1 if principal.is_superuser else principal.daily_limit,
+        len(selectors)
+    )
+    if not can_request:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "API rate limit exceeded",
+                "current_usage": current_count,
+                "max_requests_per_day": max_requests,
+                "requested": len(selectors),
+                "reset_time": reset_time.isoformat(),
+                "message": f"You have used {current_count} out of {max_requests} daily API requests; {len(selectors)} more do not fit. Your limit will reset at {reset_time.strftime('%Y-%m-%d %H:%M:%S UTC')}."
+            }
+        )
+
+    released = False
+    try:
+        workspace_id = get_principal_workspace(principal)
+        fields = [selector_field(selector.version_number, selector.status) for selector in selectors]
+
+        # Cached payloads first, then one query for every prompt still needed
+        cached = await prompt_cache.get_many(principal.user_id, [
+            (selector.slug, field) for selector, field in zip(selectors, fields)
+        ])
+        missing_slugs = {selector.slug for selector, (resolved, _) in zip(selectors, cached) if resolved is None}
+        prompts = await load_prompts(session, principal, missing_slugs) if missing_slugs else {}
+
+        results = []
+        log_items = []
+        to_cache = {}
+        for index, (selector, field, (resolved, generation)) in enumerate(zip(selectors, fields, cached)):
+            try:
+                prompt = prompts.get(selector.slug)
+                if resolved is None and prompt is None:
+                    raise prompt_not_found(principal, selector.slug, source_name)
+
+                has_filters = selector.version_number is not None or selector.status is not None
+                ab_test_info = None
+                if not has_filters:
+                    prompt_id = prompt.id if prompt is not None else UUID(resolved["prompt_id"])
+                    ab_test_result = await get_ab_test_version(session, prompt_id, workspace_id)
+                    if ab_test_result:
+                        ab_test_payload = await resolve_version_by_id(
+                            session, principal, selector.slug, prompt, prompt_id, ab_test_result["version_id"]
+                        )
+                        if ab_test_payload:
+                            resolved = ab_test_payload
+                            ab_test_info = ab_test_result
+
+                if resolved is None:
+                    version = (
+                        select_filtered_version(prompt, selector) if has_filters
+                        else select_production_version(prompt, selector)
+                    )
+                    resolved = build_payload(prompt, version)
+                    to_cache[(selector.slug, field)] = (resolved, generation)
+
+                trace_id = generate_trace_id(
+                    workspace_id, UUID(resolved["prompt_id"]), UUID(resolved["prompt_version_id"])
+                )
+                result = PromptResult(
+                    index=index,
+                    slug=selector.slug,
+                    status_code=status.HTTP_200_OK,
+                    prompt=build_prompt_response(resolved, source_name, trace_id, ab_test_info)
+                )
+                log_items.append({
+                    "trace_id": trace_id,
+                    "prompt_id": UUID(resolved["prompt_id"]),
+                    "prompt_version_id": UUID(resolved["prompt_version_id"]),
+                })
+            except HTTPException as http_ex:
+                result = PromptResult(
+                    index=index, slug=selector.slug, status_code=http_ex.status_code, error=http_ex.detail
+                )
+                log_items.append({})
+
+            results.append(result)
+            # Logged as the equivalent get-prompt request and response
+            log_items[-1].update({
+                "status_code": result.status_code,
+                "request_body": {**selector.model_dump(exclude_none=True), "source_name": source_name},
+                "response_body": result.prompt.model_dump(mode="json") if result.prompt else {"detail": result.error},
+            })
+
+        if to_cache:
+            await prompt_cache.set_many(principal.user_id, [
+                (slug, field, resolved, generation) for (slug, field), (resolved, generation) in to_cache.items()
+            ])
+
+        # Only resolved prompts count against the quota
+        errors = sum(1 for result in results if result.status_code != status.HTTP_200_OK)
+        released = True
+        if errors:
+            await quota_engine.release(quota_grant, errors)
+
+        # Note: Logging is handled by ProductAPILoggingMiddleware, one row per selector
+        request.state.log_items = log_items
+
+        return GetPromptsResponse(resolved=len(results) - errors, errors=errors, results=results)
+
+    except Exception as e:
+        if not released:
+            await quota_engine.release(quota_grant, len(selectors))
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving prompts: {str(e)}"
+        )
+
+
 # Import events API for external access
 from app.api.events import router as events_router
 
@@ -141,6 +141,7 @@ async def get_prompt_statistics_summary(
     - Breakdown by source_name (who is requesting the prompts)  
     - Breakdown by prompt version
     - Status code distribution
+    - Latency percentiles (p50/p95/p99, merged from the hourly latency sketches)
     """
     try:
         prompt_uuid = UUID(prompt_id)
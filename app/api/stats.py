@@ -1,40 +1,23 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from typing import Dict
 import time
 from app.core.database import get_session
 from app.models.prompt import Prompt
 from app.models.product_api_key import ProductAPIKey
 from app.models.user import User
 from app.core.auth import get_current_user
+from app.services.shared_state import shared_state
 
 router = APIRouter()
 
-# Simple in-memory cache with TTL
-_cache = {}
-_cache_ttl = {}
+# Per-user cache entry in the shared state backend: {workspace_id or "all": counts}
 CACHE_DURATION = 300  # 5 minutes
 
 
-def get_cache_key(user_id: str, workspace_id: str = None) -> str:
+def get_cache_key(user_id: str) -> str:
     """Generate cache key for user stats"""
-    return f"stats_{user_id}_{workspace_id or 'all'}"
-
-
-def is_cache_valid(cache_key: str) -> bool:
-    """Check if cache entry is still valid"""
-    return (
-            cache_key in _cache and
-            cache_key in _cache_ttl and
-            time.time() - _cache_ttl[cache_key] < CACHE_DURATION
-    )
-
-
-def set_cache(cache_key: str, data: Dict) -> None:
-    """Set cache entry with current timestamp"""
-    _cache[cache_key] = data
-    _cache_ttl[cache_key] = time.time()
+    return f"stats_counts:{user_id}"
 
 
 @router.get("/counts")
@@ -44,11 +27,14 @@ async def get_counts(
         current_user: User = Depends(get_current_user)
 ):
     """Get counts of prompts and API keys for the current user"""
-    cache_key = get_cache_key(str(current_user.id), workspace_id)
+    cache_key = get_cache_key(str(current_user.id))
+    cache_field = workspace_id or "all"
 
     # Check cache first
-    if is_cache_valid(cache_key):
-        return _cache[cache_key]
+    cached = await shared_state.get(cache_key) or {}
+    entry = cached.get(cache_field)
+    if entry and time.time() - entry["cached_at"] < CACHE_DURATION:
+        return entry
 
     # Get prompts count
     prompts_query = select(func.count(Prompt.id)).where(Prompt.created_by == current_user.id)
@@ -70,7 +56,8 @@ async def get_counts(
     }
 
     # Cache the result
-    set_cache(cache_key, counts_data)
+    cached[cache_field] = counts_data
+    await shared_state.set(cache_key, cached, CACHE_DURATION)
 
     return counts_data
 
@@ -80,12 +67,7 @@ async def invalidate_cache(
         current_user: User = Depends(get_current_user)
 ):
     """Invalidate cache for current user (useful after creating/deleting items)"""
-    user_id = str(current_user.id)
-
     # Remove all cache entries for this user
-    keys_to_remove = [key for key in _cache.keys() if key.startswith(f"stats_{user_id}_")]
-    for key in keys_to_remove:
-        _cache.pop(key, None)
-        _cache_ttl.pop(key, None)
+    await shared_state.delete(get_cache_key(str(current_user.id)))
 
     return {"success": True, "message": "Cache invalidated"}
@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import re
 from typing import Dict, List, Optional
@@ -7,10 +8,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import anthropic
 import google.generativeai as genai
 import tiktoken
-from datetime import datetime, timedelta
 import os
 
 from app.core.database import get_session
+from app.services.shared_state import shared_state
 
 logger = logging.getLogger(__name__)
 
@@ -49,30 +50,23 @@ GEMINI_MODEL_MAPPING = {
     "gemini-1.5-flash": "gemini-1.5-flash",
 }
 
-# Simple in-memory cache with TTL
-token_cache = {}
+# Token counts cached in the shared state backend with TTL
 CACHE_TTL = 60  # 60 seconds
 
 
-def get_cached(model: str, text: str) -> Optional[int]:
+def _cache_key(model: str, text: str) -> str:
+    # sha256 rather than hash(): str hashes differ between worker processes
+    return f"tokens:{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+async def get_cached(model: str, text: str) -> Optional[int]:
     """Get cached token count if still valid"""
-    key = f"{model}:{hash(text)}"
-    if key in token_cache:
-        cached_data = token_cache[key]
-        if datetime.now() - cached_data["timestamp"] < timedelta(seconds=CACHE_TTL):
-            return cached_data["tokens"]
-        else:
-            del token_cache[key]
-    return None
+    return await shared_state.get(_cache_key(model, text))
 
 
-def set_cached(model: str, text: str, tokens: int):
-    """Cache token count with timestamp"""
-    key = f"{model}:{hash(text)}"
-    token_cache[key] = {
-        "tokens": tokens,
-        "timestamp": datetime.now()
-    }
+async def set_cached(model: str, text: str, tokens: int):
+    """Cache token count for CACHE_TTL seconds"""
+    await shared_state.set(_cache_key(model, text), tokens, CACHE_TTL)
 
 
 def estimate_tokens_sync(text: str, model: str) -> int:
@@ -331,8 +325,8 @@ async def estimate_tokens(system_text: str, user_text: str, assistant_text: str,
         return 0
 
     # Check cache first
-    cache_key = f"{model}:{hash(system_text + user_text + assistant_text)}"
-    cached = get_cached(model, cache_key)
+    cache_key = "\x1e".join((system_text, user_text, assistant_text))
+    cached = await get_cached(model, cache_key)
     if cached is not None:
         return cached
 
@@ -349,13 +343,13 @@ async def estimate_tokens(system_text: str, user_text: str, assistant_text: str,
         else:
             tokens = estimate_tokens_sync(combined_text, model)
 
-        set_cached(model, cache_key, tokens)
+        await set_cached(model, cache_key, tokens)
         return tokens
 
     except Exception as e:
         logger.error(f"Token counting error for model {model}: {e}")
         tokens = estimate_tokens_sync(combined_text, model)
-        set_cached(model, cache_key, tokens)
+        await set_cached(model, cache_key, tokens)
         return tokens
 
 
@@ -1,3 +1,5 @@
+import os
+
 from pydantic_settings import BaseSettings
 from typing import Optional, List
 
@@ -35,6 +37,67 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_PASSWORD: Optional[str] = None  # Used for Redis auth if needed
 
+    # Resolved prompt cache (public get-prompt hot path)
+    PROMPT_CACHE_TTL_SECONDS: int = 3600  # Redis tier
+    PROMPT_CACHE_LOCAL_TTL_SECONDS: int = 60  # In-process tier, safety net if an invalidation is missed
+    PROMPT_CACHE_MAX_ENTRIES: int = 10000
+
+    # Bulk prompt resolution (POST /api/v1/get-prompts)
+    GET_PROMPTS_MAX_ITEMS: int = 100
+
+    # Product API principal cache (API key -> user, workspace, limits)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    # Daily API quota counters (Redis, written back to user_api_usage)
+    QUOTA_FLUSH_INTERVAL_SECONDS: int = 5
+    QUOTA_FLUSH_BATCH_SIZE: int = 500
+
+    # Product API request log writer (background batches into product_api_logs)
+    API_LOG_QUEUE_MAX_SIZE: int = 10000
+    API_LOG_BATCH_SIZE: int = 200
+    API_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    API_LOG_MAX_BODY_BYTES: int = 65536  # Request/response bytes kept per logged call
+
+    # A/B test assignment (running test cache, Redis counters reconciled to ab_tests)
+    AB_TEST_CACHE_TTL_SECONDS: int = 30
+    AB_TEST_RECONCILE_INTERVAL_SECONDS: int = 5
+
+    # Product event ingestion (POST /api/v1/events/batch)
+    EVENT_BATCH_MAX_SIZE: int = 1000
+    EVENT_DEFINITION_CACHE_TTL_SECONDS: int = 300  # Safety net if a change notification is missed
+    EVENT_DEFINITION_CACHE_MAX_WORKSPACES: int = 10000
+    TRACE_ID_SECRET: Optional[str] = None  # Signs trace ids issued by get-prompt; defaults to SECRET_KEY
+
+    # Event processing pipeline (Redis stream consumed in micro-batches by every worker)
+    EVENT_PIPELINE_BATCH_SIZE: int = 500
+    EVENT_PIPELINE_BLOCK_MS: int = 1000  # Keep below the Redis socket timeout (5s)
+    EVENT_PIPELINE_CLAIM_IDLE_SECONDS: int = 60  # Redeliver entries a dead consumer left unacknowledged
+    EVENT_PIPELINE_STREAM_MAX_LENGTH: int = 1000000
+
+    # Alerts (rolling per-prompt outcome counters; thresholds checked on a schedule by one worker)
+    ALERT_EVALUATION_INTERVAL_SECONDS: int = 60
+    ALERT_DEBOUNCE_SECONDS: int = 900  # Minimum time between two identical alerts
+
+    # PromptStats aggregation (incremental, watermarked)
+    STATS_AGGREGATION_INTERVAL_SECONDS: int = 300
+    STATS_AGGREGATION_LAG_SECONDS: int = 120  # Grace period for log rows still being written
+
+    # Monthly partitions of product_api_logs / prompt_events (retention drops whole months, 0 keeps everything)
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    PARTITION_PRECREATE_MONTHS: int = 3
+    PRODUCT_API_LOG_RETENTION_DAYS: int = 0
+    PROMPT_EVENT_RETENTION_DAYS: int = 0
+
+    # Prometheus /metrics (set PROMETHEUS_MULTIPROC_DIR in the environment when running several workers)
+    METRICS_SAMPLE_INTERVAL_SECONDS: int = 5
+
+    # State shared by all workers (rate limits, blocked IPs, small caches, scheduler leader lease).
+    # "memory" keeps it in-process and forces a single worker
+    SHARED_STATE_BACKEND: str = "redis"
+    SHARED_STATE_MEMORY_MAX_ENTRIES: int = 100000
+    SCHEDULER_LEASE_TTL_SECONDS: int = 900  # Must exceed STATS_AGGREGATION_INTERVAL_SECONDS
+
     # API Keys
     ANTHROPIC_API_KEY: Optional[str] = None
 
@@ -47,6 +110,7 @@ class Settings(BaseSettings):
     RATE_LIMIT_BURST: int = 100
     MAX_REQUESTS_PER_IP_PER_MINUTE: int = 100
     MAX_REQUESTS_PER_API_KEY_PER_MINUTE: int = 1000
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 100000  # LRU size of the in-process limiter (memory backend / Redis outage)
 
     # Monitoring
     GRAFANA_PASSWORD: Optional[str] = None
@@ -75,7 +139,9 @@ class Settings(BaseSettings):
     BACKUP_SCHEDULE: str = "0 2 * * *"
 
     # Performance Configuration
-    WORKER_PROCESSES: int = 4
+    WORKER_PROCESSES: int = 4  # uvicorn workers started by main.py, 0 = one per CPU core
+    # Postgres connections of all workers together (both engines); keep below the server's max_connections
+    DB_MAX_CONNECTIONS: int = 90
     MAX_CONNECTIONS: int = 1000
     TIMEOUT: int = 30
 
@@ -87,3 +153,11 @@ class Settings(BaseSettings):
 
 # Global settings instance
 settings = Settings()
+
+
+def get_worker_count() -> int:
+    """WORKER_PROCESSES uvicorn workers (0 = one per CPU core); in-memory shared state allows only one"""
+    workers = settings.WORKER_PROCESSES or os.cpu_count() or 1
+    if workers > 1 and settings.SHARED_STATE_BACKEND == "memory":
+        return 1
+    return workers
@@ -3,15 +3,32 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 import logging
+from typing import Tuple
 
-from .config import settings
+from .config import settings, get_worker_count
+
+
+def _pool_limits(budget: int, pool_size: int, max_overflow: int) -> Tuple[int, int]:
+    """(pool_size, max_overflow) scaled down, in the same proportion, to at most budget connections"""
+    if pool_size + max_overflow <= budget:
+        return pool_size, max_overflow
+    scaled_size = max(1, budget * pool_size // (pool_size + max_overflow))
+    return scaled_size, max(0, budget - scaled_size)
+
+
+# Every worker process has both engines: split DB_MAX_CONNECTIONS between workers,
+# a fifth of each worker's share going to the admin interface
+_worker_budget = max(4, settings.DB_MAX_CONNECTIONS // get_worker_count())
+_admin_budget = max(2, _worker_budget // 5)
+POOL_SIZE, MAX_OVERFLOW = _pool_limits(_worker_budget - _admin_budget, 10, 20)
+ADMIN_POOL_SIZE, ADMIN_MAX_OVERFLOW = _pool_limits(_admin_budget, 3, 5)
 
 # Create async engine with optimized connection pooling
 engine = create_async_engine(
     settings.DATABASE_URL,
     # Use proper connection pooling instead of NullPool for better performance
-    pool_size=10,  # Number of connections to maintain in the pool
-    max_overflow=20,  # Additional connections that can be created on demand
+    pool_size=POOL_SIZE,  # Number of connections to maintain in the pool
+    max_overflow=MAX_OVERFLOW,  # Additional connections that can be created on demand
     echo=False,  # Disable SQL query logging
     future=True,
     # Connection health checks
@@ -30,8 +47,8 @@ engine = create_async_engine(
 sync_engine = create_engine(
     settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://"),
     # Use smaller but dedicated connection pool for admin interface
-    pool_size=3,  # Admin interface needs fewer connections
-    max_overflow=5,
+    pool_size=ADMIN_POOL_SIZE,  # Admin interface needs fewer connections
+    max_overflow=ADMIN_MAX_OVERFLOW,
     echo=False,  # Disable SQL query logging
     # Connection health and recycling
     pool_pre_ping=True,
@@ -59,6 +76,13 @@ Base = declarative_base()
 # Logging
 logger = logging.getLogger(__name__)
 
+# Serializes init_db() between processes: concurrent CREATE TABLE / admin creation
+# on a fresh database fail with unique violations
+DB_INIT_LOCK_ID = 720_391_001
+
+# Set by main.py once init_db() ran before starting the workers; they only attach
+DB_INITIALIZED_ENV = "XR2_DB_INITIALIZED"
+
 
 async def get_session() -> AsyncSession:
     """Dependency to get database session"""
@@ -78,7 +102,24 @@ async def get_session() -> AsyncSession:
 
 
 async def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create all tables (one process at a time)"""
+    async with engine.connect() as lock_conn:
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": DB_INIT_LOCK_ID})
+        try:
+            await _init_db()
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": DB_INIT_LOCK_ID})
+
+
+async def bootstrap_db():
+    """Run init_db() once before the workers start, leaving no connections behind for them"""
+    try:
+        await init_db()
+    finally:
+        await engine.dispose()
+
+
+async def _init_db():
     try:
         # Import all models here to ensure they are registered with Base
         from app.models.user import User
@@ -93,6 +134,13 @@ async def init_db():
             await conn.run_sync(Base.metadata.create_all)
             
         logger.info("✅ Database tables created successfully")
+
+        # Partitioned tables need a partition for the current month before the first insert
+        from app.services.partitions import partition_manager
+        try:
+            await partition_manager.run_maintenance()
+        except Exception as e:
+            logger.warning(f"Partition maintenance at startup failed: {e}")
         
         # Create default admin user
         await create_default_admin()
@@ -0,0 +1,7 @@
+import logging
+
+
+def warn_every(logger: logging.Logger, count: int, message: str, every: int = 1000):
+    """Warn on the 1st and then every `every`-th occurrence of a repeating failure (count is the running total)"""
+    if count == 1 or count % every == 0:
+        logger.warning(message)
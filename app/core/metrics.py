@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.responses import Response
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# With several uvicorn workers every process writes its samples to PROMETHEUS_MULTIPROC_DIR
+# (must be set, and emptied, before the workers start) and /metrics merges them.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Fast endpoints are in the milliseconds, LLM-backed internal ones in the tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "xr2_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "xr2_http_requests_in_progress",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+GET_PROMPT_STAGE_DURATION = Histogram(
+    "xr2_get_prompt_stage_duration_seconds",
+    "Time spent in each stage of POST /api/v1/get-prompt",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "xr2_redis_command_duration_seconds",
+    "Redis command latency",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "xr2_redis_command_errors_total",
+    "Redis commands that raised",
+    ["command"],
+)
+DB_POOL_SIZE = Gauge("xr2_db_pool_size", "Configured database pool size", multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge("xr2_db_pool_checked_out", "Database connections in use", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("xr2_db_pool_overflow", "Database connections above the pool size", multiprocess_mode="livesum")
+API_LOG_QUEUE_DEPTH = Gauge("xr2_api_log_queue_depth", "Product API log rows waiting to be written", multiprocess_mode="livesum")
+API_LOG_DROPPED = Gauge("xr2_api_log_dropped", "Product API log rows dropped because the queue was full", multiprocess_mode="livesum")
+
+
+def observe_get_prompt_stage(stage: str, seconds: float):
+    GET_PROMPT_STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+@contextmanager
+def get_prompt_stage(stage: str):
+    """Time one stage of get-prompt: with get_prompt_stage("prompt_lookup"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        GET_PROMPT_STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def instrument_redis(client):
+    """Time every command of a redis.asyncio client (scripts included; they run through execute_command)"""
+    execute_command = client.execute_command
+
+    async def timed_execute_command(*args, **options):
+        command = str(args[0]).lower() if args else "unknown"
+        started = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        except Exception:
+            REDIS_COMMAND_ERRORS.labels(command=command).inc()
+            raise
+        finally:
+            REDIS_COMMAND_DURATION.labels(command=command).observe(time.perf_counter() - started)
+
+    client.execute_command = timed_execute_command
+    return client
+
+
+def sample_runtime_gauges():
+    """Read this worker's DB pool and log queue into the gauges"""
+    from app.core.database import engine
+    from app.services.api_log_writer import api_log_writer
+
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_SIZE.set(pool.size())
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    log_stats = api_log_writer.stats()
+    API_LOG_QUEUE_DEPTH.set(log_stats["queue_depth"])
+    API_LOG_DROPPED.set(log_stats["dropped"])
+
+
+def metrics_response() -> Response:
+    """Prometheus exposition of every worker's metrics"""
+    sample_runtime_gauges()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsSampler:
+    """
+    Refreshes the gauges of this worker every METRICS_SAMPLE_INTERVAL_SECONDS, so a
+    scrape served by any one worker still reports the pools and queues of all of them.
+    """
+
+    def __init__(self):
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if MULTIPROCESS:
+            # Drop this worker's live gauges from the merged view
+            multiprocess.mark_process_dead(os.getpid())
+
+    async def _run(self):
+        while self.running:
+            try:
+                sample_runtime_gauges()
+                await asyncio.sleep(settings.METRICS_SAMPLE_INTERVAL_SECONDS)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Failed to sample runtime metrics: {e}")
+                await asyncio.sleep(settings.METRICS_SAMPLE_INTERVAL_SECONDS)
+
+
+# Global metrics sampler instance
+metrics_sampler = MetricsSampler()
@@ -1,59 +1,50 @@
 from fastapi import HTTPException, status, Request, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import Optional
+from sqlalchemy import select, and_, func, update
+from typing import Optional, Dict, Tuple
+from collections import OrderedDict
 from uuid import UUID
+import asyncio
+import logging
 import time
 import uuid
 import json
 from datetime import datetime, timezone
 
-from app.core.database import get_session
+from app.core.config import settings
+from app.core.database import get_session, AsyncSessionLocal
 from app.models.product_api_key import ProductAPIKey, ProductAPILog
 from app.models.user import User
+from app.models.user_limits import UserLimits, GlobalLimits
+from app.models.workspace import Workspace, workspace_members
+from app.services.rate_limit import RateLimit, rate_limit_engine
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CHANGE_CHANNEL = "principals:changed"
 
 # Security scheme for API key authentication
 product_api_security = HTTPBearer(scheme_name="ProductAPIKey")
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter for API keys"""
-
-    def __init__(self):
-        self.requests = {}  # key_id -> [(timestamp, count), ...]
+    """Hourly/daily request limits per API key (sliding windows in the shared rate limit engine)"""
 
-    def check_rate_limit(self, key_id: str, hourly_limit: int, daily_limit: int) -> tuple[bool, str]:
+    async def check_rate_limit(self, key_id: str, hourly_limit: int, daily_limit: int) -> tuple[bool, str]:
         """
         Check if the API key has exceeded rate limits
         Returns: (is_allowed, error_message)
         """
-        now = time.time()
-        hour_ago = now - 3600
-        day_ago = now - 86400
-
-        # Get or create request history for this key
-        if key_id not in self.requests:
-            self.requests[key_id] = []
-
-        requests = self.requests[key_id]
-
-        # Clean old requests
-        requests[:] = [req for req in requests if req[0] > day_ago]
-
-        # Count requests in last hour and day
-        hourly_count = sum(1 for req in requests if req[0] > hour_ago)
-        daily_count = len(requests)
+        hourly = RateLimit(f"rate_limit:key:{key_id}:hour", hourly_limit, 3600)
+        daily = RateLimit(f"rate_limit:key:{key_id}:day", daily_limit, 86400)
+        result = await rate_limit_engine.hit([hourly, daily])
 
         # Check limits
-        if hourly_count >= hourly_limit:
-            return False, f"Rate limit exceeded: {hourly_count}/{hourly_limit} requests per hour"
-
-        if daily_count >= daily_limit:
-            return False, f"Rate limit exceeded: {daily_count}/{daily_limit} requests per day"
-
-        # Record this request
-        requests.append((now, 1))
+        if not result.allowed:
+            period = "hour" if result.limit is hourly else "day"
+            return False, f"Rate limit exceeded: {result.limit.limit} requests per {period}"
 
         return True, ""
 
@@ -221,3 +212,338 @@ async def get_user_from_api_key(
         )
 
     return user
+
+
+
+# Default daily limit used when no GlobalLimits row exists yet (matches LimitsService.get_global_limits)
+DEFAULT_MAX_API_REQUESTS_PER_DAY = 100
+
+
+class RequestPrincipal:
+    """Everything the product API hot path needs to know about the caller"""
+
+    __slots__ = (
+        "key_hash", "api_key_id", "api_key_active", "user_id", "username",
+        "user_active", "is_superuser", "workspace_id", "daily_limit",
+    )
+
+    def __init__(
+            self,
+            key_hash: str,
+            api_key_id: UUID,
+            api_key_active: bool,
+            user_id: UUID,
+            username: str,
+            user_active: bool,
+            is_superuser: bool,
+            workspace_id: Optional[UUID],
+            daily_limit: int
+    ):
+        self.key_hash = key_hash
+        self.api_key_id = api_key_id
+        self.api_key_active = api_key_active
+        self.user_id = user_id
+        self.username = username
+        self.user_active = user_active
+        self.is_superuser = is_superuser
+        self.workspace_id = workspace_id
+        self.daily_limit = daily_limit
+
+    def __repr__(self):
+        return f"<RequestPrincipal key={self.api_key_id} user={self.username}>"
+
+
+def _principal_query(key_hash: str):
+    """API key, owner, effective daily limit and workspace in a single statement"""
+    owner_workspace = (
+        select(Workspace.id)
+        .where(Workspace.owner_id == User.id)
+        .order_by(Workspace.created_at.asc())
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    member_workspace = (
+        select(Workspace.id)
+        .join(workspace_members, Workspace.id == workspace_members.c.workspace_id)
+        .where(workspace_members.c.user_id == User.id)
+        .order_by(Workspace.created_at.asc())
+        .limit(1)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    global_daily_limit = (
+        select(GlobalLimits.default_max_api_requests_per_day)
+        .where(GlobalLimits.is_active == True)
+        .order_by(GlobalLimits.created_at.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    # A UserLimits row either carries a custom limit or a copy of the global default,
+    # so falling back to the global value reproduces LimitsService.get_effective_limits
+    return (
+        select(
+            ProductAPIKey.id.label("api_key_id"),
+            ProductAPIKey.is_active.label("api_key_active"),
+            User.id.label("user_id"),
+            User.username.label("username"),
+            User.is_active.label("user_active"),
+            User.is_superuser.label("is_superuser"),
+            func.coalesce(owner_workspace, member_workspace).label("workspace_id"),
+            func.coalesce(
+                UserLimits.max_api_requests_per_day,
+                global_daily_limit,
+                DEFAULT_MAX_API_REQUESTS_PER_DAY
+            ).label("daily_limit"),
+        )
+        .join(User, User.id == ProductAPIKey.user_id)
+        .outerjoin(UserLimits, UserLimits.user_id == User.id)
+        .where(ProductAPIKey.key_hash == key_hash)
+    )
+
+
+class PrincipalCache:
+    """
+    Resolved callers by API key hash, held in each worker for PRINCIPAL_CACHE_TTL_SECONDS.
+
+    Writes to API keys, users and limits call invalidate(), which drops the affected
+    entries here and, via Redis pub/sub, in every other worker, so a deactivated or
+    deleted key stops authenticating everywhere at once; the TTL covers missed
+    notifications.
+    """
+
+    def __init__(self):
+        # key_hash -> (expires_at, principal or None for unknown keys)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[RequestPrincipal]]]" = OrderedDict()
+        # Bumped on every drop, so a load racing with a change is not kept
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def resolve(self, key_hash: str, session: Optional[AsyncSession] = None) -> Optional[RequestPrincipal]:
+        now = time.monotonic()
+        cached = self._entries.get(key_hash)
+        if cached and cached[0] > now:
+            self._entries.move_to_end(key_hash)
+            return cached[1]
+
+        generation = self._generation
+        if session is None:
+            async with AsyncSessionLocal() as own_session:
+                row = (await own_session.execute(_principal_query(key_hash))).first()
+        else:
+            row = (await session.execute(_principal_query(key_hash))).first()
+
+        principal = None
+        if row:
+            principal = RequestPrincipal(
+                key_hash=key_hash,
+                api_key_id=row.api_key_id,
+                api_key_active=bool(row.api_key_active),
+                user_id=row.user_id,
+                username=row.username,
+                user_active=bool(row.user_active),
+                is_superuser=bool(row.is_superuser),
+                workspace_id=row.workspace_id,
+                daily_limit=row.daily_limit,
+            )
+
+        if generation == self._generation:
+            self._entries[key_hash] = (now + settings.PRINCIPAL_CACHE_TTL_SECONDS, principal)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > settings.PRINCIPAL_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+
+        return principal
+
+    def _drop_local(self, key_hash: Optional[str] = None, user_id: Optional[str] = None):
+        self._generation += 1
+        if key_hash is None and user_id is None:
+            self._entries.clear()
+            return
+        if key_hash is not None:
+            self._entries.pop(key_hash, None)
+        if user_id is not None:
+            for cached_hash in [
+                cached_hash for cached_hash, (_, principal) in self._entries.items()
+                if principal is not None and str(principal.user_id) == user_id
+            ]:
+                del self._entries[cached_hash]
+
+    async def invalidate(self, key_hash: Optional[str] = None, user_id=None):
+        """Drop one key, every key of a user, or (neither given) everything, in all workers"""
+        user_id = str(user_id) if user_id is not None else None
+        self._drop_local(key_hash, user_id)
+        try:
+            await redis_client.publish(PRINCIPAL_CHANGE_CHANNEL, {"key_hash": key_hash, "user_id": user_id})
+        except Exception as e:
+            logger.warning(f"Principal cache invalidation failed: {e}")
+
+    # Change listener
+
+    async def start(self):
+        """Subscribe to the change channel"""
+        if self.running:
+            return
+
+        self.running = True
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop the change listener"""
+        self.running = False
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self):
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = await redis_client.pubsub()
+                await pubsub.subscribe(PRINCIPAL_CHANGE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self._drop_local(data.get("key_hash"), data.get("user_id"))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Notifications may have been missed while disconnected
+                logger.warning(f"Principal cache change listener error: {e}")
+                self._drop_local()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache()
+
+
+async def resolve_request_principal(key_hash: str, session: Optional[AsyncSession] = None) -> Optional[RequestPrincipal]:
+    """
+    Resolve the caller for an API key hash, cached for PRINCIPAL_CACHE_TTL_SECONDS.
+    Returns None for unknown keys; inactive keys/users are returned and rejected by the caller.
+    """
+    return await principal_cache.resolve(key_hash, session)
+
+
+async def invalidate_request_principal(key_hash: Optional[str] = None, user_id=None):
+    """Drop cached principals in every worker after keys, users or limits change"""
+    await principal_cache.invalidate(key_hash, user_id)
+
+
+class APIKeyUsageRecorder:
+    """Accumulates ProductAPIKey usage statistics and writes them in periodic batches"""
+
+    def __init__(self, flush_interval: float = 10.0):
+        self.flush_interval = flush_interval
+        self.pending: Dict[UUID, Tuple[int, datetime]] = {}
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, api_key_id: UUID):
+        count, _ = self.pending.get(api_key_id, (0, None))
+        self.pending[api_key_id] = (count + 1, datetime.now(timezone.utc))
+
+    async def start(self):
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Failed to flush API key usage: {e}")
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, {}
+        async with AsyncSessionLocal() as session:
+            for api_key_id, (count, last_used_at) in pending.items():
+                await session.execute(
+                    update(ProductAPIKey)
+                    .where(ProductAPIKey.id == api_key_id)
+                    .values(
+                        total_requests=func.coalesce(ProductAPIKey.total_requests, 0) + count,
+                        last_used_at=last_used_at
+                    )
+                )
+            await session.commit()
+
+
+# Global API key usage recorder instance
+api_key_usage_recorder = APIKeyUsageRecorder()
+
+
+async def get_request_principal(
+        request: Request,
+        credentials: HTTPAuthorizationCredentials = Depends(product_api_security),
+        session: AsyncSession = Depends(get_session)
+) -> RequestPrincipal:
+    """
+    Authenticate a product API request.
+    Reuses the principal resolved by ProductAPILoggingMiddleware when present.
+    """
+    if not credentials or not credentials.credentials:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="API key required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    key_hash = ProductAPIKey.hash_key(credentials.credentials)
+
+    principal = getattr(request.state, "principal", None)
+    if principal is None or principal.key_hash != key_hash:
+        auth_started = time.perf_counter()
+        principal = await resolve_request_principal(key_hash, session)
+        request.state.principal = principal
+        request.state.auth_seconds = getattr(request.state, "auth_seconds", 0.0) + time.perf_counter() - auth_started
+
+    if not principal or not principal.api_key_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or inactive API key",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if not principal.user_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="API key is invalid: associated user not found or inactive"
+        )
+
+    # Update usage statistics (written in batches)
+    api_key_usage_recorder.record(principal.api_key_id)
+
+    return principal
@@ -0,0 +1,90 @@
+from typing import Optional
+
+from starlette.types import Scope
+
+from app.models.product_api_key import ProductAPIKey
+
+# Key under which the parsed context is kept in the ASGI scope
+SCOPE_KEY = "xr2.request_context"
+
+# Path prefix -> route class, first match wins
+ROUTE_CLASSES = (
+    ("/api/v1/", "public_api"),
+    ("/internal/", "internal"),
+    ("/admin-docs", "docs"),
+    ("/admin", "admin"),
+    ("/docs", "docs"),
+    ("/redoc", "docs"),
+    ("/openapi.json", "docs"),
+    ("/api/docs", "docs"),
+    ("/api/openapi.json", "docs"),
+    ("/static", "static"),
+    ("/health", "service"),
+    ("/metrics", "service"),
+)
+
+
+def classify_route(path: str) -> str:
+    for prefix, route_class in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return route_class
+    return "other"
+
+
+class RequestContext:
+    """
+    What the middlewares need to know about a request, parsed from the raw ASGI
+    headers once and shared by every layer through the scope.
+
+    client_ip follows X-Forwarded-For, then X-Real-IP (the app runs behind nginx);
+    api_key_hash is the SHA-256 of the Bearer token, as stored in ProductAPIKey.key_hash.
+    """
+
+    __slots__ = ("client_ip", "api_key_hash", "route_class", "user_agent")
+
+    def __init__(self, client_ip: str, api_key_hash: Optional[str], route_class: str, user_agent: str):
+        self.client_ip = client_ip
+        self.api_key_hash = api_key_hash
+        self.route_class = route_class
+        self.user_agent = user_agent
+
+    @classmethod
+    def from_scope(cls, scope: Scope) -> "RequestContext":
+        forwarded_for = real_ip = authorization = None
+        user_agent = b""
+        for name, value in scope.get("headers") or ():
+            if name == b"x-forwarded-for":
+                forwarded_for = forwarded_for or value
+            elif name == b"x-real-ip":
+                real_ip = real_ip or value
+            elif name == b"authorization":
+                authorization = authorization or value
+            elif name == b"user-agent":
+                user_agent = user_agent or value
+
+        if forwarded_for:
+            client_ip = forwarded_for.decode("latin-1").split(",")[0].strip()
+        elif real_ip:
+            client_ip = real_ip.decode("latin-1")
+        else:
+            client = scope.get("client")
+            client_ip = client[0] if client else "unknown"
+
+        api_key_hash = None
+        if authorization and authorization.startswith(b"Bearer "):
+            api_key_hash = ProductAPIKey.hash_key(authorization[7:].decode("latin-1"))
+
+        return cls(
+            client_ip=client_ip,
+            api_key_hash=api_key_hash,
+            route_class=classify_route(scope["path"]),
+            user_agent=user_agent.decode("latin-1"),
+        )
+
+
+def get_request_context(scope: Scope) -> RequestContext:
+    """Context of the request, parsed by whichever middleware asks first"""
+    context = scope.get(SCOPE_KEY)
+    if context is None:
+        context = scope[SCOPE_KEY] = RequestContext.from_scope(scope)
+    return context
@@ -0,0 +1,27 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class ProxyHeadersMiddleware:
+    """
+    Trust the X-Forwarded-Proto / X-Forwarded-Host headers set by nginx, so URLs
+    generated by the app (redirects, admin links) use the public scheme and host.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            forwarded_proto = forwarded_host = None
+            for name, value in scope.get("headers") or ():
+                if name == b"x-forwarded-proto" and forwarded_proto is None:
+                    forwarded_proto = value.decode("latin-1")
+                elif name == b"x-forwarded-host" and forwarded_host is None:
+                    forwarded_host = value.decode("latin-1")
+
+            if forwarded_proto:
+                scope["scheme"] = forwarded_proto
+            if forwarded_host:
+                scope["server"] = (forwarded_host, 443 if scope.get("scheme") == "https" else 80)
+
+        await self.app(scope, receive, send)
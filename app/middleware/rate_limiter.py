@@ -1,46 +1,26 @@
 """
 Rate limiting middleware to prevent abuse of API endpoints
 """
-import time
-from collections import defaultdict, deque
-from typing import Dict, Tuple
+from typing import Tuple
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import logging
 
+from app.services.rate_limit import RateLimit, rate_limit_engine
+
 logger = logging.getLogger(__name__)
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter using sliding window"""
-
-    def __init__(self):
-        # Store request timestamps per IP
-        self.requests: Dict[str, deque] = defaultdict(lambda: deque())
+    """Per-IP rate limiter using sliding windows in the shared rate limit engine"""
 
-    def is_allowed(self, ip: str, max_requests: int, window_seconds: int) -> Tuple[bool, int]:
+    async def is_allowed(self, ip: str, max_requests: int, window_seconds: int) -> Tuple[bool, int]:
         """
         Check if request is allowed and return (allowed, remaining_requests)
         """
-        now = time.time()
-        window_start = now - window_seconds
-
-        # Clean old requests outside the window
-        ip_requests = self.requests[ip]
-        while ip_requests and ip_requests[0] < window_start:
-            ip_requests.popleft()
-
-        # Check if we're under the limit
-        current_requests = len(ip_requests)
-        if current_requests >= max_requests:
-            return False, 0
-
-        # Add current request
-        ip_requests.append(now)
-        remaining = max_requests - (current_requests + 1)
-
-        return True, remaining
+        result = await rate_limit_engine.hit([RateLimit(f"rate_limit:ip:{ip}:{window_seconds}", max_requests, window_seconds)])
+        return result.allowed, result.remaining
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
@@ -116,7 +96,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             return await call_next(request)
 
         max_requests, window_seconds = self.get_rate_limit(path)
-        allowed, remaining = self.limiter.is_allowed(client_ip, max_requests, window_seconds)
+        allowed, remaining = await self.limiter.is_allowed(client_ip, max_requests, window_seconds)
 
         if not allowed:
             logger.warning(f"Rate limit exceeded for IP {client_ip} on path {path}")
@@ -1,112 +1,59 @@
-import time
-import asyncio
-from typing import Dict, Optional
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-import redis.asyncio as redis
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.config import settings
+from app.middleware.context import RequestContext, get_request_context
+from app.services.rate_limit import RateLimit, RateLimitResult, rate_limit_engine
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Служебные пути без проверок: SAFE_PATHS точным совпадением, SAFE_PATH_PREFIXES
+# по префиксу ("/" префиксом пропускал бы вообще все запросы)
 SAFE_PATHS = {
-    "/", "/health",
+    "/", "/health", "/metrics",
+    "/redoc", "/openapi.json",
+    "/api/openapi.json",
+    "/admin-docs/openapi.json",
+}
+SAFE_PATH_PREFIXES = (
     "/static", "/admin/static",
-    "/docs", "/docs/", "/redoc", "/openapi.json",
-    "/api/docs", "/api/docs/", "/api/openapi.json",
-    "/admin-docs", "/admin-docs/", "/admin-docs/openapi.json",
+    "/docs", "/api/docs", "/admin-docs",
+)
+
+# Заголовки безопасности, добавляемые к каждому ответу
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
 }
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware:
     """
-    Комплексный middleware для защиты от DDoS, брутфорса и других атак
+    Комплексный middleware для защиты от DDoS, брутфорса и других атак.
+
+    Чистый ASGI: IP клиента, хеш API ключа и класс маршрута берутся из общего
+    RequestContext, ответ проходит потоком, заголовки безопасности добавляются
+    в http.response.start.
     """
     
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
-        self.redis_client = None
-        self.request_counts: Dict[str, Dict[str, int]] = {}
-        self.blocked_ips: Dict[str, float] = {}
+        self.app = app
         
         # Настройки защиты
         self.max_requests_per_minute = int(getattr(settings, 'MAX_REQUESTS_PER_IP_PER_MINUTE', 100))
         self.max_requests_per_api_key = int(getattr(settings, 'MAX_REQUESTS_PER_API_KEY_PER_MINUTE', 1000))
         self.block_duration = 300  # 5 минут блокировки
-        self.cleanup_interval = 60  # Очистка каждую минуту
-        
-        # Запускаем периодическую очистку
-        asyncio.create_task(self._periodic_cleanup())
     
-    async def _get_redis_client(self):
-        """Получение Redis клиента"""
-        if not self.redis_client:
-            try:
-                self.redis_client = redis.from_url(
-                    getattr(settings, 'REDIS_URL', 'redis://localhost:6379/0'),
-                    decode_responses=True
-                )
-            except Exception as e:
-                logger.warning(f"Redis недоступен: {e}")
-                self.redis_client = None
-        return self.redis_client
-    
-    async def _periodic_cleanup(self):
-        """Периодическая очистка старых записей"""
-        while True:
-            try:
-                await asyncio.sleep(self.cleanup_interval)
-                current_time = time.time()
-                
-                # Очистка заблокированных IP
-                expired_ips = [
-                    ip for ip, block_time in self.blocked_ips.items()
-                    if current_time - block_time > self.block_duration
-                ]
-                for ip in expired_ips:
-                    del self.blocked_ips[ip]
-                
-                # Очистка счетчиков запросов
-                expired_requests = []
-                for key, data in self.request_counts.items():
-                    if current_time - data.get('first_request', 0) > 60:
-                        expired_requests.append(key)
-                
-                for key in expired_requests:
-                    del self.request_counts[key]
-                    
-            except Exception as e:
-                logger.error(f"Ошибка при очистке: {e}")
-    
-    def _get_client_ip(self, request: Request) -> str:
-        """Получение реального IP клиента"""
-        # Проверяем заголовки прокси
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
-        
-        return request.client.host if request.client else "unknown"
-    
-    def _get_api_key(self, request: Request) -> Optional[str]:
-        """Извлечение API ключа из заголовков"""
-        authorization = request.headers.get("Authorization")
-        if authorization and authorization.startswith("Bearer "):
-            return authorization[7:]
-        return None
-    
-    def _is_suspicious_request(self, request: Request) -> bool:
+    def _is_suspicious_request(self, context: RequestContext, path: str) -> bool:
         """Проверка на подозрительные запросы"""
         # Skip security checks for localhost in development
-        client_ip = self._get_client_ip(request)
-        if client_ip in ['127.0.0.1', 'localhost', '::1']:
+        if context.client_ip in ['127.0.0.1', 'localhost', '::1']:
             return False
             
-        user_agent = request.headers.get("User-Agent", "").lower()
+        user_agent = context.user_agent.lower()
         
         # Подозрительные User-Agent
         suspicious_patterns = [
@@ -129,147 +76,86 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "/.git", "/.svn", "/backup", "/test", "/debug"
         ]
         
-        for path in suspicious_paths:
-            if path in request.url.path:
+        for suspicious_path in suspicious_paths:
+            if suspicious_path in path:
                 return True
         
         return False
     
-    async def _check_rate_limit(self, request: Request) -> bool:
-        """Проверка лимитов запросов"""
-        client_ip = self._get_client_ip(request)
-        api_key = self._get_api_key(request)
-        current_time = time.time()
-        
-        # Проверка блокировки IP
-        if client_ip in self.blocked_ips:
-            block_time = self.blocked_ips[client_ip]
-            if current_time - block_time < self.block_duration:
-                return False
-            else:
-                del self.blocked_ips[client_ip]
+    async def _check_rate_limit(self, context: RequestContext) -> RateLimitResult:
+        """Проверка лимитов запросов: IP и API ключ одним вызовом, общие для всех воркеров"""
+        # При превышении лимита IP блокируется на block_duration
+        limits = [RateLimit(f"rate_limit:ip:{context.client_ip}", self.max_requests_per_minute, 60, self.block_duration)]
         
-        # Проверка Redis (если доступен)
-        redis_client = await self._get_redis_client()
-        if redis_client:
-            try:
-                # Лимит по IP
-                ip_key = f"rate_limit:ip:{client_ip}"
-                ip_count = await redis_client.incr(ip_key)
-                if ip_count == 1:
-                    await redis_client.expire(ip_key, 60)
-                
-                if ip_count > self.max_requests_per_minute:
-                    # Блокируем IP
-                    self.blocked_ips[client_ip] = current_time
-                    await redis_client.setex(f"blocked_ip:{client_ip}", self.block_duration, "1")
-                    return False
-                
-                # Лимит по API ключу
-                if api_key:
-                    api_key_key = f"rate_limit:api_key:{api_key}"
-                    api_count = await redis_client.incr(api_key_key)
-                    if api_count == 1:
-                        await redis_client.expire(api_key_key, 60)
-                    
-                    if api_count > self.max_requests_per_api_key:
-                        return False
-                        
-            except Exception as e:
-                logger.warning(f"Ошибка Redis: {e}")
+        # Лимит по API ключу (в ключе хранится хеш, а не сам API ключ)
+        if context.api_key_hash:
+            limits.append(RateLimit(f"rate_limit:api_key:{context.api_key_hash}", self.max_requests_per_api_key, 60))
         
-        # Fallback на локальное хранение
-        else:
-            # Лимит по IP
-            ip_key = f"ip:{client_ip}"
-            if ip_key not in self.request_counts:
-                self.request_counts[ip_key] = {
-                    'count': 0,
-                    'first_request': current_time
-                }
-            
-            data = self.request_counts[ip_key]
-            if current_time - data['first_request'] > 60:
-                data['count'] = 0
-                data['first_request'] = current_time
-            
-            data['count'] += 1
-            
-            if data['count'] > self.max_requests_per_minute:
-                self.blocked_ips[client_ip] = current_time
-                return False
-            
-            # Лимит по API ключу
-            if api_key:
-                api_key_key = f"api_key:{api_key}"
-                if api_key_key not in self.request_counts:
-                    self.request_counts[api_key_key] = {
-                        'count': 0,
-                        'first_request': current_time
-                    }
-                
-                api_data = self.request_counts[api_key_key]
-                if current_time - api_data['first_request'] > 60:
-                    api_data['count'] = 0
-                    api_data['first_request'] = current_time
-                
-                api_data['count'] += 1
-                
-                if api_data['count'] > self.max_requests_per_api_key:
-                    return False
-        
-        return True
+        return await rate_limit_engine.hit(limits)
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Основная логика middleware"""
-        try:
-            # Skip security checks for health endpoint
-            path = request.url.path
-            # пускаем служебные пути без проверок
-            if any(path.startswith(p) for p in SAFE_PATHS):
-                return await call_next(request)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        # пускаем служебные пути без проверок
+        if path in SAFE_PATHS or path.startswith(SAFE_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        context = get_request_context(scope)
+        response_started = False
+
+        async def send_with_security_headers(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+
+                # Логирование подозрительной активности
+                if message["status"] >= 400:
+                    logger.warning(f"HTTP {message['status']} от {context.client_ip}: {path}")
+            await send(message)
 
+        try:
             # Проверка на подозрительные запросы
-            if self._is_suspicious_request(request):
-                logger.warning(f"Подозрительный запрос от {self._get_client_ip(request)}: {path}")
-                return JSONResponse(
+            if self._is_suspicious_request(context, path):
+                logger.warning(f"Подозрительный запрос от {context.client_ip}: {path}")
+                response = JSONResponse(
                     status_code=status.HTTP_403_FORBIDDEN,
                     content={"detail": "Access denied"}
                 )
+                await response(scope, receive, send)
+                return
             
             # Проверка лимитов запросов
-            if not await self._check_rate_limit(request):
-                client_ip = self._get_client_ip(request)
-                logger.warning(f"Превышен лимит запросов для IP: {client_ip}")
-                return JSONResponse(
+            rate_limit = await self._check_rate_limit(context)
+            if not rate_limit.allowed:
+                logger.warning(f"Превышен лимит запросов для IP: {context.client_ip}")
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     content={
                         "detail": "Too many requests",
-                        "retry_after": self.block_duration
+                        "retry_after": rate_limit.retry_after_seconds
                     },
-                    headers={"Retry-After": str(self.block_duration)}
+                    headers={"Retry-After": str(rate_limit.retry_after_seconds)}
                 )
-            
-            # Добавляем заголовки безопасности
-            response = await call_next(request)
-            
-            # Заголовки безопасности
-            response.headers["X-Content-Type-Options"] = "nosniff"
-            response.headers["X-Frame-Options"] = "DENY"
-            response.headers["X-XSS-Protection"] = "1; mode=block"
-            response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-            
-            # Логирование подозрительной активности
-            if response.status_code >= 400:
-                client_ip = self._get_client_ip(request)
-                logger.warning(f"HTTP {response.status_code} от {client_ip}: {path}")
-            
-            return response
+                await response(scope, receive, send)
+                return
+
+            await self.app(scope, receive, send_with_security_headers)
             
         except Exception as e:
             logger.error(f"Ошибка в SecurityMiddleware: {e}")
-            return JSONResponse(
+            if response_started:
+                # Ответ уже частично отправлен, заменить его нельзя
+                raise
+            response = JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": "Internal server error"}
             )
-
+            await response(scope, receive, send)
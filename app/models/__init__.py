@@ -5,7 +5,7 @@ from .prompt import Prompt, PromptVersion, Tag
 from .llm import LLMProvider, UserAPIKey
 from .user_limits import UserLimits, GlobalLimits, UserAPIUsage
 from .public_share import PublicShare
-from .analytics import PromptEvent, ConversionFunnel, CustomFunnelConfiguration, ABTest
+from .analytics import PromptEvent, PromptEventKey, ConversionFunnel, CustomFunnelConfiguration, ABTest
 
 __all__ = [
     "User",
@@ -20,6 +20,7 @@ __all__ = [
     "UserAPIUsage",
     "PublicShare",
     "PromptEvent",
+    "PromptEventKey",
     "ConversionFunnel",
     "CustomFunnelConfiguration",
     "ABTest",
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, String, UUID, TIMESTAMP, Integer, Numeric, Boolean, JSON, ForeignKey, Index, \
-    UniqueConstraint
+    UniqueConstraint, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.core.database import Base
 import uuid
 from datetime import datetime
@@ -16,13 +16,15 @@ class PromptEvent(Base):
     prompt_id = Column(UUID(as_uuid=True), ForeignKey("prompts.id"))
     prompt_version_id = Column(UUID(as_uuid=True), ForeignKey("prompt_versions.id"))
     event_type = Column(String(50), nullable=False)
+    event_name = Column(String(100))  # Custom events: event_metadata["event_name"], as an indexed column
+    category = Column(String(100))  # Custom events: event_metadata["category"]
     outcome = Column(String(50))
     session_id = Column(String(100))
     user_id = Column(String(255))
     event_metadata = Column(JSONB)
     business_metrics = Column(JSONB)
     error_details = Column(JSONB)
-    created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
+    created_at = Column(TIMESTAMP(timezone=True), primary_key=True, default=datetime.utcnow)  # Partition key
     updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
@@ -33,6 +35,30 @@ class PromptEvent(Base):
     __table_args__ = (
         Index('idx_events_workspace_created', 'workspace_id', 'created_at'),
         Index('idx_events_prompt_outcome', 'prompt_id', 'outcome', 'created_at'),
+        Index('idx_events_workspace_name_created', 'workspace_id', 'event_name', 'category', 'created_at'),
+        # Monthly range partitions on created_at, maintained by app/services/partitions.py
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+
+class PromptEventKey(Base):
+    """
+    Deduplication key of custom events: one row per (trace_id, event_name, category).
+
+    A unique index on the partitioned prompt_events would have to include created_at,
+    so uniqueness is enforced here; ingestion claims the key with
+    INSERT ... ON CONFLICT DO NOTHING and only then writes the event.
+    """
+    __tablename__ = "prompt_event_keys"
+
+    trace_id = Column(String(100), primary_key=True)
+    event_name = Column(String(100), primary_key=True)
+    category = Column(String(100), primary_key=True)
+    event_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)  # Of the event; keys are pruned with its partition
+
+    __table_args__ = (
+        Index('idx_event_keys_created', 'created_at'),
     )
 
 
@@ -53,6 +79,8 @@ class PromptMetricsHourly(Base):
     total_value = Column(Numeric(12, 2), default=0)
     conversion_count = Column(Integer, default=0)
     unique_users = Column(Integer, default=0)
+    # Redis HyperLogLog of the bucket's user ids; PFMERGE of several rows counts users across hours
+    unique_users_hll = deferred(Column(LargeBinary))
     avg_response_time_ms = Column(Integer)
     token_cost = Column(Numeric(10, 4), default=0)
     error_count = Column(Integer, default=0)
@@ -60,7 +88,8 @@ class PromptMetricsHourly(Base):
     updated_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
 
     __table_args__ = (
-        UniqueConstraint('workspace_id', 'prompt_id', 'prompt_version_id', 'hour_bucket'),
+        UniqueConstraint('workspace_id', 'prompt_id', 'prompt_version_id', 'hour_bucket',
+                         name='uq_metrics_hourly_bucket', postgresql_nulls_not_distinct=True),
         Index('idx_metrics_workspace_hour', 'workspace_id', 'hour_bucket'),
         Index('idx_metrics_prompt_hour', 'prompt_id', 'hour_bucket'),
     )
@@ -143,6 +143,8 @@ class ProductAPIKey(Base):
 class ProductAPILog(Base):
     """Model for logging API-as-Product requests and responses"""
     __tablename__ = "product_api_logs"
+    # Monthly range partitions on created_at, maintained by app/services/partitions.py
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_at)'}
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     
@@ -150,7 +152,7 @@ class ProductAPILog(Base):
     api_key_id = Column(UUID(as_uuid=True), ForeignKey('product_api_keys.id'), nullable=False, index=True)
     
     # Request details
-    request_id = Column(String(100), unique=True, index=True)
+    request_id = Column(String(100), index=True)  # Not UNIQUE: unique keys of a partitioned table must include created_at
     trace_id = Column(String(100), nullable=True, index=True)  # For tracking events
     endpoint = Column(String(200), nullable=False)
     method = Column(String(10), nullable=False)
@@ -177,7 +179,7 @@ class ProductAPILog(Base):
     user_agent = Column(String(500), nullable=True)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), index=True)  # Partition key
     
     # Relationships
     api_key = relationship("ProductAPIKey", back_populates="api_logs")
@@ -8,7 +8,7 @@ from sqlalchemy import (
     Index,
     UniqueConstraint
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -50,6 +50,7 @@ class PromptStats(Base):
     avg_latency_ms = Column(Integer, default=0)        # Cached average
     min_latency_ms = Column(Integer, nullable=True)
     max_latency_ms = Column(Integer, nullable=True)
+    latency_sketch = Column(JSONB, nullable=True)      # Mergeable quantile sketch, see app/services/latency_sketch.py
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -101,3 +102,15 @@ class PromptStats(Base):
     
     def __repr__(self):
         return f"<PromptStats: {self.prompt_id}/{self.source_name} ({self.period_type})>"
+
+
+class StatsAggregationWatermark(Base):
+    """High-water mark on product_api_logs.created_at up to which PromptStats are aggregated"""
+    __tablename__ = "stats_aggregation_watermarks"
+
+    period_type = Column(String(20), primary_key=True)  # 'hour', 'day'
+    watermark = Column(DateTime(timezone=True), nullable=False)  # Logs before this are aggregated
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<StatsAggregationWatermark: {self.period_type} @ {self.watermark}>"
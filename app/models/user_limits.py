@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Boolean, func
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Boolean, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta, timezone
@@ -72,6 +72,10 @@ class UserAPIUsage(Base):
     
     # Relationship
     user = relationship("User")
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'date', name='uq_user_api_usage_user_date'),
+    )
     
     def __repr__(self):
         return f"<UserAPIUsage user_id={self.user_id} date={self.date.date()} requests={self.api_requests_count}>"
@@ -44,7 +44,7 @@ async def run_aggregation(period_type: str, verbose: bool = False):
 
 
 async def run_historical_aggregation(period_type: str, days_back: int = 7):
-    """Run aggregation for historical data"""
+    """Run aggregation for historical data in one set-based pass"""
     
     engine = create_async_engine(settings.DATABASE_URL, echo=False)
     
@@ -53,44 +53,21 @@ async def run_historical_aggregation(period_type: str, days_back: int = 7):
             stats_service = StatisticsService(session)
             
             if period_type == "hour":
-                # Aggregate hourly for each hour in the past N days
-                total_processed = 0
-                current_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-                
-                for i in range(days_back * 24):  # N days * 24 hours
-                    period_start = current_time - timedelta(hours=i+1)
-                    period_end = period_start + timedelta(hours=1)
-                    
-                    print(f"Processing hour: {period_start} to {period_end}")
-                    
-                    count = await stats_service.aggregate_stats_for_period(
-                        period_type="hour", 
-                        period_start=period_start,
-                        period_end=period_end
-                    )
-                    total_processed += count
-                    
-                print(f"Historical aggregation completed. Total records: {total_processed}")
-                
-            elif period_type == "day":
-                # Aggregate daily for each day in the past N days
-                total_processed = 0
-                current_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-                
-                for i in range(days_back):
-                    period_start = current_date - timedelta(days=i+1)
-                    period_end = period_start + timedelta(days=1)
-                    
-                    print(f"Processing day: {period_start} to {period_end}")
-                    
-                    count = await stats_service.aggregate_stats_for_period(
-                        period_type="day",
-                        period_start=period_start, 
-                        period_end=period_end
-                    )
-                    total_processed += count
-                    
-                print(f"Historical aggregation completed. Total records: {total_processed}")
+                period_end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+            else:  # day
+                period_end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            period_start = period_end - timedelta(days=days_back)
+            
+            print(f"Processing {period_type}s: {period_start} to {period_end}")
+            
+            # Every hour/day in the range is grouped and upserted by a single statement
+            total_processed = await stats_service.aggregate_stats_for_period(
+                period_type=period_type,
+                period_start=period_start,
+                period_end=period_end
+            )
+            
+            print(f"Historical aggregation completed. Total records: {total_processed}")
             
     finally:
         await engine.dispose()
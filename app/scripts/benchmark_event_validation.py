@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-event definition lookup and validation
+
+"before" is what POST /api/v1/events did per event: load the EventDefinition row
+and walk its required_fields dicts. "after" is a warm EventDefinitionRegistry
+lookup plus the definition's compiled validator, which also checks field types
+and validation rules.
+
+Without --database only the in-process work is timed (the legacy query is left
+out, so "before" is understated). With --database the legacy SELECT is run
+against the configured database for a random workspace, i.e. one round-trip per
+event, and the registry is loaded once from the same database.
+
+Usage:
+    python -m app.scripts.benchmark_event_validation [--events=100000] [--fields=10] [--database]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app.models.analytics import EventDefinition
+from app.services.event_registry import CompiledDefinition, event_registry
+
+
+def make_definition(fields: int) -> EventDefinition:
+    return EventDefinition(
+        id=uuid.uuid4(),
+        workspace_id=uuid.uuid4(),
+        event_name="purchase_completed",
+        category="revenue",
+        required_fields=[{"name": f"field_{i}", "type": "string"} for i in range(fields)]
+                        + [{"name": "amount", "type": "number", "validation": {"min": 0}}],
+        optional_fields=[{"name": "coupon", "type": "string"}],
+        validation_rules=[{"field": "currency", "enum": ["USD", "EUR", "GBP"]}],
+        is_active=True,
+    )
+
+
+def legacy_missing_field(event_def: EventDefinition, fields: dict):
+    for field_def in event_def.required_fields or []:
+        field_name = field_def.get("name")
+        if field_name not in fields:
+            return field_name
+    return None
+
+
+def time_loop(function, events: int) -> float:
+    """Mean microseconds per call"""
+    for _ in range(min(1000, events)):
+        function()
+    started = time.perf_counter()
+    for _ in range(events):
+        function()
+    return (time.perf_counter() - started) / events * 1_000_000
+
+
+async def time_database(events: int, fields: dict) -> tuple:
+    from app.core.database import AsyncSessionLocal
+
+    workspace_id = uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        async def before():
+            result = await db.execute(
+                select(EventDefinition).where(
+                    EventDefinition.workspace_id == workspace_id,
+                    EventDefinition.event_name == "purchase_completed",
+                    EventDefinition.category == "revenue",
+                    EventDefinition.is_active == True
+                )
+            )
+            event_def = result.scalar_one_or_none()
+            if event_def:
+                legacy_missing_field(event_def, fields)
+
+        async def after():
+            event_def = await event_registry.get(db, workspace_id, "purchase_completed", "revenue")
+            if event_def:
+                event_def.validate(fields)
+
+        timings = []
+        for function in (before, after):
+            await function()
+            started = time.perf_counter()
+            for _ in range(events):
+                await function()
+            timings.append((time.perf_counter() - started) / events * 1_000_000)
+    return tuple(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-event definition lookup and validation")
+    parser.add_argument("--events", type=int, default=100_000, help="Events per measurement")
+    parser.add_argument("--fields", type=int, default=10, help="Required string fields in the definition")
+    parser.add_argument("--database", action="store_true", help="Include the legacy per-event SELECT")
+    args = parser.parse_args()
+
+    definition = make_definition(args.fields)
+    compiled = CompiledDefinition(definition)
+    definitions = {(definition.event_name, definition.category): compiled}
+    fields = {f"field_{i}": "value" for i in range(args.fields)}
+    fields.update({"amount": 49.0, "currency": "EUR"})
+
+    before = time_loop(lambda: legacy_missing_field(definition, fields), args.events)
+    after = time_loop(lambda: definitions.get(("purchase_completed", "revenue")).validate(fields), args.events)
+    print(f"In-process, {args.fields + 1} required fields ({args.events} events)")
+    print(f"  before (required fields only, no query): {before:.2f} us/event")
+    print(f"  after (registry hit, types and rules):   {after:.2f} us/event")
+
+    if args.database:
+        events = min(args.events, 5000)
+        before, after = asyncio.run(time_database(events, fields))
+        print()
+        print(f"With database ({events} events)")
+        print(f"  before (SELECT per event): {before:.1f} us/event")
+        print(f"  after (registry):          {after:.1f} us/event ({before / max(after, 0.01):.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
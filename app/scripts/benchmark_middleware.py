@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of per-layer middleware overhead
+
+Drives an ASGI stack in-process with synthetic POST /api/v1/get-prompt requests
+(no server, no network) and reports the cost each middleware layer adds over a
+bare endpoint. "before" are the previous BaseHTTPMiddleware implementations of
+the security, product logging and proxy headers layers (reduced to the work they
+did per request without a database); "after" are the pure ASGI middlewares in
+app.middleware sharing one RequestContext.
+
+Requests carry no API key, so no database is needed; rate limits are counted by the
+in-process limiter (no Redis), with limits high enough never to reject.
+
+Usage:
+    python -m app.scripts.benchmark_middleware [--requests=20000] [--body-bytes=2048]
+"""
+
+import asyncio
+import argparse
+import json
+import time
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.middleware.product_logging import ProductAPILoggingMiddleware
+from app.middleware.proxy_headers import ProxyHeadersMiddleware
+from app.core.config import settings
+from app.middleware.security import SAFE_PATH_PREFIXES, SAFE_PATHS, SecurityMiddleware
+from app.services.rate_limit import RateLimit, rate_limit_engine
+
+
+class LegacySecurityMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if path in SAFE_PATHS or path.startswith(SAFE_PATH_PREFIXES):
+            return await call_next(request)
+        client_ip = request.headers.get("x-forwarded-for", request.client.host)
+        limit = settings.MAX_REQUESTS_PER_IP_PER_MINUTE
+        await rate_limit_engine.hit([RateLimit(f"rate_limit:ip:{client_ip}", limit, 60, 300)])
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
+
+
+class LegacyProductLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if not request.url.path.startswith("/api/v1/"):
+            return await call_next(request)
+
+        # The body is cached on the request and replayed to the endpoint
+        await request.body()
+        auth_header = request.headers.get("authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            pass  # the database lookup is left out
+
+        response = await call_next(request)
+        chunks = [chunk async for chunk in response.body_iterator]
+        return Response(
+            content=b"".join(chunks),
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            media_type=response.headers.get("content-type")
+        )
+
+
+class LegacyProxyHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if "x-forwarded-proto" in request.headers:
+            request.scope["scheme"] = request.headers["x-forwarded-proto"]
+        if "x-forwarded-host" in request.headers:
+            request.scope["server"] = (request.headers["x-forwarded-host"], 443 if request.scope.get("scheme") == "https" else 80)
+        return await call_next(request)
+
+
+# (layer, before, after), innermost first as in main.py
+LAYERS = [
+    ("security", LegacySecurityMiddleware, SecurityMiddleware),
+    ("product_logging", LegacyProductLoggingMiddleware, ProductAPILoggingMiddleware),
+    ("proxy_headers", LegacyProxyHeadersMiddleware, ProxyHeadersMiddleware),
+]
+
+
+def make_endpoint(body_bytes: int):
+    payload = json.dumps({"system_prompt": "x" * body_bytes}).encode()
+
+    async def endpoint(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    return endpoint
+
+
+def make_scope() -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/v1/get-prompt",
+        "raw_path": b"/api/v1/get-prompt",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"xr2.uk"),
+            (b"user-agent", b"xr2-sdk/1.0"),
+            (b"content-type", b"application/json"),
+            (b"x-forwarded-for", b"203.0.113.7"),
+            (b"x-forwarded-proto", b"https"),
+            (b"x-forwarded-host", b"xr2.uk"),
+        ],
+        "client": ("10.0.0.2", 51000),
+        "server": ("app", 8000),
+        "state": {},
+    }
+
+
+async def time_stack(app, requests: int) -> float:
+    """Mean microseconds per request through app"""
+    request_body = json.dumps({"slug": "welcome", "source_name": "benchmark"}).encode()
+
+    async def send(message):
+        pass
+
+    async def one_request():
+        body_sent = False
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": request_body, "more_body": False}
+            # Like a server: nothing more until the client disconnects
+            await asyncio.Event().wait()
+
+        await app(make_scope(), receive, send)
+
+    for _ in range(min(500, requests)):
+        await one_request()
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await one_request()
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+def build(endpoint, middlewares):
+    app = endpoint
+    for middleware in middlewares:
+        app = middleware(app)
+    return app
+
+
+async def run_benchmark(requests: int, body_bytes: int):
+    endpoint = make_endpoint(body_bytes)
+    bare = await time_stack(endpoint, requests)
+    print(f"Bare endpoint: {bare:.1f} us/request ({requests} requests, {body_bytes} byte responses)")
+    print()
+    print(f"{'layer':<18}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+
+    for name, before_cls, after_cls in LAYERS:
+        before = await time_stack(build(endpoint, [before_cls]), requests) - bare
+        after = await time_stack(build(endpoint, [after_cls]), requests) - bare
+        print(f"{name:<18}{before:>14.1f}{after:>14.1f}{before / max(after, 0.1):>9.1f}x")
+
+    before = await time_stack(build(endpoint, [before for _, before, _ in LAYERS]), requests) - bare
+    after = await time_stack(build(endpoint, [after for _, _, after in LAYERS]), requests) - bare
+    print(f"{'all three':<18}{before:>14.1f}{after:>14.1f}{before / max(after, 0.1):>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-layer middleware overhead")
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests per measured stack")
+    parser.add_argument("--body-bytes", type=int, default=2048, help="Size of the endpoint response")
+    args = parser.parse_args()
+
+    # Measure the limiter's work, not Redis round-trips or rejections
+    rate_limit_engine.use_redis = False
+    settings.MAX_REQUESTS_PER_IP_PER_MINUTE = 10 ** 9
+
+    asyncio.run(run_benchmark(args.requests, args.body_bytes))
+
+
+if __name__ == "__main__":
+    main()
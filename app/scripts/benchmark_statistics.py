@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark for StatisticsService log queries
+
+Seeds a throwaway user/prompt/API key with N synthetic product_api_logs rows,
+then times the previous row-loading implementation (ORM objects + Python loops)
+against the SQL-side aggregates in StatisticsService. Seeded data is removed
+afterwards unless --keep is given.
+
+Usage:
+    python -m app.scripts.benchmark_statistics [--rows=1000000] [--hours=24] [--keep]
+"""
+
+import asyncio
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, text, and_
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+from app.core.config import settings
+from app.models.user import User
+from app.models.workspace import Workspace
+from app.models.prompt import Prompt, PromptVersion, VersionStatus
+from app.models.product_api_key import ProductAPIKey, ProductAPILog
+from app.services.statistics import StatisticsService
+
+
+SEED_LOGS_SQL = text("""
+    INSERT INTO product_api_logs (
+        id, api_key_id, request_id, endpoint, method, prompt_id, prompt_version_id,
+        request_params, request_body, response_body, latency_ms, status_code,
+        is_success, client_ip, user_agent, created_at
+    )
+    SELECT
+        gen_random_uuid(),
+        :api_key_id,
+        'bench_' || :run_id || '_' || g,
+        '/api/v1/get-prompt',
+        'POST',
+        :prompt_id,
+        (ARRAY[:v1, :v2, :v3]::uuid[])[1 + g % 3],
+        '{}'::json,
+        json_build_object('slug', 'bench', 'source_name', 'source_' || (g % 7)),
+        json_build_object('system_prompt', repeat('x', 1000), 'trace_id', 'evt_' || g),
+        20 + (g::bigint * 7919) % 400,
+        CASE WHEN g % 20 = 0 THEN 404 WHEN g % 33 = 0 THEN 500 ELSE 200 END,
+        NOT (g % 20 = 0 OR g % 33 = 0),
+        '127.0.0.1',
+        'benchmark',
+        now() - ((g % 86400) || ' seconds')::interval
+    FROM generate_series(1, :rows) AS g
+""")
+
+
+async def seed(session: AsyncSession, rows: int) -> dict:
+    """Create the throwaway owner, prompt, versions, API key and log rows"""
+    run_id = uuid.uuid4().hex[:8]
+    user = User(username=f"bench_{run_id}", email=f"bench_{run_id}@example.com",
+                hashed_password="x", is_active=True)
+    session.add(user)
+    await session.flush()
+
+    workspace = Workspace(name=f"bench {run_id}", slug=f"bench-{run_id}", owner_id=user.id)
+    session.add(workspace)
+    await session.flush()
+
+    prompt = Prompt(name=f"bench {run_id}", slug=f"bench-{run_id}", workspace_id=workspace.id, created_by=user.id)
+    session.add(prompt)
+    await session.flush()
+
+    versions = [
+        PromptVersion(prompt_id=prompt.id, version_number=n, system_prompt="bench",
+                      status=VersionStatus.DRAFT, created_by=user.id)
+        for n in (1, 2, 3)
+    ]
+    session.add_all(versions)
+
+    _, key_hash, key_prefix, encrypted_key = ProductAPIKey.generate_api_key()
+    api_key = ProductAPIKey(name=f"bench {run_id}", key_hash=key_hash, key_prefix=key_prefix,
+                            encrypted_key=encrypted_key, user_id=user.id)
+    session.add(api_key)
+    await session.flush()
+
+    await session.execute(SEED_LOGS_SQL, {
+        "api_key_id": api_key.id, "run_id": run_id, "prompt_id": prompt.id,
+        "v1": versions[0].id, "v2": versions[1].id, "v3": versions[2].id, "rows": rows,
+    })
+    await session.commit()
+    await session.execute(text("ANALYZE product_api_logs"))
+
+    return {"user": user, "workspace": workspace, "prompt": prompt, "versions": versions, "api_key": api_key}
+
+
+async def cleanup(session: AsyncSession, seeded: dict):
+    await session.execute(delete(ProductAPILog).where(ProductAPILog.api_key_id == seeded["api_key"].id))
+    await session.execute(delete(ProductAPIKey).where(ProductAPIKey.id == seeded["api_key"].id))
+    await session.execute(delete(PromptVersion).where(PromptVersion.prompt_id == seeded["prompt"].id))
+    await session.execute(delete(Prompt).where(Prompt.id == seeded["prompt"].id))
+    await session.execute(delete(Workspace).where(Workspace.id == seeded["workspace"].id))
+    await session.execute(delete(User).where(User.id == seeded["user"].id))
+    await session.commit()
+
+
+async def legacy_prompt_stats(session: AsyncSession, prompt_id, cutoff_time) -> int:
+    """The previous approach: load every log row of the window and aggregate in Python"""
+    result = await session.execute(
+        select(ProductAPILog).where(
+            and_(ProductAPILog.prompt_id == prompt_id, ProductAPILog.created_at >= cutoff_time)
+        )
+    )
+    logs = result.scalars().all()
+
+    source_stats = {}
+    version_stats = {}
+    for log in logs:
+        source_name = "unknown"
+        if log.request_body and isinstance(log.request_body, dict):
+            source_name = log.request_body.get("source_name", "unknown")
+        source_stats.setdefault(source_name, {"total": 0, "successful": 0})["total"] += 1
+        version_stats.setdefault(str(log.prompt_version_id), []).append(log.latency_ms)
+
+    session.expunge_all()
+    return len(logs)
+
+
+async def timed(label: str, coro):
+    started = time.perf_counter()
+    value = await coro
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<40} {elapsed * 1000:>10.1f} ms")
+    return value
+
+
+async def run_benchmark(rows: int, hours: int, keep: bool):
+    engine = create_async_engine(settings.DATABASE_URL, echo=False)
+
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            print(f"Seeding {rows} product_api_logs rows...")
+            started = time.perf_counter()
+            seeded = await seed(session, rows)
+            print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+            prompt_id = seeded["prompt"].id
+            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+            stats_service = StatisticsService(session)
+
+            try:
+                print("Before (load rows, aggregate in Python):")
+                await timed("get_prompt_stats (legacy)", legacy_prompt_stats(session, prompt_id, cutoff_time))
+
+                print("After (SQL aggregates):")
+                await timed("get_prompt_stats", stats_service.get_prompt_stats(prompt_id, hours))
+                await timed("get_prompt_version_stats",
+                            stats_service.get_prompt_version_stats(seeded["versions"][0].id, hours))
+                await timed("get_api_key_stats", stats_service.get_api_key_stats(seeded["api_key"].id, hours))
+                await timed("get_overall_stats", stats_service.get_overall_stats(hours, seeded["user"].id))
+            finally:
+                if not keep:
+                    await cleanup(session, seeded)
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark StatisticsService log queries")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of log rows to seed")
+    parser.add_argument("--hours", type=int, default=24, help="Statistics window in hours")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded rows")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.rows, args.hours, args.keep))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Accuracy and memory benchmark: exact Redis SETs vs HyperLogLog for unique users
+
+"set" is the previous approach (SADD + SCARD per hour bucket), "hll" is the
+current one (PFADD + PFCOUNT, registers stored with the bucket). For each
+cardinality it reports the Redis memory of one bucket and the count error; it
+then spreads users over 24 hourly buckets with returning users and compares a
+day's unique users from SUNIONSTORE, from PFMERGE and from summing the hours.
+
+Runs against REDIS_URL and only touches keys under benchmark:unique_users:.
+
+Usage:
+    python -m app.scripts.benchmark_unique_users [--cardinalities=1000,10000,100000,1000000] [--hours=24]
+"""
+
+import argparse
+import asyncio
+import random
+
+from app.services.redis import redis_client
+
+PREFIX = "benchmark:unique_users"
+CHUNK = 10_000
+
+
+async def fill(key: str, users, command: str):
+    users = list(users)
+    pipe = await redis_client.pipeline()
+    for start in range(0, len(users), CHUNK):
+        getattr(pipe, command)(key, *users[start:start + CHUNK])
+    await pipe.execute()
+
+
+async def memory_usage(key: str) -> int:
+    pipe = await redis_client.pipeline()
+    pipe.execute_command("MEMORY", "USAGE", key)
+    return (await pipe.execute())[0] or 0
+
+
+def error(estimate: int, truth: int) -> str:
+    return f"{(estimate - truth) / truth * 100:+.2f}%"
+
+
+def size(bytes_: int) -> str:
+    return f"{bytes_ / 1024:.1f} KB" if bytes_ < 1024 * 1024 else f"{bytes_ / 1024 / 1024:.1f} MB"
+
+
+async def single_bucket(cardinalities):
+    print(f"{'users':>10}{'set memory':>14}{'hll memory':>14}{'set count':>12}{'hll count':>12}{'hll error':>11}")
+    for cardinality in cardinalities:
+        users = [f"user_{i}" for i in range(cardinality)]
+        set_key, hll_key = f"{PREFIX}:set", f"{PREFIX}:hll"
+        await fill(set_key, users, "sadd")
+        await fill(hll_key, users, "pfadd")
+
+        pipe = await redis_client.pipeline()
+        pipe.scard(set_key)
+        pipe.pfcount(hll_key)
+        exact, estimate = await pipe.execute()
+        set_memory, hll_memory = await memory_usage(set_key), await memory_usage(hll_key)
+        await redis_client.delete(set_key)
+        await redis_client.delete(hll_key)
+
+        print(f"{cardinality:>10}{size(set_memory):>14}{size(hll_memory):>14}{exact:>12}{estimate:>12}{error(estimate, cardinality):>11}")
+
+
+async def merged_day(cardinality: int, hours: int):
+    """Every hour sees a random half of the day's users"""
+    rng = random.Random(42)
+    population = [f"user_{i}" for i in range(cardinality)]
+    set_keys = [f"{PREFIX}:set:{hour}" for hour in range(hours)]
+    hll_keys = [f"{PREFIX}:hll:{hour}" for hour in range(hours)]
+    seen = set()
+
+    set_memory = hll_memory = hourly_sum = 0
+    for set_key, hll_key in zip(set_keys, hll_keys):
+        users = rng.sample(population, cardinality // 2)
+        seen.update(users)
+        await fill(set_key, users, "sadd")
+        await fill(hll_key, users, "pfadd")
+        set_memory += await memory_usage(set_key)
+        hll_memory += await memory_usage(hll_key)
+        hourly_sum += len(users)
+
+    pipe = await redis_client.pipeline()
+    pipe.sunionstore(f"{PREFIX}:set:day", *set_keys)
+    pipe.pfmerge(f"{PREFIX}:hll:day", *hll_keys)
+    pipe.pfcount(f"{PREFIX}:hll:day")
+    exact, _, estimate = await pipe.execute()
+
+    pipe = await redis_client.pipeline()
+    pipe.delete(*set_keys, *hll_keys, f"{PREFIX}:set:day", f"{PREFIX}:hll:day")
+    await pipe.execute()
+
+    truth = len(seen)
+    print()
+    print(f"One day, {hours} hourly buckets of {cardinality // 2} users drawn from {cardinality}")
+    print(f"  sum of hourly counts: {hourly_sum:>10} ({error(hourly_sum, truth)})")
+    print(f"  SUNIONSTORE of sets:  {exact:>10} (exact, {size(set_memory)} of sets)")
+    print(f"  PFMERGE of HLLs:      {estimate:>10} ({error(estimate, truth)}, {size(hll_memory)} of registers)")
+
+
+async def run_benchmark(cardinalities, hours: int):
+    await single_bucket(cardinalities)
+    await merged_day(min(max(cardinalities), 100_000), hours)
+    await redis_client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Redis SETs and HyperLogLogs for unique user counts")
+    parser.add_argument("--cardinalities", default="1000,10000,100000,1000000", help="Comma-separated user counts")
+    parser.add_argument("--hours", type=int, default=24, help="Hourly buckets merged into a day")
+    args = parser.parse_args()
+
+    cardinalities = [int(value) for value in args.cardinalities.split(",")]
+    asyncio.run(run_benchmark(cardinalities, args.hours))
+
+
+if __name__ == "__main__":
+    main()
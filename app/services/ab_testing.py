@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update, and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.analytics import ABTest
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "ab_tests:invalidate"
+DIRTY_SET_KEY = "ab_test:dirty"
+COUNTERS_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# Atomic 50/50 assignment: serve the variant that has been served fewer times,
+# until version_a + version_b reaches total_requests.
+# KEYS[1] = counters hash, KEYS[2] = dirty set
+# ARGV[1] = total_requests, ARGV[2]/ARGV[3] = counters from ab_tests (seed), ARGV[4] = test id, ARGV[5] = ttl
+# Returns {variant, a, b}: 1 = version_a, 2 = version_b, 0 = test exhausted
+ASSIGN_LUA = """
+redis.call('HSETNX', KEYS[1], 'a', ARGV[2])
+redis.call('HSETNX', KEYS[1], 'b', ARGV[3])
+local a = tonumber(redis.call('HGET', KEYS[1], 'a'))
+local b = tonumber(redis.call('HGET', KEYS[1], 'b'))
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('SADD', KEYS[2], ARGV[4])
+if a + b >= tonumber(ARGV[1]) then
+    return {0, a, b}
+end
+if a <= b then
+    return {1, redis.call('HINCRBY', KEYS[1], 'a', 1), b}
+end
+return {2, a, redis.call('HINCRBY', KEYS[1], 'b', 1)}
+"""
+
+
+def _counters_key(test_id) -> str:
+    return f"ab_test:{test_id}:counters"
+
+
+class RunningTest:
+    """Immutable snapshot of a running ABTest, enough to assign variants"""
+
+    __slots__ = ("id", "name", "version_a_id", "version_b_id", "total_requests", "version_a_requests", "version_b_requests")
+
+    def __init__(self, ab_test: ABTest):
+        self.id = ab_test.id
+        self.name = ab_test.name
+        self.version_a_id = ab_test.version_a_id
+        self.version_b_id = ab_test.version_b_id
+        self.total_requests = ab_test.total_requests
+        self.version_a_requests = ab_test.version_a_requests or 0
+        self.version_b_requests = ab_test.version_b_requests or 0
+
+
+class ABTestAssigner:
+    """
+    Assigns A/B test variants without touching the ab_tests row per request.
+
+    The running test for a (prompt, workspace) is cached in-process; the served
+    counters live in a Redis hash and are incremented by a Lua script, so the
+    50/50 split and the total_requests cutoff hold across any number of workers.
+    A background reconciler writes the counters back to ab_tests and completes
+    tests that reached total_requests. Without Redis, assignment falls back to
+    locking the ab_tests row.
+    """
+
+    def __init__(self):
+        self._tests: Dict[Tuple[UUID, UUID], Tuple[float, Optional[RunningTest]]] = {}
+        self._script = None
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    # Running test configuration cache
+
+    async def _get_running_test(self, session: AsyncSession, prompt_id: UUID, workspace_id: UUID) -> Optional[RunningTest]:
+        key = (prompt_id, workspace_id)
+        cached = self._tests.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        # Get only the most recent running test
+        result = await session.execute(
+            select(ABTest).where(
+                and_(
+                    ABTest.prompt_id == prompt_id,
+                    ABTest.workspace_id == workspace_id,
+                    ABTest.status == 'running'  # Only running tests, not completed
+                )
+            ).order_by(ABTest.created_at.desc())
+        )
+        ab_test = result.scalars().first()
+        running_test = RunningTest(ab_test) if ab_test else None
+
+        self._tests[key] = (time.monotonic() + settings.AB_TEST_CACHE_TTL_SECONDS, running_test)
+        return running_test
+
+    def _drop_local(self, prompt_id: Optional[str] = None):
+        if prompt_id is None:
+            self._tests.clear()
+            return
+        for key in [key for key in self._tests if str(key[0]) == prompt_id]:
+            self._tests.pop(key, None)
+
+    async def invalidate(self, prompt_id: UUID):
+        """Forget the cached running test of a prompt in every worker"""
+        self._drop_local(str(prompt_id))
+        try:
+            await redis_client.publish(INVALIDATION_CHANNEL, {"prompt_id": str(prompt_id)})
+        except Exception as e:
+            logger.warning(f"A/B test cache invalidation failed for {prompt_id}: {e}")
+
+    # Assignment
+
+    async def assign(self, session: AsyncSession, prompt_id: UUID, workspace_id: UUID) -> Optional[dict]:
+        """
+        Pick the variant for one request.
+        Returns dict with version_id and test info, or None to use the production version.
+        """
+        test = await self._get_running_test(session, prompt_id, workspace_id)
+        if not test:
+            return None
+
+        try:
+            if self._script is None:
+                self._script = await redis_client.register_script(ASSIGN_LUA)
+            variant, _, _ = await self._script(
+                keys=[_counters_key(test.id), DIRTY_SET_KEY],
+                args=[test.total_requests, test.version_a_requests, test.version_b_requests,
+                      str(test.id), COUNTERS_TTL_SECONDS]
+            )
+        except Exception as e:
+            logger.warning(f"A/B test counters unavailable, assigning in database: {e}")
+            variant = await self._assign_db(test)
+
+        if variant == 0:
+            # Exhausted: the reconciler completes the test, production is served until then
+            return None
+
+        if variant == 1:
+            version_to_serve, variant_name = test.version_a_id, "version_a"
+        else:
+            version_to_serve, variant_name = test.version_b_id, "version_b"
+
+        return {
+            "version_id": version_to_serve,
+            "ab_test_id": str(test.id),
+            "ab_test_name": test.name,
+            "ab_test_variant": variant_name
+        }
+
+    async def _assign_db(self, test: RunningTest) -> int:
+        """Same assignment as ASSIGN_LUA under a row lock (used while Redis is down)"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ABTest.version_a_requests, ABTest.version_b_requests, ABTest.total_requests)
+                .where(ABTest.id == test.id, ABTest.status == 'running')
+                .with_for_update()
+            )
+            row = result.first()
+            if not row:
+                return 0
+
+            a, b = row.version_a_requests or 0, row.version_b_requests or 0
+            if a + b >= row.total_requests:
+                variant = 0
+            elif a <= b:
+                variant = 1
+                await session.execute(
+                    update(ABTest).where(ABTest.id == test.id).values(version_a_requests=a + 1)
+                )
+            else:
+                variant = 2
+                await session.execute(
+                    update(ABTest).where(ABTest.id == test.id).values(version_b_requests=b + 1)
+                )
+            await session.commit()
+
+        return variant
+
+    # Background reconciliation
+
+    async def start(self):
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        self.running = False
+        for task in (self.task, self._listener):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logger.error(f"Failed to reconcile A/B test counters on shutdown: {e}")
+
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.sleep(settings.AB_TEST_RECONCILE_INTERVAL_SECONDS)
+                await self.reconcile()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Failed to reconcile A/B test counters: {e}")
+
+    async def reconcile(self) -> int:
+        """Write served counters to ab_tests and complete exhausted tests; returns tests completed"""
+        test_ids = await redis_client.spop(DIRTY_SET_KEY, 1000)
+        if not test_ids:
+            return 0
+
+        completed = 0
+        try:
+            async with AsyncSessionLocal() as session:
+                for test_id in test_ids:
+                    counters = await redis_client.hgetall(_counters_key(test_id))
+                    if not counters:
+                        continue
+                    a, b = int(counters.get("a", 0)), int(counters.get("b", 0))
+
+                    # Counters only grow, GREATEST keeps rows moved by the database fallback
+                    result = await session.execute(
+                        update(ABTest)
+                        .where(ABTest.id == UUID(test_id))
+                        .values(
+                            version_a_requests=func.greatest(func.coalesce(ABTest.version_a_requests, 0), a),
+                            version_b_requests=func.greatest(func.coalesce(ABTest.version_b_requests, 0), b)
+                        )
+                        .returning(ABTest.prompt_id, ABTest.status, ABTest.total_requests,
+                                   ABTest.version_a_requests, ABTest.version_b_requests)
+                    )
+                    row = result.first()
+                    if not row:
+                        continue
+
+                    # Automatically complete the test when limit is reached
+                    if row.status == 'running' and row.version_a_requests + row.version_b_requests >= row.total_requests:
+                        await session.execute(
+                            update(ABTest)
+                            .where(ABTest.id == UUID(test_id), ABTest.status == 'running')
+                            .values(status='completed', ended_at=datetime.utcnow())
+                        )
+                        completed += 1
+                        await self.invalidate(row.prompt_id)
+
+                await session.commit()
+        except Exception:
+            # Retry these tests on the next run
+            await redis_client.sadd(DIRTY_SET_KEY, *test_ids)
+            raise
+
+        return completed
+
+    async def _listen(self):
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = await redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._drop_local(json.loads(message["data"])["prompt_id"])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Messages may have been missed while disconnected
+                logger.warning(f"A/B test invalidation listener error: {e}")
+                self._drop_local()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+
+# Global A/B test assigner instance
+ab_test_assigner = ABTestAssigner()
@@ -0,0 +1,322 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.log_throttle import warn_every
+from app.services.event_registry import event_registry
+from app.services.redis import redis_client
+from app.services.shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_KEY = "alerts:evaluator:leader"
+WATCH_KEY = "alerts:watch"
+
+# Success rates are computed over the last WINDOW_MINUTES minute buckets
+WINDOW_MINUTES = 60
+MIN_SAMPLE_SIZE = 10
+
+# Bound of the in-process counters (memory backend / Redis outage)
+LOCAL_MAX_PROMPTS = 100000
+
+# Add outcome counts to per-prompt rings of minute buckets, one hash per prompt
+# (fields m<slot> = minute of the slot, t<slot> = events, s<slot> = successes).
+# A slot holding an older minute is reset first; counts for a minute that has
+# already left its slot are dropped.
+#
+# KEYS[i] = ring, ARGV[1] = window, ARGV[2] = ttl, then per ring: minute, events, successes
+RING_ADD_LUA = """
+local window = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+for i = 1, #KEYS do
+    local minute = tonumber(ARGV[i * 3])
+    local slot = minute % window
+    local current = tonumber(redis.call('HGET', KEYS[i], 'm' .. slot) or '-1')
+    if current < minute then
+        redis.call('HSET', KEYS[i], 'm' .. slot, minute, 't' .. slot, 0, 's' .. slot, 0)
+        current = minute
+    end
+    if current == minute then
+        redis.call('HINCRBY', KEYS[i], 't' .. slot, ARGV[i * 3 + 1])
+        redis.call('HINCRBY', KEYS[i], 's' .. slot, ARGV[i * 3 + 2])
+    end
+    redis.call('EXPIRE', KEYS[i], ttl)
+end
+return #KEYS
+"""
+
+# Sum the slots of each ring that fall in the window ending at ARGV[1]
+# KEYS[i] = ring, ARGV[1] = current minute, ARGV[2] = window; returns {events, successes} per ring
+RING_SUM_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local sums = {}
+for i = 1, #KEYS do
+    local fields = redis.call('HGETALL', KEYS[i])
+    local values = {}
+    for j = 1, #fields, 2 do
+        values[fields[j]] = tonumber(fields[j + 1])
+    end
+    local events, successes = 0, 0
+    for slot = 0, window - 1 do
+        local minute = values['m' .. slot]
+        if minute and minute <= now and now - minute < window then
+            events = events + (values['t' .. slot] or 0)
+            successes = successes + (values['s' .. slot] or 0)
+        end
+    end
+    sums[i * 2 - 1] = events
+    sums[i * 2] = successes
+end
+return sums
+"""
+
+# (workspace id, prompt id, event name, category) of a definition with a success_rate_min
+Watch = Tuple[str, str, str, Optional[str]]
+
+
+def ring_key(workspace_id, prompt_id) -> str:
+    return f"alerts:ring:{workspace_id}:{prompt_id}"
+
+
+async def send_alert(workspace_id: UUID, alert_type: str, details: dict):
+    """Send alert notification"""
+    # TODO: Implement alert sending logic (email, webhook, etc.)
+    print(f"ALERT [{alert_type}] for workspace {workspace_id}: {details}")
+
+
+class LocalAlertCounters:
+    """
+    The same minute rings and watch list kept in process, for SHARED_STATE_BACKEND=memory
+    and for when Redis is unreachable. Rings live in a fixed-size LRU.
+    """
+
+    def __init__(self):
+        # ring key -> [[minute, events, successes]] * WINDOW_MINUTES
+        self._rings: "OrderedDict[str, List[List[int]]]" = OrderedDict()
+        self._watches: Dict[Watch, float] = {}
+
+    def add(self, counts: Dict[Tuple[str, int], List[int]], watches: Iterable[Watch], now: float):
+        for (key, minute), (events, successes) in counts.items():
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = [[-1, 0, 0] for _ in range(WINDOW_MINUTES)]
+                while len(self._rings) > LOCAL_MAX_PROMPTS:
+                    self._rings.popitem(last=False)
+            else:
+                self._rings.move_to_end(key)
+            slot = ring[minute % WINDOW_MINUTES]
+            if slot[0] < minute:
+                slot[:] = [minute, 0, 0]
+            if slot[0] == minute:
+                slot[1] += events
+                slot[2] += successes
+        for watch in watches:
+            self._watches[watch] = now
+
+    def window(self, keys: List[str], minute: int) -> List[Tuple[int, int]]:
+        sums = []
+        for key in keys:
+            events = successes = 0
+            for slot_minute, slot_events, slot_successes in self._rings.get(key, ()):
+                if 0 <= minute - slot_minute < WINDOW_MINUTES:
+                    events += slot_events
+                    successes += slot_successes
+            sums.append((events, successes))
+        return sums
+
+    def watched(self, since: float) -> List[Watch]:
+        for watch in [watch for watch, seen in self._watches.items() if seen < since]:
+            del self._watches[watch]
+        return list(self._watches)
+
+
+class AlertEvaluator:
+    """
+    Streaming evaluation of EventDefinition.alert_thresholds.
+
+    The event pipeline calls record() once per batch: outcome counts are added to a
+    per-prompt ring of minute buckets (one Lua call), and a failed event whose
+    definition has a success_rate_min puts that definition on a watch list. Every
+    ALERT_EVALUATION_INTERVAL_SECONDS the worker holding the evaluator lease checks
+    each watched definition against its prompt's success rate over the last
+    WINDOW_MINUTES - O(1) per definition, however many events there were - and
+    sends at most one alert per ALERT_DEBOUNCE_SECONDS for the same condition.
+    """
+
+    def __init__(self):
+        self.local = LocalAlertCounters()
+        self.use_redis = settings.SHARED_STATE_BACKEND != "memory"
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+        self.is_leader = False
+        self._scripts = {}
+        self._failures = 0
+
+    async def _script(self, source: str):
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = await redis_client.register_script(source)
+        return script
+
+    def _degraded(self, operation: str, error: Exception):
+        self._failures += 1
+        warn_every(logger, self._failures, f"Alert counters Redis {operation} failed ({self._failures} so far): {error}")
+
+    async def record(self, db, events):
+        """Count the outcomes of a batch of processed events"""
+        now = time.time()
+        counts: Dict[Tuple[str, int], List[int]] = {}
+        watches = set()
+
+        for event in events:
+            if not event.prompt_id:
+                continue
+            key = (ring_key(event.workspace_id, event.prompt_id), int(event.created_at.timestamp() // 60))
+            count = counts.setdefault(key, [0, 0])
+            count[0] += 1
+            if event.outcome == 'success':
+                count[1] += 1
+            elif event.event_name:
+                event_def = await event_registry.get(db, event.workspace_id, event.event_name, event.category)
+                if event_def and 'success_rate_min' in event_def.alert_thresholds:
+                    watches.add((str(event.workspace_id), str(event.prompt_id), event.event_name, event.category))
+
+        if not counts:
+            return
+
+        if self.use_redis:
+            try:
+                args = [WINDOW_MINUTES, WINDOW_MINUTES * 60 * 2]
+                for (_, minute), (total, successes) in counts.items():
+                    args.extend((minute, total, successes))
+                script = await self._script(RING_ADD_LUA)
+                await script(keys=[key for key, _ in counts], args=args)
+                if watches:
+                    pipe = await redis_client.pipeline()
+                    pipe.zadd(WATCH_KEY, {json.dumps(watch): now for watch in watches})
+                    await pipe.execute()
+                return
+            except Exception as e:
+                self._degraded("record", e)
+        self.local.add(counts, watches, now)
+
+    async def _watched(self, since: float) -> List[Watch]:
+        if self.use_redis:
+            try:
+                pipe = await redis_client.pipeline()
+                pipe.zremrangebyscore(WATCH_KEY, "-inf", since)
+                pipe.zrange(WATCH_KEY, 0, -1)
+                _, members = await pipe.execute()
+                return [tuple(json.loads(member)) for member in members] + self.local.watched(since)
+            except Exception as e:
+                self._degraded("watch list", e)
+        return self.local.watched(since)
+
+    async def _window(self, keys: List[str], minute: int) -> List[Tuple[int, int]]:
+        sums = self.local.window(keys, minute)
+        if self.use_redis:
+            try:
+                script = await self._script(RING_SUM_LUA)
+                flat = await script(keys=keys, args=[minute, WINDOW_MINUTES])
+                # Counts taken in process while Redis was unreachable add to the shared ones
+                sums = [
+                    (int(flat[i * 2]) + local[0], int(flat[i * 2 + 1]) + local[1])
+                    for i, local in enumerate(sums)
+                ]
+            except Exception as e:
+                self._degraded("window", e)
+        return sums
+
+    async def evaluate(self):
+        """Check every watched definition against its prompt's rolling success rate"""
+        now = time.time()
+        watches = list(dict.fromkeys(await self._watched(now - WINDOW_MINUTES * 60)))
+        if not watches:
+            return
+
+        keys = list(dict.fromkeys(ring_key(workspace_id, prompt_id) for workspace_id, prompt_id, _, _ in watches))
+        windows = dict(zip(keys, await self._window(keys, int(now // 60))))
+
+        async with AsyncSessionLocal() as db:
+            for workspace_id, prompt_id, event_name, category in watches:
+                events, successes = windows[ring_key(workspace_id, prompt_id)]
+                if events < MIN_SAMPLE_SIZE:  # Minimum sample size
+                    continue
+
+                event_def = await event_registry.get(db, UUID(workspace_id), event_name, category)
+                threshold = event_def.alert_thresholds.get('success_rate_min') if event_def else None
+                if threshold is None:
+                    continue
+
+                success_rate = successes / events * 100
+                if success_rate < threshold:
+                    await self._send_debounced(
+                        workspace_id=UUID(workspace_id),
+                        alert_type='low_success_rate',
+                        details={
+                            'prompt_id': prompt_id,
+                            'event_name': event_name,
+                            'current_rate': success_rate,
+                            'threshold': threshold,
+                            'sample_size': events
+                        }
+                    )
+
+    async def _send_debounced(self, workspace_id: UUID, alert_type: str, details: dict):
+        debounce_key = f"alerts:sent:{workspace_id}:{alert_type}:{details['prompt_id']}:{details['event_name']}"
+        if await shared_state.get(debounce_key):
+            return
+        await shared_state.set(debounce_key, 1, settings.ALERT_DEBOUNCE_SECONDS)
+        await send_alert(workspace_id, alert_type, details)
+
+    async def start(self):
+        """Start the evaluation loop"""
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the evaluation loop"""
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.is_leader:
+            await shared_state.release_lease(LEADER_LEASE_KEY, self.instance_id)
+            self.is_leader = False
+
+    async def _run(self):
+        while self.running:
+            try:
+                # Only one worker evaluates; the lease outlives one loop iteration
+                self.is_leader = await shared_state.acquire_lease(
+                    LEADER_LEASE_KEY, self.instance_id, settings.ALERT_EVALUATION_INTERVAL_SECONDS * 3
+                )
+                if self.is_leader:
+                    await self.evaluate()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Alert evaluation error: {e}")
+
+            await asyncio.sleep(settings.ALERT_EVALUATION_INTERVAL_SECONDS)
+
+
+# Global alert evaluator instance
+alert_evaluator = AlertEvaluator()
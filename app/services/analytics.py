@@ -1,13 +1,19 @@
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from uuid import UUID
-from sqlalchemy import select, func, and_, or_, Numeric
+from sqlalchemy import select, func, and_, or_, case, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.analytics import PromptEvent, PromptMetricsHourly, EventDefinition
+from app.models.analytics import PromptEvent, PromptMetricsHourly
 import asyncio
 from app.services.redis import redis_client
+from app.services.alerts import alert_evaluator
+from app.services.unique_users import add_unique_users, count_unique_users
 from app.core.database import get_session
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def validate_event_against_definition(event, event_definition):
@@ -45,139 +51,121 @@ def validate_event_against_definition(event, event_definition):
     return errors
 
 
-async def process_event(event_id: str, workspace_id: UUID):
-    """Process a single event - aggregations, alerts, etc."""
-    from app.core.database import AsyncSessionLocal
-    async with AsyncSessionLocal() as db:
-        # Get the event
-        event = await db.get(PromptEvent, UUID(event_id))
-        if not event:
-            return
-
-        # Update hourly metrics
-        await update_hourly_metrics(db, event)
+# Outcome -> PromptMetricsHourly counter
+OUTCOME_COLUMNS = {
+    'success': 'successful_outcomes',
+    'failure': 'failed_outcomes',
+    'partial': 'partial_outcomes',
+    'abandoned': 'abandoned_outcomes',
+}
 
-        # Check for alerts
-        await check_alert_thresholds(db, event)
+# Counters added to an existing bucket on upsert
+SUMMED_COLUMNS = (
+    'total_requests', 'successful_outcomes', 'failed_outcomes', 'partial_outcomes',
+    'abandoned_outcomes', 'total_revenue', 'total_value', 'conversion_count',
+)
 
-        # Update A/B test if applicable
-        await update_ab_test_metrics(db, event)
 
-        # Emit real-time update via WebSocket
-        await emit_realtime_update(workspace_id, event)
+async def dispatch_event_hooks(db: AsyncSession, events: List[PromptEvent]):
+    """Follow-ups once the metrics of the events are committed - alerts, A/B tests, etc."""
+    # Count outcomes for alerting; thresholds are evaluated on a schedule, not per event
+    try:
+        await alert_evaluator.record(db, events)
+    except Exception as e:
+        logger.error(f"Alert counters not updated for {len(events)} events: {e}")
 
+    for event in events:
+        try:
+            # Update A/B test if applicable
+            await update_ab_test_metrics(db, event)
 
-async def update_hourly_metrics(db: AsyncSession, event: PromptEvent):
-    """Update pre-aggregated hourly metrics"""
-    hour_bucket = event.created_at.replace(minute=0, second=0, microsecond=0)
+            # Emit real-time update via WebSocket
+            await emit_realtime_update(event.workspace_id, event)
+        except Exception as e:
+            logger.error(f"Event hooks failed for event {event.id}: {e}")
+
+
+async def update_hourly_metrics(db: AsyncSession, events: List[PromptEvent]):
+    """
+    Add a batch of events to the pre-aggregated hourly metrics.
+
+    Deltas are coalesced per (workspace, prompt, version, hour) bucket and written
+    with one INSERT ... ON CONFLICT DO UPDATE, so concurrent batches add to a
+    bucket instead of overwriting it. The caller commits.
+    """
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    bucket_users: Dict[tuple, set] = {}
+
+    for event in events:
+        hour_bucket = event.created_at.replace(minute=0, second=0, microsecond=0)
+        key = (event.workspace_id, event.prompt_id, event.prompt_version_id, hour_bucket)
+
+        delta = buckets.get(key)
+        if delta is None:
+            delta = buckets[key] = {
+                'workspace_id': event.workspace_id,
+                'prompt_id': event.prompt_id,
+                'prompt_version_id': event.prompt_version_id,
+                'hour_bucket': hour_bucket,
+                'unique_users': None,
+                'unique_users_hll': None,
+                **dict.fromkeys(SUMMED_COLUMNS, 0)
+            }
 
-    # Get or create metrics record
-    metrics = await db.execute(
-        select(PromptMetricsHourly).where(
-            and_(
-                PromptMetricsHourly.workspace_id == event.workspace_id,
-                PromptMetricsHourly.prompt_id == event.prompt_id,
-                PromptMetricsHourly.prompt_version_id == event.prompt_version_id,
-                PromptMetricsHourly.hour_bucket == hour_bucket
-            )
-        )
+        # Update counts
+        delta['total_requests'] += 1
+        outcome_column = OUTCOME_COLUMNS.get(event.outcome)
+        if outcome_column:
+            delta[outcome_column] += 1
+
+        # Update business metrics
+        if event.business_metrics:
+            if 'revenue' in event.business_metrics:
+                delta['total_revenue'] += float(event.business_metrics['revenue'])
+            if 'value' in event.business_metrics:
+                delta['total_value'] += float(event.business_metrics['value'])
+            if event.business_metrics.get('conversion'):
+                delta['conversion_count'] += 1
+
+        if event.user_id:
+            bucket_users.setdefault(key, set()).add(event.user_id)
+
+    # Update unique users: a HyperLogLog per bucket, its registers stored with the row
+    if bucket_users:
+        try:
+            counted = await add_unique_users(db, bucket_users)
+        except Exception as e:
+            logger.warning(f"Unique user counts unavailable for this batch: {e}")
+            counted = {}
+        for key, (count, registers) in counted.items():
+            buckets[key]['unique_users'] = count
+            buckets[key]['unique_users_hll'] = registers
+
+    if not buckets:
+        return
+
+    # Rows in a stable order, so concurrent batches lock shared buckets in the same order
+    rows = [buckets[key] for key in sorted(buckets, key=lambda key: tuple(str(part) for part in key))]
+    stmt = pg_insert(PromptMetricsHourly).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint='uq_metrics_hourly_bucket',
+        set_={
+            **{
+                column: func.coalesce(getattr(PromptMetricsHourly, column), 0) + getattr(stmt.excluded, column)
+                for column in SUMMED_COLUMNS
+            },
+            # Counts and registers are absolute; keep the stored ones when Redis gave none, or
+            # when a concurrent batch already stored a larger (i.e. later) set of registers
+            'unique_users': func.greatest(PromptMetricsHourly.unique_users, stmt.excluded.unique_users),
+            'unique_users_hll': case(
+                (stmt.excluded.unique_users >= func.coalesce(PromptMetricsHourly.unique_users, 0),
+                 stmt.excluded.unique_users_hll),
+                else_=PromptMetricsHourly.unique_users_hll
+            ),
+            'updated_at': func.now(),
+        }
     )
-    metrics = metrics.scalar_one_or_none()
-
-    if not metrics:
-        metrics = PromptMetricsHourly(
-            workspace_id=event.workspace_id,
-            prompt_id=event.prompt_id,
-            prompt_version_id=event.prompt_version_id,
-            hour_bucket=hour_bucket
-        )
-        db.add(metrics)
-
-    # Update counts
-    metrics.total_requests += 1
-
-    if event.outcome == 'success':
-        metrics.successful_outcomes += 1
-    elif event.outcome == 'failure':
-        metrics.failed_outcomes += 1
-    elif event.outcome == 'partial':
-        metrics.partial_outcomes += 1
-    elif event.outcome == 'abandoned':
-        metrics.abandoned_outcomes += 1
-
-    # Update business metrics
-    if event.business_metrics:
-        if 'revenue' in event.business_metrics:
-            metrics.total_revenue += float(event.business_metrics['revenue'])
-        if 'value' in event.business_metrics:
-            metrics.total_value += float(event.business_metrics['value'])
-        if event.business_metrics.get('conversion'):
-            metrics.conversion_count += 1
-
-    # Update unique users (this is simplified, in production use HyperLogLog)
-    if event.user_id:
-        # Store unique users in Redis set with TTL
-        await redis_client.sadd(
-            f"unique_users:{event.workspace_id}:{event.prompt_id}:{hour_bucket}",
-            event.user_id
-        )
-        await redis_client.expire(
-            f"unique_users:{event.workspace_id}:{event.prompt_id}:{hour_bucket}",
-            86400  # 24 hours
-        )
-        metrics.unique_users = await redis_client.scard(
-            f"unique_users:{event.workspace_id}:{event.prompt_id}:{hour_bucket}"
-        )
-
-    await db.commit()
-
-
-async def check_alert_thresholds(db: AsyncSession, event: PromptEvent):
-    """Check if event triggers any configured alerts"""
-    # Get event definition if exists
-    if event.event_metadata and 'event_name' in event.event_metadata:
-        event_def = await db.execute(
-            select(EventDefinition).where(
-                and_(
-                    EventDefinition.workspace_id == event.workspace_id,
-                    EventDefinition.event_name == event.event_metadata['event_name'],
-                    EventDefinition.is_active == True
-                )
-            )
-        )
-        event_def = event_def.scalar_one_or_none()
-
-        if event_def and event_def.alert_thresholds:
-            thresholds = event_def.alert_thresholds
-
-            # Check success rate threshold
-            if 'success_rate_min' in thresholds and event.outcome != 'success':
-                # Calculate current success rate
-                recent_events = await db.execute(
-                    select(PromptEvent).where(
-                        and_(
-                            PromptEvent.prompt_id == event.prompt_id,
-                            PromptEvent.created_at > datetime.utcnow() - timedelta(hours=1)
-                        )
-                    )
-                )
-                recent_events = recent_events.scalars().all()
-
-                if len(recent_events) >= 10:  # Minimum sample size
-                    success_count = sum(1 for e in recent_events if e.outcome == 'success')
-                    success_rate = (success_count / len(recent_events)) * 100
-
-                    if success_rate < thresholds['success_rate_min']:
-                        await send_alert(
-                            workspace_id=event.workspace_id,
-                            alert_type='low_success_rate',
-                            details={
-                                'prompt_id': str(event.prompt_id),
-                                'event_name': event.event_metadata['event_name'],
-                                'current_rate': success_rate,
-                                'threshold': thresholds['success_rate_min']
-                            }
-                        )
+    await db.execute(stmt)
 
 
 async def calculate_roi_metrics(
@@ -254,8 +242,7 @@ async def aggregate_metrics_job():
                 )
                 events = events.scalars().all()
 
-                for event in events:
-                    await update_hourly_metrics(db, event)
+                await update_hourly_metrics(db, events)
 
                 await db.commit()
 
@@ -266,12 +253,6 @@ async def aggregate_metrics_job():
         await asyncio.sleep(3600)  # 1 hour
 
 
-async def send_alert(workspace_id: UUID, alert_type: str, details: dict):
-    """Send alert notification"""
-    # TODO: Implement alert sending logic (email, webhook, etc.)
-    print(f"ALERT [{alert_type}] for workspace {workspace_id}: {details}")
-
-
 async def emit_realtime_update(workspace_id: UUID, event: PromptEvent):
     """Emit real-time updates via WebSocket"""
     # TODO: Implement WebSocket broadcast
@@ -335,7 +316,6 @@ async def get_workspace_summary(db: AsyncSession, workspace_id: UUID, start_date
             func.sum(PromptMetricsHourly.total_requests).label('total_events'),
             func.avg(PromptMetricsHourly.successful_outcomes / PromptMetricsHourly.total_requests * 100).label('success_rate'),
             func.sum(PromptMetricsHourly.total_revenue).label('total_revenue'),
-            func.sum(PromptMetricsHourly.unique_users).label('unique_users'),
             func.avg(PromptMetricsHourly.avg_response_time_ms).label('avg_response_time_ms')
         ).where(
             and_(
@@ -356,7 +336,7 @@ async def get_workspace_summary(db: AsyncSession, workspace_id: UUID, start_date
         "total_events": result.total_events or 0,
         "success_rate": result.success_rate or 0,
         "total_revenue": total_revenue,
-        "unique_users": result.unique_users or 0,
+        "unique_users": await count_unique_users(db, workspace_id, start_date, end_date),
         "avg_response_time_ms": result.avg_response_time_ms or 0,
         "roi_percentage": roi_percentage
     }
@@ -425,8 +405,8 @@ async def get_monthly_events_chart_data(db: AsyncSession, workspace_id: UUID):
     start_date = end_date - timedelta(days=31)  # Use 31 days to be safe
 
     # Query events grouped by day, event_name, and category
-    event_name_field = func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown')
-    category_field = func.coalesce(PromptEvent.event_metadata['category'].astext, 'general')
+    event_name_field = func.coalesce(PromptEvent.event_name, 'unknown')
+    category_field = func.coalesce(PromptEvent.category, 'general')
     # Use date_trunc to avoid timezone issues
     date_field = func.date_trunc('day', PromptEvent.created_at)
 
@@ -523,7 +503,7 @@ async def generate_conversion_report(
 
     # Add conversion event filtering if specified
     if conversion_event_name:
-        conditions.append(PromptEvent.event_metadata['event_name'].astext == conversion_event_name)
+        conditions.append(PromptEvent.event_name == conversion_event_name)
 
     # Query for conversion data
     if report_format == 'table':
@@ -532,11 +512,11 @@ async def generate_conversion_report(
             select(
                 PromptEvent.prompt_id.label('prompt_id'),
                 func.date(PromptEvent.created_at).label('date'),
-                func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown').label('event_name'),
-                func.coalesce(PromptEvent.event_metadata['category'].astext, 'general').label('category'),
+                func.coalesce(PromptEvent.event_name, 'unknown').label('event_name'),
+                func.coalesce(PromptEvent.category, 'general').label('category'),
                 func.count(PromptEvent.id).label('total_events'),
                 func.sum(
-                    func.case(
+                    case(
                         (PromptEvent.business_metrics['conversion'].astext == 'true', 1),
                         else_=0
                     )
@@ -558,8 +538,8 @@ async def generate_conversion_report(
             ).group_by(
                 PromptEvent.prompt_id,
                 func.date(PromptEvent.created_at),
-                func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown'),
-                func.coalesce(PromptEvent.event_metadata['category'].astext, 'general')
+                PromptEvent.event_name,
+                PromptEvent.category
             ).order_by(
                 func.date(PromptEvent.created_at).desc(),
                 PromptEvent.prompt_id
@@ -598,11 +578,11 @@ async def generate_conversion_report(
         chart_data = await db.execute(
             select(
                 func.date(PromptEvent.created_at).label('date'),
-                func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown').label('event_name'),
-                func.coalesce(PromptEvent.event_metadata['category'].astext, 'general').label('category'),
+                func.coalesce(PromptEvent.event_name, 'unknown').label('event_name'),
+                func.coalesce(PromptEvent.category, 'general').label('category'),
                 func.count(PromptEvent.id).label('total_events'),
                 func.sum(
-                    func.case(
+                    case(
                         (PromptEvent.business_metrics['conversion'].astext == 'true', 1),
                         else_=0
                     )
@@ -617,8 +597,8 @@ async def generate_conversion_report(
                 and_(*conditions)
             ).group_by(
                 func.date(PromptEvent.created_at),
-                func.coalesce(PromptEvent.event_metadata['event_name'].astext, 'unknown'),
-                func.coalesce(PromptEvent.event_metadata['category'].astext, 'general')
+                PromptEvent.event_name,
+                PromptEvent.category
             ).order_by(
                 func.date(PromptEvent.created_at)
             )
@@ -709,16 +689,16 @@ async def get_available_conversion_events(db: AsyncSession, workspace_id: UUID):
     """Get list of available conversion events for filtering"""
     events = await db.execute(
         select(
-            func.distinct(PromptEvent.event_metadata['event_name'].astext).label('event_name'),
+            func.distinct(PromptEvent.event_name).label('event_name'),
             func.count(PromptEvent.id).label('count')
         ).where(
             and_(
                 PromptEvent.workspace_id == workspace_id,
-                PromptEvent.event_metadata['event_name'].astext.isnot(None),
+                PromptEvent.event_name.isnot(None),
                 PromptEvent.business_metrics['conversion'].astext == 'true'
             )
         ).group_by(
-            PromptEvent.event_metadata['event_name'].astext
+            PromptEvent.event_name
         ).order_by(
             func.count(PromptEvent.id).desc()
         )
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.log_throttle import warn_every
+from app.core.product_auth import safe_json_serialize
+from app.models.product_api_key import ProductAPILog
+
+logger = logging.getLogger(__name__)
+
+
+def decode_body(raw, total_size: int, what: str):
+    """Decode a captured body, noting when it was cut at API_LOG_MAX_BODY_BYTES"""
+    if not isinstance(raw, (bytes, bytearray)):
+        return safe_json_serialize(raw)
+    if total_size > len(raw):
+        return {"truncated": True, "size": total_size}
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except Exception as e:
+        return {"error": f"Failed to parse {what}: {str(e)}"}
+
+
+def extract_error_message(body) -> str:
+    """Human-readable error message from a failed response body"""
+    if isinstance(body, dict):
+        # Validation errors (422) carry a list of located messages
+        if body.get('detail') and isinstance(body['detail'], list):
+            error_messages = []
+            for error in body['detail']:
+                if isinstance(error, dict) and 'msg' in error:
+                    loc = " -> ".join(str(x) for x in error.get('loc', []))
+                    error_messages.append(f"{loc}: {error['msg']}")
+            return "; ".join(error_messages) if error_messages else json.dumps(body.get('detail'))
+        if body.get('truncated'):
+            return f"Response body too large to log ({body.get('size')} bytes)"
+        # Use json.dumps instead of str() to get proper JSON formatting
+        detail = body.get('detail', body)
+        return json.dumps(detail) if isinstance(detail, (dict, list)) else str(detail)
+    return json.dumps(body) if isinstance(body, list) else str(body)
+
+
+class ProductAPILogWriter:
+    """
+    Bounded in-process queue of ProductAPILog rows written by a background task.
+
+    Requests only enqueue a dict of column values with the raw captured bodies;
+    the writer decodes those and inserts the rows in
+    multi-row batches, flushing when API_LOG_BATCH_SIZE rows are collected or
+    API_LOG_FLUSH_INTERVAL_SECONDS has passed since the first row of the batch.
+    When the queue is full new rows are dropped (and counted) rather than
+    slowing the request down.
+    """
+
+    def __init__(self):
+        self.queue: Optional[asyncio.Queue] = None
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _get_queue(self) -> asyncio.Queue:
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=settings.API_LOG_QUEUE_MAX_SIZE)
+        return self.queue
+
+    def enqueue(self, row: Dict[str, Any]) -> bool:
+        """Queue a log row without waiting; returns False if it was dropped"""
+        try:
+            self._get_queue().put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            warn_every(logger, self.dropped, f"API log queue full, dropped {self.dropped} log rows so far")
+            return False
+
+        self.enqueued += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_max_size": settings.API_LOG_QUEUE_MAX_SIZE,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def start(self):
+        if self.running:
+            return
+
+        self._get_queue()
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 30.0):
+        """Stop the writer after it has written everything still queued"""
+        self.running = False
+        if self.task and not self.task.done():
+            # The sentinel is queued behind pending rows, so the writer exits once they are written
+            await self._get_queue().put(None)
+            try:
+                await asyncio.wait_for(self.task, timeout)
+            except asyncio.TimeoutError:
+                logger.error("API log writer did not drain in time")
+        await self.drain()
+
+    async def drain(self):
+        """Write every queued row now"""
+        queue = self._get_queue()
+        while not queue.empty():
+            batch = []
+            while not queue.empty() and len(batch) < settings.API_LOG_BATCH_SIZE:
+                row = queue.get_nowait()
+                if row is not None:
+                    batch.append(row)
+            await self._write_batch(batch)
+
+    async def _run(self):
+        queue = self._get_queue()
+        stopping = False
+        while not stopping:
+            try:
+                row = await queue.get()
+                if row is None:
+                    break
+                batch = [row]
+
+                # Collect more rows until the batch is full or the window closes
+                deadline = time.monotonic() + settings.API_LOG_FLUSH_INTERVAL_SECONDS
+                while len(batch) < settings.API_LOG_BATCH_SIZE:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if row is None:
+                        stopping = True
+                        break
+                    batch.append(row)
+
+                await self._write_batch(batch)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"API log writer error: {e}")
+
+    def _prepare_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a queued entry into ProductAPILog column values"""
+        user_id = row.pop("user_id", None)
+        row["request_body"] = decode_body(row["request_body"], row.pop("request_body_size", 0), "request")
+        row["response_body"] = decode_body(row["response_body"], row.pop("response_body_size", 0), "response")
+        if row["status_code"] >= 400 and not row.get("error_message") and row["response_body"] is not None:
+            row["error_message"] = extract_error_message(row["response_body"])
+
+        if logger.isEnabledFor(logging.DEBUG):
+            request_body = row["request_body"]
+            source_name = request_body.get('source_name', 'unknown') if isinstance(request_body, dict) else 'unknown'
+            logger.debug(
+                f"External API log: user={user_id} source={source_name} endpoint={row['endpoint']} "
+                f"status={row['status_code']} latency={row['latency_ms'] / 1000:.3f}s error={row.get('error_message')}"
+            )
+
+        return row
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+
+        try:
+            rows = [self._prepare_row(row) for row in batch]
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(ProductAPILog), rows)
+                await session.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to write {len(batch)} API log rows: {e}")
+
+
+# Global API log writer instance
+api_log_writer = ProductAPILogWriter()
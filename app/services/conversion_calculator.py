@@ -79,7 +79,7 @@ async def _get_source_count(
         query = select(func.count(PromptEvent.id)).where(
             and_(
                 PromptEvent.workspace_id == funnel.workspace_id,
-                PromptEvent.event_metadata['event_name'].astext == funnel.source_event_name,
+                PromptEvent.event_name == funnel.source_event_name,
                 PromptEvent.created_at >= start_date,
                 PromptEvent.created_at <= end_date
             )
@@ -104,7 +104,7 @@ async def _get_target_metrics(
     base_query = select(PromptEvent).where(
         and_(
             PromptEvent.workspace_id == funnel.workspace_id,
-            PromptEvent.event_metadata['event_name'].astext == funnel.target_event_name,
+            PromptEvent.event_name == funnel.target_event_name,
             PromptEvent.created_at >= start_date,
             PromptEvent.created_at <= end_date
         )
@@ -113,7 +113,7 @@ async def _get_target_metrics(
     # Add category filter if specified
     if funnel.target_event_category:
         base_query = base_query.where(
-            PromptEvent.event_metadata['category'].astext == funnel.target_event_category
+            PromptEvent.category == funnel.target_event_category
         )
 
     # For conversion window filtering, we need to match trace_ids
@@ -142,7 +142,7 @@ async def _get_target_metrics(
         count_query = select(func.count(PromptEvent.id)).where(
             and_(
                 PromptEvent.workspace_id == funnel.workspace_id,
-                PromptEvent.event_metadata['event_name'].astext == funnel.target_event_name,
+                PromptEvent.event_name == funnel.target_event_name,
                 PromptEvent.created_at >= start_date,
                 PromptEvent.created_at <= end_date
             )
@@ -151,7 +151,7 @@ async def _get_target_metrics(
         # Add category filter if specified
         if funnel.target_event_category:
             count_query = count_query.where(
-                PromptEvent.event_metadata['category'].astext == funnel.target_event_category
+                PromptEvent.category == funnel.target_event_category
             )
 
         # For conversion window filtering, we need to match trace_ids
@@ -183,7 +183,7 @@ async def _get_target_metrics(
         # Build the where conditions
         where_conditions = [
             PromptEvent.workspace_id == funnel.workspace_id,
-            PromptEvent.event_metadata['event_name'].astext == funnel.target_event_name,
+            PromptEvent.event_name == funnel.target_event_name,
             PromptEvent.created_at >= start_date,
             PromptEvent.created_at <= end_date,
             # Only include events that have the metric field and it's numeric
@@ -194,7 +194,7 @@ async def _get_target_metrics(
         # Add category filter if specified
         if funnel.target_event_category:
             where_conditions.append(
-                PromptEvent.event_metadata['category'].astext == funnel.target_event_category
+                PromptEvent.category == funnel.target_event_category
             )
 
         # For conversion window filtering, we need to match trace_ids
@@ -337,8 +337,8 @@ async def get_conversion_attribution(
         FROM prompt_events pe
         JOIN product_api_logs pal ON pe.trace_id = pal.trace_id
         WHERE pe.workspace_id = :workspace_id
-            AND pe.event_metadata->>'event_name' = :target_event_name
-            AND (:target_event_category IS NULL OR pe.event_metadata->>'category' = :target_event_category)
+            AND pe.event_name = :target_event_name
+            AND (:target_event_category IS NULL OR pe.category = :target_event_category)
             AND pal.prompt_id = :source_prompt_id
             AND pe.created_at BETWEEN :start_date AND :end_date
             AND pe.created_at >= pal.created_at  -- Ensure proper sequence
@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.log_throttle import warn_every
+from app.models.analytics import PromptEvent
+from app.services.analytics import dispatch_event_hooks, update_hourly_metrics
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM = "events:pending"
+CONSUMER_GROUP = "event-processors"
+
+# How often a consumer looks for entries abandoned by other consumers
+CLAIM_CHECK_INTERVAL_SECONDS = 5
+
+# (entry id, {"event_id", "workspace_id", "created_at"})
+Entry = Tuple[str, Dict[str, str]]
+
+
+class MemoryEventQueue:
+    """
+    Process-local stand-in for the Redis stream, for SHARED_STATE_BACKEND=memory
+    (tests, local development) and for events published while Redis is unreachable.
+    Same delivery semantics: read entries stay pending until acknowledged and are
+    redelivered after EVENT_PIPELINE_CLAIM_IDLE_SECONDS, but nothing survives a restart.
+    """
+
+    def __init__(self):
+        self._entries: deque = deque(maxlen=settings.EVENT_PIPELINE_STREAM_MAX_LENGTH)
+        self._pending: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._available = asyncio.Event()
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._pending)
+
+    async def publish(self, entries: List[Dict[str, str]]):
+        for fields in entries:
+            self._next_id += 1
+            self._entries.append((str(self._next_id), fields))
+        self._available.set()
+
+    def _claim(self, count: int) -> List[Entry]:
+        idle_before = time.monotonic() - settings.EVENT_PIPELINE_CLAIM_IDLE_SECONDS
+        claimed = []
+        for entry_id, (delivered_at, fields) in self._pending.items():
+            if delivered_at <= idle_before:
+                claimed.append((entry_id, fields))
+                if len(claimed) >= count:
+                    break
+        now = time.monotonic()
+        for entry_id, fields in claimed:
+            self._pending[entry_id] = (now, fields)
+        return claimed
+
+    async def read(self, consumer: str, count: int, block_ms: int) -> List[Entry]:
+        claimed = self._claim(count)
+        if claimed:
+            return claimed
+
+        if not self._entries and block_ms > 0:
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), block_ms / 1000)
+            except asyncio.TimeoutError:
+                return []
+
+        batch = []
+        now = time.monotonic()
+        while self._entries and len(batch) < count:
+            entry_id, fields = self._entries.popleft()
+            self._pending[entry_id] = (now, fields)
+            batch.append((entry_id, fields))
+        return batch
+
+    async def ack(self, entry_ids: List[str]):
+        for entry_id in entry_ids:
+            self._pending.pop(entry_id, None)
+
+
+class RedisEventQueue:
+    """
+    Redis stream read through a consumer group shared by every worker.
+
+    Each entry is delivered to one consumer and stays in the group's pending list
+    until acknowledged; entries a crashed worker left pending are claimed by
+    another consumer after EVENT_PIPELINE_CLAIM_IDLE_SECONDS. Acknowledged entries
+    are deleted, and the stream is capped at EVENT_PIPELINE_STREAM_MAX_LENGTH.
+    """
+
+    def __init__(self):
+        self._group_ready = False
+        self._claim_due = 0.0
+
+    async def publish(self, entries: List[Dict[str, str]]):
+        await redis_client.xadd_many(EVENT_STREAM, entries, maxlen=settings.EVENT_PIPELINE_STREAM_MAX_LENGTH)
+
+    async def read(self, consumer: str, count: int, block_ms: int) -> List[Entry]:
+        try:
+            if not self._group_ready:
+                await redis_client.xgroup_create(EVENT_STREAM, CONSUMER_GROUP)
+                self._group_ready = True
+
+            if time.monotonic() >= self._claim_due:
+                self._claim_due = time.monotonic() + CLAIM_CHECK_INTERVAL_SECONDS
+                claimed = await redis_client.xautoclaim(
+                    EVENT_STREAM, CONSUMER_GROUP, consumer,
+                    settings.EVENT_PIPELINE_CLAIM_IDLE_SECONDS * 1000, count
+                )
+                if claimed:
+                    return claimed
+
+            return await redis_client.xreadgroup(EVENT_STREAM, CONSUMER_GROUP, consumer, count, block_ms)
+        except Exception:
+            # The stream or group may have been removed; recreate it on the next read
+            self._group_ready = False
+            raise
+
+    async def ack(self, entry_ids: List[str]):
+        await redis_client.xack_delete(EVENT_STREAM, CONSUMER_GROUP, entry_ids)
+
+
+def create_event_queue():
+    """Queue selected by SHARED_STATE_BACKEND ("redis" or "memory")"""
+    if settings.SHARED_STATE_BACKEND == "memory":
+        return MemoryEventQueue()
+    return RedisEventQueue()
+
+
+class EventPipeline:
+    """
+    Durable hand-off of stored events to background processing.
+
+    The event endpoints publish one entry per inserted event after their commit.
+    A consumer in every worker reads entries in micro-batches of up to
+    EVENT_PIPELINE_BATCH_SIZE, loads the events with one query, applies their
+    hourly metrics with one upsert, and acknowledges the entries only after that
+    commit. Delivery is at-least-once: a worker dying between the commit and the
+    acknowledgement lets the batch be counted again.
+
+    While Redis is unreachable, entries are published to a process-local queue
+    that the same consumer drains first.
+    """
+
+    def __init__(self):
+        self.queue = create_event_queue()
+        self.fallback = MemoryEventQueue() if isinstance(self.queue, RedisEventQueue) else None
+        self.consumer = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+
+        # Counters
+        self.published = 0
+        self.processed = 0
+        self.failed_batches = 0
+        self._publish_failures = 0
+
+    async def publish(self, rows: List[Dict[str, Any]]):
+        """Queue inserted prompt_events rows (dicts with id, workspace_id, created_at) for processing"""
+        if not rows:
+            return
+
+        entries = [
+            {
+                "event_id": str(row["id"]),
+                "workspace_id": str(row["workspace_id"]),
+                "created_at": row["created_at"].isoformat(),
+            }
+            for row in rows
+        ]
+        try:
+            await self.queue.publish(entries)
+        except Exception as e:
+            self._publish_failures += 1
+            warn_every(logger, self._publish_failures,
+                       f"Event stream publish failed ({self._publish_failures} so far), queueing locally: {e}")
+            await self.fallback.publish(entries)
+        self.published += len(entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "published": self.published,
+            "processed": self.processed,
+            "failed_batches": self.failed_batches,
+            "local_backlog": len(self.fallback if self.fallback is not None else self.queue),
+        }
+
+    async def start(self):
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Stop after the batch in progress, then process whatever is only queued in this process"""
+        self.running = False
+        if self.task and not self.task.done():
+            try:
+                await asyncio.wait_for(self.task, timeout)
+            except asyncio.TimeoutError:
+                logger.error("Event pipeline consumer did not stop in time")
+
+        local = self.fallback if self.fallback is not None else self.queue
+        while len(local):
+            entries = await local.read(self.consumer, settings.EVENT_PIPELINE_BATCH_SIZE, 0)
+            if not entries:
+                break
+            try:
+                await self.process_batch(local, entries)
+            except Exception as e:
+                logger.error(f"Dropping {len(entries)} locally queued events on shutdown: {e}")
+                break
+
+    async def _read(self) -> Tuple[Any, List[Entry]]:
+        if self.fallback is not None and len(self.fallback):
+            entries = await self.fallback.read(self.consumer, settings.EVENT_PIPELINE_BATCH_SIZE, 0)
+            if entries:
+                return self.fallback, entries
+        entries = await self.queue.read(self.consumer, settings.EVENT_PIPELINE_BATCH_SIZE, settings.EVENT_PIPELINE_BLOCK_MS)
+        return self.queue, entries
+
+    async def _run(self):
+        while self.running:
+            try:
+                queue, entries = await self._read()
+                if entries:
+                    await self.process_batch(queue, entries)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Unacknowledged entries are redelivered once they have been idle long enough
+                self.failed_batches += 1
+                logger.error(f"Event pipeline error: {e}")
+                await asyncio.sleep(1)
+
+    async def process_batch(self, queue, entries: List[Entry]):
+        event_ids = {uuid.UUID(fields["event_id"]) for _, fields in entries}
+        # Bound the lookup to the partitions the events can be in
+        since = min(datetime.fromisoformat(fields["created_at"]) for _, fields in entries)
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(PromptEvent).where(PromptEvent.id.in_(event_ids), PromptEvent.created_at >= since)
+            )
+            events = result.scalars().all()
+
+            if events:
+                await update_hourly_metrics(db, events)
+                await db.commit()
+
+            # Metrics are durable now; until acknowledged the entries would be redelivered
+            await queue.ack([entry_id for entry_id, _ in entries])
+            self.processed += len(entries)
+
+            if events:
+                await dispatch_event_hooks(db, events)
+
+
+# Global event pipeline instance
+event_pipeline = EventPipeline()
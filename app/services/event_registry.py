@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.analytics import EventDefinition
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANGE_CHANNEL = "event_definitions:changed"
+
+# Field type -> (accepted Python types, wording used in errors)
+FIELD_TYPES = {
+    "string": (str, "a string"),
+    "number": ((int, float), "a number"),
+    "boolean": (bool, "a boolean"),
+    "array": (list, "an array"),
+    "object": (dict, "an object"),
+}
+
+_MISSING = object()
+
+# Validator: event fields -> error message of the first failed check, or None
+Validator = Callable[[Dict[str, Any]], Optional[str]]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _compile_rule(name: str, rule: Dict[str, Any]) -> List[Tuple[str, Callable[[Any], bool], str]]:
+    """
+    Checks for one field from a rule dict. Supported keys: min, max (numbers),
+    min_length, max_length (strings, arrays, objects), pattern (regex searched in
+    strings) and enum (allowed values). Unknown keys are ignored.
+    """
+    checks = []
+
+    if rule.get("min") is not None:
+        bound = rule["min"]
+        checks.append((name, lambda v, b=bound: _is_number(v) and v >= b, f"Field '{name}' must be a number >= {bound}"))
+    if rule.get("max") is not None:
+        bound = rule["max"]
+        checks.append((name, lambda v, b=bound: _is_number(v) and v <= b, f"Field '{name}' must be a number <= {bound}"))
+    if rule.get("min_length") is not None:
+        bound = int(rule["min_length"])
+        checks.append((name, lambda v, b=bound: isinstance(v, (str, list, dict)) and len(v) >= b,
+                       f"Field '{name}' must have a length >= {bound}"))
+    if rule.get("max_length") is not None:
+        bound = int(rule["max_length"])
+        checks.append((name, lambda v, b=bound: isinstance(v, (str, list, dict)) and len(v) <= b,
+                       f"Field '{name}' must have a length <= {bound}"))
+    if rule.get("pattern"):
+        regex = re.compile(rule["pattern"])
+        checks.append((name, lambda v, r=regex: isinstance(v, str) and r.search(v) is not None,
+                       f"Field '{name}' must match pattern '{rule['pattern']}'"))
+    if rule.get("enum") is not None:
+        try:
+            allowed = frozenset(rule["enum"])
+        except TypeError:
+            allowed = tuple(rule["enum"])  # Unhashable values (objects, arrays)
+        checks.append((name, lambda v, a=allowed: _in(v, a), f"Field '{name}' must be one of {list(rule['enum'])}"))
+
+    return checks
+
+
+def _in(value, allowed) -> bool:
+    try:
+        return value in allowed
+    except TypeError:
+        return False
+
+
+def compile_validator(
+        required_fields: Optional[List[Dict[str, Any]]],
+        optional_fields: Optional[List[Dict[str, Any]]],
+        validation_rules: Optional[List[Dict[str, Any]]]
+) -> Validator:
+    """
+    Turn a definition's field lists and validation_rules into one function.
+
+    Required fields must be present; declared types are checked for required fields
+    and for optional fields that are present and not null. Rules come from each
+    field's "validation" dict and from validation_rules entries ({"field": name, ...});
+    they only apply when the field is present and not null. Checks run in that order and the
+    first failure is reported.
+    """
+    required = []
+    optional = []
+    rules = []
+
+    for field_defs, checks in ((required_fields, required), (optional_fields, optional)):
+        for field_def in field_defs or []:
+            if not isinstance(field_def, dict) or not field_def.get("name"):
+                continue
+            name = field_def["name"]
+            field_type = FIELD_TYPES.get(field_def.get("type"))
+            if field_type:
+                checks.append((name, field_type[0], f"Field '{name}' should be {field_type[1]}"))
+            elif checks is required:
+                checks.append((name, object, None))
+            if isinstance(field_def.get("validation"), dict):
+                rules.extend(_compile_rule(name, field_def["validation"]))
+
+    for rule in validation_rules or []:
+        if isinstance(rule, dict) and rule.get("field"):
+            rules.extend(_compile_rule(rule["field"], rule))
+
+    required = tuple(required)
+    optional = tuple(optional)
+    rules = tuple(rules)
+
+    def validate(fields: Dict[str, Any]) -> Optional[str]:
+        for name, expected, message in required:
+            value = fields.get(name, _MISSING)
+            if value is _MISSING:
+                return f"Required field '{name}' is missing"
+            if not isinstance(value, expected):
+                return message
+        for name, expected, message in optional:
+            value = fields.get(name)
+            if value is not None and not isinstance(value, expected):
+                return message
+        for name, check, message in rules:
+            value = fields.get(name)
+            if value is not None and not check(value):
+                return message
+        return None
+
+    return validate
+
+
+class CompiledDefinition:
+    """An active EventDefinition with its fields and rules compiled into `validate`"""
+
+    __slots__ = ("id", "event_name", "category", "success_criteria", "alert_thresholds", "validate")
+
+    def __init__(self, definition: EventDefinition):
+        self.id = definition.id
+        self.event_name = definition.event_name
+        self.category = definition.category
+        self.success_criteria = definition.success_criteria or {}
+        self.alert_thresholds = definition.alert_thresholds or {}
+        try:
+            self.validate = compile_validator(
+                definition.required_fields, definition.optional_fields, definition.validation_rules
+            )
+        except re.error as e:
+            # A broken pattern should not take the definition down; fall back to field checks only
+            logger.warning(f"Invalid validation rule in event definition {definition.id}: {e}")
+            self.validate = compile_validator(definition.required_fields, definition.optional_fields, None)
+
+
+class EventDefinitionRegistry:
+    """
+    Per-workspace registry of active event definitions, held in memory.
+
+    A workspace's definitions are loaded with one query the first time an event of
+    that workspace is validated and then served from memory, so validating an event
+    costs no database round-trip. The event-definition endpoints call invalidate()
+    after every write, which drops the workspace here and, via Redis pub/sub, in
+    every other worker; entries also expire after EVENT_DEFINITION_CACHE_TTL_SECONDS
+    in case a notification is missed.
+    """
+
+    def __init__(self):
+        # workspace id -> (expires at, {(event_name, category): CompiledDefinition})
+        self._workspaces: "OrderedDict[str, Tuple[float, Dict[Tuple[str, str], CompiledDefinition]]]" = OrderedDict()
+        # Bumped on every drop, so a load racing with a change is not kept
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.running = False
+
+    async def get_workspace(self, db: AsyncSession, workspace_id) -> Dict[Tuple[str, str], CompiledDefinition]:
+        """Compiled active definitions of a workspace, keyed by (event_name, category)"""
+        key = str(workspace_id)
+        entry = self._workspaces.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._workspaces.move_to_end(key)
+            return entry[1]
+
+        generation = self._generation
+        result = await db.execute(
+            select(EventDefinition).where(
+                EventDefinition.workspace_id == workspace_id,
+                EventDefinition.is_active == True
+            )
+        )
+        definitions = {
+            (definition.event_name, definition.category): CompiledDefinition(definition)
+            for definition in result.scalars()
+        }
+
+        if generation == self._generation:
+            self._workspaces[key] = (time.monotonic() + settings.EVENT_DEFINITION_CACHE_TTL_SECONDS, definitions)
+            self._workspaces.move_to_end(key)
+            while len(self._workspaces) > settings.EVENT_DEFINITION_CACHE_MAX_WORKSPACES:
+                self._workspaces.popitem(last=False)
+        return definitions
+
+    async def get(self, db: AsyncSession, workspace_id, event_name: str, category: Optional[str]) -> Optional[CompiledDefinition]:
+        """The active definition for event_name/category in a workspace, if any"""
+        definitions = await self.get_workspace(db, workspace_id)
+        return definitions.get((event_name, category))
+
+    def _drop_local(self, workspace_id):
+        self._generation += 1
+        self._workspaces.pop(str(workspace_id), None)
+
+    def clear_local(self):
+        self._generation += 1
+        self._workspaces.clear()
+
+    async def invalidate(self, workspace_id):
+        """Drop a workspace's definitions in this process and in all other workers"""
+        self._drop_local(workspace_id)
+        try:
+            await redis_client.publish(CHANGE_CHANNEL, {"workspace_id": str(workspace_id)})
+        except Exception as e:
+            logger.warning(f"Event definition change notification failed for {workspace_id}: {e}")
+
+    # Change listener
+
+    async def start(self):
+        """Subscribe to the change channel"""
+        if self.running:
+            return
+
+        self.running = True
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop the change listener"""
+        self.running = False
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self):
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = await redis_client.pubsub()
+                await pubsub.subscribe(CHANGE_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self._drop_local(data["workspace_id"])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Notifications may have been missed while disconnected
+                logger.warning(f"Event definition change listener error: {e}")
+                self.clear_local()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+
+# Global event definition registry instance
+event_registry = EventDefinitionRegistry()
@@ -0,0 +1,86 @@
+import math
+from typing import Dict, Iterable, Optional
+
+# Relative accuracy of quantile estimates (DDSketch): a reported p95 of 200ms
+# means the true p95 lies within 200ms +/- 1%
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LN_GAMMA = math.log(GAMMA)
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+
+def bucket_index(value: float) -> int:
+    """Log-bucket of a positive value; must match the SQL expression in StatisticsService"""
+    return math.ceil(math.log(value) / LN_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket (relative error <= RELATIVE_ACCURACY for anything in it)"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    Mergeable quantile sketch for latencies (DDSketch with log-spaced buckets).
+
+    Stored in PromptStats.latency_sketch as {"<bucket index>": count}. Sketches of
+    any set of hours merge exactly by adding counts, so day/week/custom ranges are
+    answered from the hourly rows without reading raw logs.
+    """
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        self.counts: Dict[int, int] = counts or {}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, int]]) -> "LatencySketch":
+        return cls({int(index): int(count) for index, count in (data or {}).items()})
+
+    @classmethod
+    def merged(cls, sketches: Iterable[Optional[Dict[str, int]]]) -> "LatencySketch":
+        sketch = cls()
+        for data in sketches:
+            sketch.merge(data)
+        return sketch
+
+    def to_dict(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.counts.items()}
+
+    def add(self, value: float, count: int = 1):
+        if value and value > 0:
+            index = bucket_index(value)
+            self.counts[index] = self.counts.get(index, 0) + count
+
+    def merge(self, other):
+        """Merge another sketch (or its serialized dict) into this one"""
+        items = other.counts.items() if isinstance(other, LatencySketch) else (other or {}).items()
+        for index, count in items:
+            index = int(index)
+            self.counts[index] = self.counts.get(index, 0) + int(count)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return bucket_value(index)
+        return bucket_value(max(self.counts))
+
+    def percentiles(self, quantiles: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[int]]:
+        """{"p50_latency_ms": ..., "p95_latency_ms": ..., "p99_latency_ms": ...}"""
+        result = {}
+        for q in quantiles:
+            value = self.quantile(q)
+            result[f"p{round(q * 100)}_latency_ms"] = round(value) if value is not None else None
+        return result
@@ -1,13 +1,17 @@
+import uuid
 from datetime import datetime
 from typing import Optional, Tuple
 from uuid import UUID
 
 from sqlalchemy import select, func, and_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.product_auth import invalidate_request_principal
 from app.models.user import User
 from app.models.user_limits import UserLimits, GlobalLimits, UserAPIUsage
 from app.models.prompt import Prompt
+from app.services.quota import quota_engine
 
 
 class LimitsService:
@@ -113,18 +117,28 @@ class LimitsService:
         can_create = current_count < max_prompts
         return can_create, current_count, max_prompts
 
-    async def check_api_limit(self, user_id: UUID) -> Tuple[bool, int, int, datetime]:
+    async def check_api_limit(
+            self,
+            user_id: UUID,
+            *,
+            is_superuser: Optional[bool] = None,
+            max_api_requests: Optional[int] = None
+    ) -> Tuple[bool, int, int, datetime]:
         """
         Check if user can make API requests
+        Callers that already know the superuser flag and effective daily limit
+        (e.g. from a RequestPrincipal) can pass them to skip those lookups.
         Returns: (can_request, current_count, max_allowed, reset_time)
         """
         # Check if user is superuser
-        user_result = await self.session.execute(
-            select(User).where(User.id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
+        if is_superuser is None:
+            user_result = await self.session.execute(
+                select(User).where(User.id == user_id)
+            )
+            user = user_result.scalar_one_or_none()
+            is_superuser = bool(user and user.is_superuser)
 
-        if user and user.is_superuser:
+        if is_superuser:
             reset_time = UserAPIUsage.get_next_reset_time()
             return True, 0, -1, reset_time  # -1 indicates unlimited
 
@@ -142,8 +156,14 @@ class LimitsService:
 
         current_count = usage.api_requests_count if usage else 0
 
+        # The live counter runs ahead of user_api_usage until the next flush
+        live_count = await quota_engine.get_usage(user_id)
+        if live_count is not None:
+            current_count = max(current_count, live_count)
+
         # Get limits
-        _, max_api_requests = await self.get_effective_limits(user_id)
+        if max_api_requests is None:
+            _, max_api_requests = await self.get_effective_limits(user_id)
 
         # Calculate reset time (next day at 00:00 UTC)
         reset_time = UserAPIUsage.get_next_reset_time()
@@ -153,38 +173,25 @@ class LimitsService:
 
     async def increment_api_usage(self, user_id: UUID) -> int:
         """
-        Increment API usage for today
+        Increment API usage for today in a single atomic upsert
+        (the get-prompt hot path counts through quota_engine instead)
         Returns: new count
         """
-        today = UserAPIUsage.get_today_date()
-
-        # Try to get existing usage record
-        usage_result = await self.session.execute(
-            select(UserAPIUsage).where(
-                and_(
-                    UserAPIUsage.user_id == user_id,
-                    UserAPIUsage.date == today
-                )
-            )
-        )
-        usage = usage_result.scalar_one_or_none()
-
-        if usage:
-            # Increment existing record
-            usage.api_requests_count += 1
-            new_count = usage.api_requests_count
-        else:
-            # Create new record
-            usage = UserAPIUsage(
-                user_id=user_id,
-                date=today,
-                api_requests_count=1
-            )
-            self.session.add(usage)
-            new_count = 1
+        stmt = insert(UserAPIUsage).values(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            date=UserAPIUsage.get_today_date(),
+            api_requests_count=1
+        ).on_conflict_do_update(
+            constraint="uq_user_api_usage_user_date",
+            set_={
+                "api_requests_count": UserAPIUsage.api_requests_count + 1,
+                "updated_at": func.now()
+            }
+        ).returning(UserAPIUsage.api_requests_count)
 
-        await self.session.flush()
-        return new_count
+        result = await self.session.execute(stmt)
+        return result.scalar()
 
     async def update_user_limits(self, user_id: UUID, max_prompts: Optional[int] = None,
                                  max_api_requests: Optional[int] = None) -> UserLimits:
@@ -197,6 +204,7 @@ class LimitsService:
             user_limits.max_api_requests_per_day = max_api_requests
 
         await self.session.flush()
+        await invalidate_request_principal(user_id=user_id)
         return user_limits
 
     async def update_global_limits(self, max_prompts: Optional[int] = None,
@@ -210,6 +218,7 @@ class LimitsService:
             global_limits.default_max_api_requests_per_day = max_api_requests
 
         await self.session.flush()
+        await invalidate_request_principal()
         return global_limits
 
     async def get_user_usage_stats(self, user_id: UUID) -> dict:
@@ -0,0 +1,152 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.prompt_stats import StatsAggregationWatermark
+
+# Tables range-partitioned by month on created_at -> retention setting
+PARTITIONED_TABLES = {
+    "product_api_logs": "PRODUCT_API_LOG_RETENTION_DAYS",
+    "prompt_events": "PROMPT_EVENT_RETENTION_DAYS",
+}
+
+# Unpartitioned tables whose rows (by created_at) go together with a partitioned table's months
+DEPENDENT_TABLES = {
+    "prompt_events": "prompt_event_keys",
+}
+
+
+def month_start(moment: datetime) -> datetime:
+    """First instant (UTC) of the month containing moment"""
+    moment = moment.astimezone(timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=month_index // 12, month=month_index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+class PartitionManager:
+    """
+    Keeps the monthly partitions of product_api_logs and prompt_events in shape:
+    creates the coming months ahead of time and drops months past retention.
+
+    Dropping a partition removes a month of rows in one catalog operation instead of
+    a DELETE that touches every row. Tables that have not been migrated to
+    partitioning yet are left alone.
+    """
+
+    async def is_partitioned(self, session: AsyncSession, table: str) -> bool:
+        result = await session.execute(
+            text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+        )
+        return bool(result.scalar())
+
+    async def list_partitions(self, session: AsyncSession, table: str) -> List[Tuple[str, datetime]]:
+        """Monthly partitions of a table as (name, month start), oldest first"""
+        result = await session.execute(
+            text("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = to_regclass(:table)
+            """),
+            {"table": table}
+        )
+        pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+        partitions = []
+        for name in result.scalars():
+            match = pattern.match(name)
+            if match:
+                month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+                partitions.append((name, month))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    async def ensure_partitions(self, session: AsyncSession, table: str, months_ahead: int) -> List[str]:
+        """Create the partitions of the current month and the next months_ahead months"""
+        existing = {name for name, _ in await self.list_partitions(session, table)}
+        created = []
+        month = month_start(datetime.now(timezone.utc))
+        for _ in range(months_ahead + 1):
+            name = partition_name(table, month)
+            if name not in existing:
+                await session.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+            month = add_months(month, 1)
+        return created
+
+    async def drop_expired(
+            self,
+            session: AsyncSession,
+            table: str,
+            retention_days: int,
+            keep_from: Optional[datetime] = None
+    ) -> List[str]:
+        """
+        Drop the partitions whose whole month is older than retention_days.
+        Nothing at or after keep_from is dropped.
+        """
+        if retention_days <= 0:
+            return []
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        if keep_from is not None:
+            cutoff = min(cutoff, keep_from)
+
+        dropped = []
+        for name, month in await self.list_partitions(session, table):
+            if add_months(month, 1) > cutoff:
+                break
+            await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+        return dropped
+
+    async def _stats_watermark(self, session: AsyncSession) -> Optional[datetime]:
+        """Logs after the hourly PromptStats watermark are not aggregated yet and must be kept"""
+        result = await session.execute(
+            select(StatsAggregationWatermark.watermark).where(StatsAggregationWatermark.period_type == "hour")
+        )
+        return result.scalar()
+
+    async def _prune_dependent(self, session: AsyncSession, table: str, dependent: str):
+        """Delete dependent rows older than the oldest remaining partition of table"""
+        partitions = await self.list_partitions(session, table)
+        if partitions:
+            await session.execute(
+                text(f"DELETE FROM {dependent} WHERE created_at < :oldest"), {"oldest": partitions[0][1]}
+            )
+
+    async def run_maintenance(self) -> dict:
+        """Create upcoming partitions and drop expired ones for every partitioned table"""
+        summary = {}
+        async with AsyncSessionLocal() as session:
+            for table, retention_setting in PARTITIONED_TABLES.items():
+                if not await self.is_partitioned(session, table):
+                    continue
+
+                created = await self.ensure_partitions(session, table, settings.PARTITION_PRECREATE_MONTHS)
+                keep_from = await self._stats_watermark(session) if table == "product_api_logs" else None
+                dropped = await self.drop_expired(session, table, getattr(settings, retention_setting), keep_from)
+                if dropped and table in DEPENDENT_TABLES:
+                    await self._prune_dependent(session, table, DEPENDENT_TABLES[table])
+                await session.commit()
+
+                summary[table] = {"created": created, "dropped": dropped}
+        return summary
+
+
+# Global partition manager instance
+partition_manager = PartitionManager()
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "prompt_cache:invalidate"
+
+# Generation counters outlive any request that could still be writing an older one
+GENERATION_TTL_SECONDS = 86400
+
+# Store payloads only for prompts not invalidated since they were read: invalidate()
+# bumps the prompt's generation, so a request that loaded the previous version from
+# Postgres cannot put it back after a deploy.
+# KEYS[2i-1] = payload hash, KEYS[2i] = generation counter
+# ARGV[1] = hash ttl, then per prompt: generation read with the miss, number of
+# fields n, and n field/payload pairs. Returns 1 per prompt written, 0 per prompt skipped.
+SET_IF_GENERATION_LUA = """
+local ttl = tonumber(ARGV[1])
+local written = {}
+local arg = 2
+for i = 1, #KEYS, 2 do
+    local current = redis.call('GET', KEYS[i + 1]) or '0'
+    local count = tonumber(ARGV[arg + 1])
+    if current == ARGV[arg] then
+        for j = 0, count - 1 do
+            redis.call('HSET', KEYS[i], ARGV[arg + 2 + j * 2], ARGV[arg + 3 + j * 2])
+        end
+        redis.call('EXPIRE', KEYS[i], ttl)
+        written[#written + 1] = 1
+    else
+        written[#written + 1] = 0
+    end
+    arg = arg + 2 + count * 2
+end
+return written
+"""
+
+
+def _redis_key(user_id, slug: str) -> str:
+    return f"prompt_cache:{user_id}:{slug}"
+
+
+def _generation_key(user_id, slug: str) -> str:
+    return f"prompt_cache:gen:{user_id}:{slug}"
+
+
+def selector_field(version_number: Optional[int] = None, status: Optional[str] = None) -> str:
+    """Hash field for a (version_number, status) selector"""
+    return f"v={version_number if version_number is not None else '*'}|s={status or '*'}"
+
+
+def version_field(version_id) -> str:
+    """Hash field for a version looked up by id (A/B test variants)"""
+    return f"id={version_id}"
+
+
+class PromptCache:
+    """
+    Two-tier cache of resolved get-prompt payloads.
+
+    Entries are grouped per (owner user, slug) so that one prompt change drops every
+    selector at once: a Redis hash per prompt, and one in-process dict per prompt.
+    Payloads are the JSON-safe fields of PromptContentResponse plus prompt/version ids,
+    without the per-request trace_id and A/B metadata.
+
+    A miss also returns the prompt's generation, which the caller hands back to set()
+    with the payload it built; the write is skipped if the prompt was invalidated
+    meanwhile (generation None: Redis was unreachable, only the in-process tier is written).
+    """
+
+    def __init__(self):
+        self._local: "OrderedDict[Tuple[str, str], Dict[str, Tuple[float, dict]]]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        self._script = None
+        self.running = False
+
+    # In-process tier
+
+    def _get_local(self, user_id, slug: str, field: str) -> Optional[dict]:
+        entries = self._local.get((str(user_id), slug))
+        if not entries:
+            return None
+        entry = entries.get(field)
+        if not entry:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            entries.pop(field, None)
+            return None
+        self._local.move_to_end((str(user_id), slug))
+        return payload
+
+    def _set_local(self, user_id, slug: str, field: str, payload: dict):
+        key = (str(user_id), slug)
+        entries = self._local.setdefault(key, {})
+        entries[field] = (time.monotonic() + settings.PROMPT_CACHE_LOCAL_TTL_SECONDS, payload)
+        self._local.move_to_end(key)
+        while len(self._local) > settings.PROMPT_CACHE_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    def _drop_local(self, user_id, slug: str):
+        self._local.pop((str(user_id), slug), None)
+
+    def clear_local(self):
+        self._local.clear()
+
+    # Public API
+
+    async def get(self, user_id, slug: str, field: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Return (cached payload, generation for set() on a miss), checking the in-process tier before Redis"""
+        return (await self.get_many(user_id, [(slug, field)]))[0]
+
+    async def set(self, user_id, slug: str, field: str, payload: dict, generation: Optional[str]):
+        """Store a payload in both tiers, unless the prompt was invalidated after the miss that returned generation"""
+        await self.set_many(user_id, [(slug, field, payload, generation)])
+
+    async def get_many(self, user_id, keys: List[Tuple[str, str]]) -> List[Tuple[Optional[dict], Optional[str]]]:
+        """(payload, generation) of several (slug, field) pairs; misses of the in-process tier share one Redis round-trip"""
+        results = [(self._get_local(user_id, slug, field), None) for slug, field in keys]
+        missing = [index for index, (payload, _) in enumerate(results) if payload is None]
+        if not missing:
+            return results
+
+        try:
+            pipe = await redis_client.pipeline()
+            for index in missing:
+                slug, field = keys[index]
+                pipe.hget(_redis_key(user_id, slug), field)
+                pipe.get(_generation_key(user_id, slug))
+            values = await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Prompt cache read failed: {e}")
+            return results
+
+        for position, index in enumerate(missing):
+            raw, generation = values[position * 2], values[position * 2 + 1] or "0"
+            payload = None
+            if raw is not None:
+                slug, field = keys[index]
+                payload = json.loads(raw)
+                self._set_local(user_id, slug, field, payload)
+            results[index] = (payload, generation)
+        return results
+
+    async def set_many(self, user_id, entries: List[Tuple[str, str, dict, Optional[str]]]):
+        """Store several (slug, field, payload, generation) entries in both tiers with one Redis round-trip"""
+        by_slug: Dict[str, Tuple[Optional[str], List[Tuple[str, dict]]]] = {}
+        for slug, field, payload, generation in entries:
+            by_slug.setdefault(slug, (generation, []))[1].append((field, payload))
+
+        # Redis was unreachable when these were read: nothing to guard, keep them in process only
+        unguarded = [slug for slug, (generation, _) in by_slug.items() if generation is None]
+        for slug in unguarded:
+            for field, payload in by_slug.pop(slug)[1]:
+                self._set_local(user_id, slug, field, payload)
+        if not by_slug:
+            return
+
+        keys, args = [], [settings.PROMPT_CACHE_TTL_SECONDS]
+        for slug, (generation, fields) in by_slug.items():
+            keys.extend((_redis_key(user_id, slug), _generation_key(user_id, slug)))
+            args.extend((generation, len(fields)))
+            for field, payload in fields:
+                args.extend((field, json.dumps(payload)))
+
+        try:
+            if self._script is None:
+                self._script = await redis_client.register_script(SET_IF_GENERATION_LUA)
+            written = await self._script(keys=keys, args=args)
+        except Exception as e:
+            logger.warning(f"Prompt cache write failed: {e}")
+            written = [1] * len(by_slug)
+
+        for (slug, (_, fields)), applied in zip(by_slug.items(), written):
+            # A prompt invalidated since the read is not cached in process either
+            if int(applied):
+                for field, payload in fields:
+                    self._set_local(user_id, slug, field, payload)
+
+    async def invalidate(self, user_id, *slugs: str):
+        """Drop every cached selector of a prompt in this process, in Redis and in all other workers"""
+        for slug in set(slugs):
+            if not slug:
+                continue
+            self._drop_local(user_id, slug)
+            try:
+                # Bump the generation first, so writes of payloads read before now are refused
+                pipe = await redis_client.pipeline(transaction=True)
+                pipe.incr(_generation_key(user_id, slug))
+                pipe.expire(_generation_key(user_id, slug), GENERATION_TTL_SECONDS)
+                pipe.delete(_redis_key(user_id, slug))
+                pipe.publish(INVALIDATION_CHANNEL, json.dumps({"user_id": str(user_id), "slug": slug}))
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Prompt cache invalidation failed for {user_id}/{slug}: {e}")
+
+    # Invalidation listener
+
+    async def start(self):
+        """Subscribe to the invalidation channel"""
+        if self.running:
+            return
+
+        self.running = True
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop the invalidation listener"""
+        self.running = False
+        if self._listener and not self._listener.done():
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen(self):
+        while self.running:
+            pubsub = None
+            try:
+                pubsub = await redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    self._drop_local(data["user_id"], data["slug"])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                # Messages may have been missed while disconnected
+                logger.warning(f"Prompt cache invalidation listener error: {e}")
+                self.clear_local()
+                await asyncio.sleep(5)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+
+def build_payload(prompt, version) -> Dict[str, Any]:
+    """Serialize a resolved prompt version into a cacheable payload"""
+    return {
+        "prompt_id": str(prompt.id),
+        "prompt_version_id": str(version.id),
+        "slug": prompt.slug,
+        "version_number": version.version_number,
+        "status": version.status.value,
+        "system_prompt": version.system_prompt,
+        "user_prompt": version.user_prompt,
+        "assistant_prompt": version.assistant_prompt,
+        "variables": version.variables or [],
+        "model_config": version.model_config or {},
+        "deployed_at": version.deployed_at.isoformat() if version.deployed_at else None,
+        "created_at": version.created_at.isoformat() if version.created_at else None,
+        "updated_at": version.updated_at.isoformat() if version.updated_at else None,
+    }
+
+
+async def invalidate_prompt(prompt, *previous_slugs: str):
+    """Invalidate cached payloads for a prompt (and any slug it was previously known under)"""
+    await prompt_cache.invalidate(prompt.created_by, prompt.slug, *previous_slugs)
+
+
+# Global prompt cache instance
+prompt_cache = PromptCache()
@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, and_, func, update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user_limits import UserAPIUsage
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+DIRTY_SET_KEY = "quota:dirty"
+
+# Atomic check-and-increment of a daily counter. Besides the live total, the
+# requests not yet written to user_api_usage accumulate in a delta key that the
+# flusher adds to the row, so counts written straight to the row (database
+# fallback) are never overwritten.
+# KEYS[1] = counter, KEYS[2] = dirty set, KEYS[3] = delta
+# ARGV[1] = daily limit (-1 = unlimited), ARGV[2] = expire-at (unix seconds),
+# ARGV[3] = dirty set member, ARGV[4] = seed value from Postgres ('' if not loaded yet),
+# ARGV[5] = number of requests to count, ARGV[6] = delta expire-at
+# Returns {status, count}: 1 = allowed, 0 = limit reached, -1 = counter must be seeded first
+CHECK_AND_INCREMENT_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    if ARGV[4] == '' then
+        return {-1, 0}
+    end
+    redis.call('SET', KEYS[1], ARGV[4], 'NX')
+    redis.call('EXPIREAT', KEYS[1], ARGV[2])
+    current = redis.call('GET', KEYS[1])
+end
+current = tonumber(current)
+local limit = tonumber(ARGV[1])
+local amount = tonumber(ARGV[5])
+if limit >= 0 and current + amount > limit then
+    return {0, current}
+end
+current = redis.call('INCRBY', KEYS[1], amount)
+redis.call('EXPIREAT', KEYS[1], ARGV[2])
+redis.call('INCRBY', KEYS[3], amount)
+redis.call('EXPIREAT', KEYS[3], ARGV[6])
+redis.call('SADD', KEYS[2], ARGV[3])
+return {1, current}
+"""
+
+# Give back requests, only to a counter that still exists: a missing key (day rolled
+# over, expired, never created) must not come back as a negative counter without TTL.
+# KEYS[1] = counter, KEYS[2] = dirty set, KEYS[3] = delta
+# ARGV[1] = amount, ARGV[2] = dirty set member, ARGV[3] = delta expire-at
+# Returns the new count, or -1 if there was no counter
+RELEASE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return -1
+end
+local amount = math.min(tonumber(current), tonumber(ARGV[1]))
+current = redis.call('DECRBY', KEYS[1], amount)
+redis.call('DECRBY', KEYS[3], amount)
+redis.call('EXPIREAT', KEYS[3], ARGV[3])
+redis.call('SADD', KEYS[2], ARGV[2])
+return current
+"""
+
+
+def _counter_key(user_id, day: datetime) -> str:
+    return f"quota:{user_id}:{day.strftime('%Y%m%d')}"
+
+
+def _delta_key(user_id, day: datetime) -> str:
+    return f"quota:delta:{user_id}:{day.strftime('%Y%m%d')}"
+
+
+def _delta_expire_at(day: datetime) -> int:
+    """Deltas outlive their day's counter so the flusher still finds them after midnight"""
+    return int((day + timedelta(days=2)).timestamp())
+
+
+def _dirty_member(user_id, day: datetime) -> str:
+    return f"{user_id}:{day.strftime('%Y%m%d')}"
+
+
+def _parse_dirty_member(member: str) -> Tuple[UUID, datetime]:
+    user_id, day = member.rsplit(":", 1)
+    return UUID(user_id), datetime.strptime(day, "%Y%m%d").replace(tzinfo=timezone.utc)
+
+
+class QuotaGrant:
+    """Where acquire() counted requests, so release() gives them back to the same counter"""
+
+    __slots__ = ("user_id", "day", "key")
+
+    def __init__(self, user_id: UUID, day: datetime, key: Optional[str]):
+        self.user_id = user_id
+        self.day = day
+        self.key = key  # Redis counter; None when counted by the database fallback
+
+
+class QuotaEngine:
+    """
+    Daily API request quotas kept in Redis.
+
+    Each request does check-and-increment in a single Lua call, so concurrent requests
+    for one user neither serialize on the user_api_usage row nor lose increments.
+    The requests counted since the last flush are added to user_api_usage in batches
+    by a background flusher, which keeps the table as the reporting source of truth.
+    When Redis is unavailable the engine falls back to an atomic Postgres upsert.
+    """
+
+    def __init__(self):
+        self._script = None
+        self._release_script = None
+        # Counters this worker bypassed through the database fallback: re-seeded from
+        # Postgres on their next use, so the fallback's requests count against the limit
+        self._reseed: Set[str] = set()
+        self.running = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def _run_script(
+        self, user_id: UUID, day: datetime, limit: int, reset_time: datetime, seed: str, amount: int
+    ):
+        if self._script is None:
+            self._script = await redis_client.register_script(CHECK_AND_INCREMENT_LUA)
+        return await self._script(
+            keys=[_counter_key(user_id, day), DIRTY_SET_KEY, _delta_key(user_id, day)],
+            args=[
+                limit, int(reset_time.timestamp()), _dirty_member(user_id, day), seed, amount,
+                _delta_expire_at(day)
+            ]
+        )
+
+    async def acquire(
+        self, user_id: UUID, limit: int, amount: int = 1
+    ) -> Tuple[bool, int, int, datetime, QuotaGrant]:
+        """
+        Count `amount` requests against today's quota if they all still fit.
+        A limit of -1 means unlimited (the requests are still counted).
+        Returns: (allowed, current_count, max_allowed, reset_time, grant for release())
+        """
+        today = UserAPIUsage.get_today_date()
+        reset_time = UserAPIUsage.get_next_reset_time()
+        key = _counter_key(user_id, today)
+
+        try:
+            if key in self._reseed:
+                await redis_client.delete(key)
+                self._reseed.discard(key)
+            status_code, count = await self._run_script(user_id, today, limit, reset_time, "", amount)
+            if status_code == -1:
+                # First request of the day in Redis: continue from what Postgres already
+                # has, plus what is counted but not flushed yet
+                pending = await redis_client.get(_delta_key(user_id, today))
+                seed = await self._load_db_count(user_id, today) + int(pending or 0)
+                status_code, count = await self._run_script(user_id, today, limit, reset_time, str(seed), amount)
+        except Exception as e:
+            logger.warning(f"Quota counter unavailable, falling back to database: {e}")
+            allowed, count = await self._acquire_db(user_id, today, limit, amount)
+            self._reseed.add(key)
+            return allowed, count, limit, reset_time, QuotaGrant(user_id, today, None)
+
+        return status_code == 1, int(count), limit, reset_time, QuotaGrant(user_id, today, key)
+
+    async def release(self, grant: QuotaGrant, amount: int = 1):
+        """Give back requests acquired for calls that did not succeed"""
+        try:
+            if grant.key is not None:
+                if self._release_script is None:
+                    self._release_script = await redis_client.register_script(RELEASE_LUA)
+                released = await self._release_script(
+                    keys=[grant.key, DIRTY_SET_KEY, _delta_key(grant.user_id, grant.day)],
+                    args=[amount, _dirty_member(grant.user_id, grant.day), _delta_expire_at(grant.day)]
+                )
+                if int(released) >= 0:
+                    return
+            # Counted by the database fallback, or the Redis counter is gone
+            await self._release_db(grant.user_id, grant.day, amount)
+        except Exception as e:
+            logger.warning(f"Failed to release quota for {grant.user_id}: {e}")
+
+    async def get_usage(self, user_id: UUID) -> Optional[int]:
+        """Today's live counter for a user, or None if Redis has none"""
+        try:
+            value = await redis_client.get(_counter_key(user_id, UserAPIUsage.get_today_date()))
+        except Exception:
+            return None
+        return int(value) if value is not None else None
+
+    async def _load_db_count(self, user_id: UUID, day: datetime) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(UserAPIUsage.api_requests_count).where(
+                    and_(UserAPIUsage.user_id == user_id, UserAPIUsage.date == day)
+                )
+            )
+            return result.scalar() or 0
+
+    async def _acquire_db(self, user_id: UUID, day: datetime, limit: int, amount: int = 1) -> Tuple[bool, int]:
+        """Conditional atomic upsert used while Redis is down"""
+        if 0 <= limit < amount:
+            return False, 0
+
+        stmt = insert(UserAPIUsage).values(
+            id=uuid.uuid4(), user_id=user_id, date=day, api_requests_count=amount
+        )
+        update_where = None
+        if limit >= 0:
+            update_where = UserAPIUsage.api_requests_count + amount <= limit
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_user_api_usage_user_date",
+            set_={
+                "api_requests_count": UserAPIUsage.api_requests_count + amount,
+                "updated_at": func.now(),
+            },
+            where=update_where
+        ).returning(UserAPIUsage.api_requests_count)
+
+        async with AsyncSessionLocal() as session:
+            count = (await session.execute(stmt)).scalar()
+            await session.commit()
+
+        if count is None:
+            return False, await self._load_db_count(user_id, day)
+        return True, count
+
+    async def _release_db(self, user_id: UUID, day: datetime, amount: int):
+        stmt = update(UserAPIUsage).where(
+            and_(UserAPIUsage.user_id == user_id, UserAPIUsage.date == day)
+        ).values(
+            api_requests_count=func.greatest(UserAPIUsage.api_requests_count - amount, 0),
+            updated_at=func.now()
+        )
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    # Background flusher
+
+    async def start(self):
+        if self.running:
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.running = False
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush quota counters on shutdown: {e}")
+
+    async def _run(self):
+        while self.running:
+            try:
+                await asyncio.sleep(settings.QUOTA_FLUSH_INTERVAL_SECONDS)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Failed to flush quota counters: {e}")
+
+    async def flush(self) -> int:
+        """Write touched counters back to user_api_usage; returns the number of rows written"""
+        written = 0
+        while True:
+            members = await redis_client.spop(DIRTY_SET_KEY, settings.QUOTA_FLUSH_BATCH_SIZE)
+            if not members:
+                return written
+
+            try:
+                written += await self._flush_batch(members)
+            except Exception:
+                # Put the batch back so the next run retries it
+                await redis_client.sadd(DIRTY_SET_KEY, *members)
+                raise
+
+            if len(members) < settings.QUOTA_FLUSH_BATCH_SIZE:
+                return written
+
+    async def _flush_batch(self, members) -> int:
+        parsed = [_parse_dirty_member(member) for member in members]
+        pipe = await redis_client.pipeline()
+        for user_id, day in parsed:
+            pipe.getdel(_delta_key(user_id, day))
+        deltas = await pipe.execute()
+
+        counted = [
+            (user_id, day, int(delta))
+            for (user_id, day), delta in zip(parsed, deltas)
+            if delta is not None and int(delta) != 0
+        ]
+        if not counted:
+            return 0
+
+        try:
+            async with AsyncSessionLocal() as session:
+                # Deltas add to the row: counts the database fallback wrote meanwhile are kept
+                added = [
+                    {"id": uuid.uuid4(), "user_id": user_id, "date": day, "api_requests_count": delta}
+                    for user_id, day, delta in counted
+                    if delta > 0
+                ]
+                if added:
+                    stmt = insert(UserAPIUsage).values(added)
+                    stmt = stmt.on_conflict_do_update(
+                        constraint="uq_user_api_usage_user_date",
+                        set_={
+                            "api_requests_count": UserAPIUsage.api_requests_count + stmt.excluded.api_requests_count,
+                            "updated_at": func.now(),
+                        }
+                    )
+                    await session.execute(stmt)
+                # Releases of requests that were already flushed
+                for user_id, day, delta in counted:
+                    if delta < 0:
+                        await session.execute(
+                            update(UserAPIUsage).where(
+                                and_(UserAPIUsage.user_id == user_id, UserAPIUsage.date == day)
+                            ).values(
+                                api_requests_count=func.greatest(UserAPIUsage.api_requests_count + delta, 0),
+                                updated_at=func.now()
+                            )
+                        )
+                await session.commit()
+        except Exception:
+            # Give the deltas back; flush() puts the members back in the dirty set
+            pipe = await redis_client.pipeline()
+            for user_id, day, delta in counted:
+                pipe.incrby(_delta_key(user_id, day), delta)
+                pipe.expireat(_delta_key(user_id, day), _delta_expire_at(day))
+            await pipe.execute()
+            raise
+
+        return len(counted)
+
+
+# Global quota engine instance
+quota_engine = QuotaEngine()
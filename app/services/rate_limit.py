@@ -0,0 +1,215 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.log_throttle import warn_every
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Sliding-window counter over every limit of a request, checked and counted atomically.
+# Each limit keeps two fixed-window counters (<key>:<window index>); the previous one is
+# weighted by how much of it still overlaps the sliding window. A denied request is not
+# counted; with a block time, exceeding the limit also sets <key>:blocked for that long.
+#
+# KEYS[i] = limit key, ARGV[1] = cost, then per limit: limit, window seconds, block seconds
+# Returns {allowed, index of the deciding limit (0 = none), remaining, retry after ms}
+SLIDING_WINDOW_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local cost = tonumber(ARGV[1])
+
+local remaining = -1
+local remaining_index = 0
+local current_keys = {}
+
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[i * 3 - 1])
+    local window = tonumber(ARGV[i * 3])
+    local block = tonumber(ARGV[i * 3 + 1])
+
+    if block > 0 then
+        local blocked_ms = redis.call('PTTL', KEYS[i] .. ':blocked')
+        if blocked_ms > 0 then
+            return {0, i, 0, blocked_ms}
+        end
+    end
+
+    local index = math.floor(now / window)
+    local elapsed = now - index * window
+    local current_key = KEYS[i] .. ':' .. index
+    local current = tonumber(redis.call('GET', current_key) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i] .. ':' .. (index - 1)) or '0')
+    local estimated = previous * (window - elapsed) / window + current
+
+    if estimated + cost > limit then
+        if block > 0 then
+            redis.call('SET', KEYS[i] .. ':blocked', 1, 'EX', block)
+            return {0, i, 0, block * 1000}
+        end
+        local wait = window - elapsed
+        if current + cost <= limit and previous > 0 then
+            -- The previous window decays enough before the next one starts
+            wait = wait - (limit - current - cost) * window / previous
+        end
+        return {0, i, 0, math.ceil(wait * 1000)}
+    end
+
+    current_keys[i] = current_key
+    local left = math.floor(limit - estimated - cost)
+    if remaining < 0 or left < remaining then
+        remaining = left
+        remaining_index = i
+    end
+end
+
+for i = 1, #KEYS do
+    redis.call('INCRBY', current_keys[i], cost)
+    redis.call('EXPIRE', current_keys[i], tonumber(ARGV[i * 3]) * 2)
+end
+return {1, remaining_index, remaining, 0}
+"""
+
+
+class RateLimit:
+    """One limit: at most `limit` requests in any `window_seconds` for `key`"""
+
+    __slots__ = ("key", "limit", "window_seconds", "block_seconds")
+
+    def __init__(self, key: str, limit: int, window_seconds: int, block_seconds: int = 0):
+        self.key = key
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.block_seconds = block_seconds
+
+
+class RateLimitResult:
+    """Outcome of a hit; `limit` is the limit that denied it, or the one with the least room left"""
+
+    __slots__ = ("allowed", "limit", "remaining", "retry_after")
+
+    def __init__(self, allowed: bool, limit: Optional[RateLimit], remaining: int, retry_after: float):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_seconds(self) -> int:
+        """Whole seconds for a Retry-After header"""
+        return max(1, math.ceil(self.retry_after))
+
+
+class LocalRateLimiter:
+    """
+    The same sliding-window counters kept in process, for SHARED_STATE_BACKEND=memory
+    and for when Redis is unreachable. Keys live in a fixed-size LRU, so memory stays
+    bounded however many IPs or keys are seen (an evicted key simply starts over).
+    """
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or settings.RATE_LIMIT_LOCAL_MAX_KEYS
+        # key -> [window index, current count, previous count, blocked until]
+        self._windows: "OrderedDict[str, list]" = OrderedDict()
+
+    def _window(self, limit: RateLimit, index: int) -> list:
+        state = self._windows.get(limit.key)
+        if state is None:
+            state = self._windows[limit.key] = [index, 0, 0, 0.0]
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(limit.key)
+            if state[0] != index:
+                # Roll forward; a gap of more than one window leaves nothing to carry
+                state[2] = state[1] if state[0] == index - 1 else 0
+                state[1] = 0
+                state[0] = index
+        return state
+
+    def hit(self, limits: Sequence[RateLimit], cost: int = 1) -> RateLimitResult:
+        now = time.time()
+        remaining = None
+        remaining_limit = None
+        windows: List[list] = []
+
+        for limit in limits:
+            window = limit.window_seconds
+            index = int(now // window)
+            elapsed = now - index * window
+            state = self._window(limit, index)
+
+            if state[3] > now:
+                return RateLimitResult(False, limit, 0, state[3] - now)
+
+            estimated = state[2] * (window - elapsed) / window + state[1]
+            if estimated + cost > limit.limit:
+                if limit.block_seconds > 0:
+                    state[3] = now + limit.block_seconds
+                    return RateLimitResult(False, limit, 0, limit.block_seconds)
+                wait = window - elapsed
+                if state[1] + cost <= limit.limit and state[2] > 0:
+                    wait -= (limit.limit - state[1] - cost) * window / state[2]
+                return RateLimitResult(False, limit, 0, wait)
+
+            windows.append(state)
+            left = math.floor(limit.limit - estimated - cost)
+            if remaining is None or left < remaining:
+                remaining, remaining_limit = left, limit
+
+        for state in windows:
+            state[1] += cost
+        return RateLimitResult(True, remaining_limit, remaining if remaining is not None else 0, 0.0)
+
+
+class RateLimitEngine:
+    """
+    Sliding-window rate limiter shared by every worker.
+
+    All limits of a request are checked and counted in one atomic Lua call, i.e. one
+    Redis round-trip and O(1) work per limit. While Redis is unreachable the engine
+    falls back to LocalRateLimiter, so limits become per worker instead of failing
+    requests.
+    """
+
+    def __init__(self):
+        self.local = LocalRateLimiter()
+        self.use_redis = settings.SHARED_STATE_BACKEND != "memory"
+        self._script = None
+        self._failures = 0
+
+    async def hit(self, limits: Sequence[RateLimit], cost: int = 1) -> RateLimitResult:
+        """Count one request (of weight cost) against every limit, unless one of them denies it"""
+        if not limits:
+            return RateLimitResult(True, None, 0, 0.0)
+        if not self.use_redis:
+            return self.local.hit(limits, cost)
+
+        args = [cost]
+        for limit in limits:
+            args.extend((limit.limit, limit.window_seconds, limit.block_seconds))
+
+        try:
+            if self._script is None:
+                self._script = await redis_client.register_script(SLIDING_WINDOW_LUA)
+            allowed, index, remaining, retry_after_ms = await self._script(
+                keys=[limit.key for limit in limits], args=args
+            )
+        except Exception as e:
+            self._failures += 1
+            warn_every(logger, self._failures, f"Rate limiter Redis call failed ({self._failures} so far): {e}")
+            return self.local.hit(limits, cost)
+
+        return RateLimitResult(
+            bool(allowed),
+            limits[int(index) - 1] if int(index) > 0 else None,
+            int(remaining),
+            int(retry_after_ms) / 1000
+        )
+
+
+# Global rate limit engine instance
+rate_limit_engine = RateLimitEngine()
@@ -1,5 +1,6 @@
 import redis.asyncio as redis
 from app.core.config import settings
+from app.core.metrics import instrument_redis
 import json
 from typing import Optional, Any
 import logging
@@ -14,14 +15,14 @@ class RedisClient:
     async def connect(self):
         """Establish connection to Redis"""
         try:
-            self._client = redis.from_url(
+            self._client = instrument_redis(redis.from_url(
                 settings.REDIS_URL,
                 decode_responses=True,
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True,
                 health_check_interval=30
-            )
+            ))
             # Test connection
             await self._client.ping()
             logger.info(f"Successfully connected to Redis at {settings.REDIS_URL}")
@@ -87,6 +88,125 @@ class RedisClient:
 
         return await self._client.expire(key, ttl)
 
+    async def hget(self, key: str, field: str) -> Optional[str]:
+        """Get a field from a hash"""
+        if not self._client:
+            await self.connect()
+
+        return await self._client.hget(key, field)
+
+    async def hset(self, key: str, field: str, value: Any) -> int:
+        """Set a field in a hash"""
+        if not self._client:
+            await self.connect()
+
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+
+        return await self._client.hset(key, field, value)
+
+    async def hgetall(self, key: str) -> dict:
+        """Get all fields of a hash"""
+        if not self._client:
+            await self.connect()
+
+        return await self._client.hgetall(key)
+
+    async def mget(self, keys: list) -> list:
+        """Get the values of several keys in one round-trip"""
+        if not self._client:
+            await self.connect()
+
+        return await self._client.mget(keys)
+
+    async def spop(self, key: str, count: Optional[int] = None):
+        """Remove and return random members of a set"""
+        if not self._client:
+            await self.connect()
+
+        return await self._client.spop(key, count)
+
+    async def xadd_many(self, stream: str, entries: list, maxlen: Optional[int] = None) -> list:
+        """Append entries (dicts of field -> str) to a stream in one round-trip"""
+        if not self._client:
+            await self.connect()
+
+        pipe = self._client.pipeline(transaction=False)
+        for fields in entries:
+            pipe.xadd(stream, fields, maxlen=maxlen, approximate=True)
+        return await pipe.execute()
+
+    async def xgroup_create(self, stream: str, group: str) -> bool:
+        """Create a consumer group (and the stream); False if the group already exists"""
+        if not self._client:
+            await self.connect()
+
+        try:
+            await self._client.xgroup_create(stream, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            return False
+        return True
+
+    async def xreadgroup(self, stream: str, group: str, consumer: str, count: int, block_ms: int) -> list:
+        """Read new entries for a consumer; returns [(entry id, fields)]"""
+        if not self._client:
+            await self.connect()
+
+        response = await self._client.xreadgroup(group, consumer, {stream: ">"}, count=count, block=block_ms)
+        return response[0][1] if response else []
+
+    async def xautoclaim(self, stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> list:
+        """Take over entries left pending by other consumers for at least min_idle_ms"""
+        if not self._client:
+            await self.connect()
+
+        response = await self._client.xautoclaim(stream, group, consumer, min_idle_ms, start_id="0-0", count=count)
+        return [(entry_id, fields) for entry_id, fields in response[1] if fields]
+
+    async def xack_delete(self, stream: str, group: str, entry_ids: list) -> int:
+        """Acknowledge entries and remove them from the stream"""
+        if not self._client:
+            await self.connect()
+
+        pipe = self._client.pipeline(transaction=True)
+        pipe.xack(stream, group, *entry_ids)
+        pipe.xdel(stream, *entry_ids)
+        acked, _ = await pipe.execute()
+        return acked
+
+    async def pipeline(self, transaction: bool = False):
+        """Get a pipeline to send several commands in one round-trip"""
+        if not self._client:
+            await self.connect()
+
+        return self._client.pipeline(transaction=transaction)
+
+    async def register_script(self, script: str):
+        """Register a Lua script; the returned callable runs it via EVALSHA"""
+        if not self._client:
+            await self.connect()
+
+        return self._client.register_script(script)
+
+    async def publish(self, channel: str, message: Any) -> int:
+        """Publish a message to a pub/sub channel"""
+        if not self._client:
+            await self.connect()
+
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message)
+
+        return await self._client.publish(channel, message)
+
+    async def pubsub(self):
+        """Get a pub/sub handle bound to this connection pool"""
+        if not self._client:
+            await self.connect()
+
+        return self._client.pubsub()
+
 
 # Global Redis client instance
 redis_client = RedisClient()
\ No newline at end of file
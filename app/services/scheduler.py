@@ -1,20 +1,34 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
+import os
+import socket
+import time
+import uuid
 from typing import Optional
 
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
+from app.services.partitions import partition_manager
+from app.services.shared_state import shared_state
 from app.services.statistics import StatisticsService
 
 logger = logging.getLogger(__name__)
 
+LEADER_LEASE_KEY = "scheduler:leader"
+
 
 class StatsAggregationScheduler:
-    """Scheduler for automatic statistics aggregation"""
+    """
+    Scheduler for automatic statistics aggregation.
+    Started in every worker, but only the holder of the leader lease runs the jobs.
+    """
 
     def __init__(self):
         self.running = False
         self.task: Optional[asyncio.Task] = None
+        self._partitions_due = 0.0
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
 
     async def start(self):
         """Start the scheduler"""
@@ -34,34 +48,39 @@ class StatsAggregationScheduler:
                 await self.task
             except asyncio.CancelledError:
                 pass
+        if self.is_leader:
+            # Let another worker take over without waiting for the lease to expire
+            await shared_state.release_lease(LEADER_LEASE_KEY, self.instance_id)
+            self.is_leader = False
         logger.info("⏹️ Statistics aggregation scheduler stopped")
 
-    async def _run_scheduler(self):
-        """Main scheduler loop"""
-        last_hour_aggregation = None
-        last_day_aggregation = None
+    async def _hold_leadership(self) -> bool:
+        """Take or renew the leader lease; the lease outlives one loop iteration"""
+        is_leader = await shared_state.acquire_lease(
+            LEADER_LEASE_KEY, self.instance_id, settings.SCHEDULER_LEASE_TTL_SECONDS
+        )
+        if is_leader != self.is_leader:
+            logger.info(f"📊 Scheduler {self.instance_id} {'is now the leader' if is_leader else 'lost leadership'}")
+        self.is_leader = is_leader
+        return is_leader
 
+    async def _run_scheduler(self):
+        """
+        Main scheduler loop.
+        Aggregation is watermarked, so each run (including the first one after a restart)
+        covers exactly the periods closed since the previous run.
+        """
         while self.running:
             try:
-                current_time = datetime.now(timezone.utc)
-
-                # Hourly aggregation - run at the start of each hour
-                if (last_hour_aggregation is None or
-                        current_time.hour != last_hour_aggregation.hour):
-
-                    if last_hour_aggregation is not None:  # Skip first run
-                        await self._aggregate_hourly_stats()
-                    last_hour_aggregation = current_time
-
-                # Daily aggregation - run at 2 AM UTC
-                if (current_time.hour == 2 and
-                        (last_day_aggregation is None or
-                         current_time.date() != last_day_aggregation.date())):
+                if await self._hold_leadership():
+                    await self._aggregate_hourly_stats()
                     await self._aggregate_daily_stats()
-                    last_day_aggregation = current_time
 
-                # Check every 30 minutes
-                await asyncio.sleep(1800)  # 30 minutes
+                    if time.monotonic() >= self._partitions_due:
+                        await self._maintain_partitions()
+                        self._partitions_due = time.monotonic() + settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS
+
+                await asyncio.sleep(settings.STATS_AGGREGATION_INTERVAL_SECONDS)
 
             except asyncio.CancelledError:
                 break
@@ -70,46 +89,44 @@ class StatsAggregationScheduler:
                 await asyncio.sleep(300)  # 5 minutes on error
 
     async def _aggregate_hourly_stats(self):
-        """Aggregate statistics for the previous hour"""
+        """Aggregate statistics for every closed hour since the hourly watermark"""
         try:
             async with AsyncSessionLocal() as session:
                 stats_service = StatisticsService(session)
+                count = await stats_service.aggregate_incremental("hour")
 
-                # Aggregate for the previous hour
-                end_time = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
-                start_time = end_time - timedelta(hours=1)
-
-                count = await stats_service.aggregate_stats_for_period(
-                    period_type="hour",
-                    period_start=start_time,
-                    period_end=end_time
-                )
-
-                logger.info(f"✅ Hourly stats aggregated: {count} records for {start_time} - {end_time}")
+                if count:
+                    logger.info(f"✅ Hourly stats aggregated: {count} records")
 
         except Exception as e:
             logger.error(f"❌ Failed to aggregate hourly stats: {e}")
 
     async def _aggregate_daily_stats(self):
-        """Aggregate statistics for the previous day"""
+        """Aggregate statistics for every closed day since the daily watermark"""
         try:
             async with AsyncSessionLocal() as session:
                 stats_service = StatisticsService(session)
+                count = await stats_service.aggregate_incremental("day")
 
-                # Aggregate for yesterday
-                end_date = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-                start_date = end_date - timedelta(days=1)
+                if count:
+                    logger.info(f"✅ Daily stats aggregated: {count} records")
 
-                count = await stats_service.aggregate_stats_for_period(
-                    period_type="day",
-                    period_start=start_date,
-                    period_end=end_date
-                )
+        except Exception as e:
+            logger.error(f"❌ Failed to aggregate daily stats: {e}")
 
-                logger.info(f"✅ Daily stats aggregated: {count} records for {start_date.date()}")
+    async def _maintain_partitions(self):
+        """Create upcoming log/event partitions and drop the ones past retention"""
+        try:
+            summary = await partition_manager.run_maintenance()
+
+            for table, changes in summary.items():
+                if changes["created"]:
+                    logger.info(f"✅ {table}: created partitions {', '.join(changes['created'])}")
+                if changes["dropped"]:
+                    logger.info(f"🗑️ {table}: dropped expired partitions {', '.join(changes['dropped'])}")
 
         except Exception as e:
-            logger.error(f"❌ Failed to aggregate daily stats: {e}")
+            logger.error(f"❌ Failed to maintain partitions: {e}")
 
 
 # Global scheduler instance
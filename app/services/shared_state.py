@@ -0,0 +1,155 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.core.config import settings
+from app.core.log_throttle import warn_every
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Take a lease, or extend it when this owner already holds it
+# KEYS[1] = lease, ARGV[1] = owner, ARGV[2] = ttl seconds; returns 1 when held by owner
+ACQUIRE_LEASE_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+if current == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+RELEASE_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class MemoryStateBackend:
+    """
+    Process-local backend: a bounded LRU of values with expiry.
+    Only correct with a single worker process (tests, local development).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or settings.SHARED_STATE_MEMORY_MAX_ENTRIES
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, expires_at: float, value: Any):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._get_entry(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        self._put(key, time.monotonic() + ttl, value)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        entry = self._get_entry(name)
+        if entry is not None and entry[1] != owner:
+            return False
+        self._put(name, time.monotonic() + ttl, owner)
+        return True
+
+    async def release_lease(self, name: str, owner: str):
+        entry = self._get_entry(name)
+        if entry is not None and entry[1] == owner:
+            self._entries.pop(name, None)
+
+
+class RedisStateBackend:
+    """
+    Backend shared by every worker through Redis.
+
+    Values are stored as JSON. While Redis is unreachable, values fall back to a
+    process-local MemoryStateBackend rather than failing requests; leases are never granted from the fallback, so leader-only
+    jobs pause instead of running in every worker.
+    """
+
+    def __init__(self):
+        self.fallback = MemoryStateBackend()
+        self._scripts = {}
+        self._failures = 0
+
+    async def _script(self, source: str):
+        script = self._scripts.get(source)
+        if script is None:
+            script = self._scripts[source] = await redis_client.register_script(source)
+        return script
+
+    def _degraded(self, operation: str, error: Exception):
+        self._failures += 1
+        warn_every(logger, self._failures, f"Shared state Redis {operation} failed ({self._failures} so far): {error}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            value = await redis_client.get(key)
+        except Exception as e:
+            self._degraded("get", e)
+            return await self.fallback.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        try:
+            await redis_client.setex(key, ttl, json.dumps(value))
+        except Exception as e:
+            self._degraded("set", e)
+            await self.fallback.set(key, value, ttl)
+
+    async def delete(self, key: str):
+        await self.fallback.delete(key)
+        try:
+            await redis_client.delete(key)
+        except Exception as e:
+            self._degraded("delete", e)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        try:
+            script = await self._script(ACQUIRE_LEASE_LUA)
+            return bool(await script(keys=[name], args=[owner, ttl]))
+        except Exception as e:
+            self._degraded("lease", e)
+            return False
+
+    async def release_lease(self, name: str, owner: str):
+        try:
+            script = await self._script(RELEASE_LEASE_LUA)
+            await script(keys=[name], args=[owner])
+        except Exception as e:
+            self._degraded("lease release", e)
+
+
+def create_shared_state():
+    """Backend selected by SHARED_STATE_BACKEND ("redis" or "memory")"""
+    if settings.SHARED_STATE_BACKEND == "memory":
+        return MemoryStateBackend()
+    return RedisStateBackend()
+
+
+# Global shared state instance (small caches, leases)
+shared_state = create_shared_state()
@@ -1,5 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, cast, literal, literal_column, Integer, String
+from sqlalchemy.dialects.postgresql import insert
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta, timezone
 from uuid import UUID
@@ -7,7 +8,9 @@ from uuid import UUID
 from app.models.product_api_key import ProductAPILog
 from app.models.product_api_key import ProductAPIKey
 from app.models.prompt import Prompt
-from app.models.prompt_stats import PromptStats
+from app.models.prompt_stats import PromptStats, StatsAggregationWatermark
+from app.core.config import settings
+from app.services.latency_sketch import LatencySketch, LN_GAMMA
 
 
 class StatisticsService:
@@ -16,6 +19,48 @@ class StatisticsService:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @staticmethod
+    def _source_name():
+        """source_name from the logged request body, 'unknown' if absent"""
+        return func.coalesce(ProductAPILog.request_body["source_name"].as_string(), "unknown")
+
+    @staticmethod
+    def _totals_columns():
+        """Request count, successful count and latency sum/percentile for a set of logs"""
+        return (
+            func.count().label("total_requests"),
+            func.count().filter(ProductAPILog.is_success.is_(True)).label("successful_requests"),
+            func.coalesce(func.sum(ProductAPILog.latency_ms), 0).label("total_latency_ms"),
+            func.percentile_cont(0.95).within_group(ProductAPILog.latency_ms).label("p95_latency_ms"),
+        )
+
+    @staticmethod
+    def _totals_stats(row) -> Dict[str, Any]:
+        total_requests = row.total_requests or 0
+        successful_requests = row.successful_requests or 0
+        return {
+            "total_requests": total_requests,
+            "successful_requests": successful_requests,
+            "success_rate_percent": round((successful_requests / total_requests * 100) if total_requests > 0 else 0, 2),
+            "average_latency_ms": round(row.total_latency_ms / total_requests) if total_requests > 0 else 0,
+            "p95_latency_ms": round(row.p95_latency_ms) if row.p95_latency_ms is not None else 0,
+        }
+
+    async def _grouped_counts(self, group_column, *conditions) -> Dict[str, Dict[str, int]]:
+        """{group value: {"total", "successful"}} for the logs matching conditions"""
+        group = group_column.label("group_value")
+        result = await self.session.execute(
+            select(
+                group,
+                func.count().label("total"),
+                func.count().filter(ProductAPILog.is_success.is_(True)).label("successful"),
+            ).where(and_(*conditions)).group_by(group)
+        )
+        return {
+            row.group_value: {"total": row.total, "successful": row.successful}
+            for row in result
+        }
+
     async def get_prompt_version_stats(
             self,
             prompt_version_id: UUID,
@@ -24,48 +69,22 @@ class StatisticsService:
         """Get statistics for a specific prompt version over the last N hours"""
 
         cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-
-        # Base query for this version's logs
-        base_query = select(ProductAPILog).where(
-            and_(
-                ProductAPILog.prompt_version_id == prompt_version_id,
-                ProductAPILog.created_at >= cutoff_time
-            )
+        conditions = (
+            ProductAPILog.prompt_version_id == prompt_version_id,
+            ProductAPILog.created_at >= cutoff_time
         )
 
-        # Total requests
-        result = await self.session.execute(base_query)
-        logs = result.scalars().all()
-
-        total_requests = len(logs)
-        successful_requests = len([log for log in logs if log.is_success])
+        # Totals computed in SQL, no log rows are loaded
+        result = await self.session.execute(select(*self._totals_columns()).where(and_(*conditions)))
 
-        # Calculate metrics
         stats = {
             "prompt_version_id": str(prompt_version_id),
             "period_hours": hours,
-            "total_requests": total_requests,
-            "successful_requests": successful_requests,
-            "success_rate_percent": round((successful_requests / total_requests * 100) if total_requests > 0 else 0, 2),
-            "average_latency_ms": round(
-                sum(log.latency_ms or 0 for log in logs) / total_requests) if total_requests > 0 else 0,
+            **self._totals_stats(result.one()),
         }
 
         # Group by source (from request body)
-        source_stats = {}
-        for log in logs:
-            source_name = "unknown"
-            if log.request_body and isinstance(log.request_body, dict):
-                source_name = log.request_body.get("source_name", "unknown")
-
-            if source_name not in source_stats:
-                source_stats[source_name] = {"total": 0, "successful": 0}
-
-            source_stats[source_name]["total"] += 1
-            if log.is_success:
-                source_stats[source_name]["successful"] += 1
-
-        stats["requests_by_source"] = source_stats
+        stats["requests_by_source"] = await self._grouped_counts(self._source_name(), *conditions)
 
         return stats
 
@@ -87,21 +106,13 @@ class StatisticsService:
         if not prompt:
             return {"error": "Prompt not found"}
 
-        # No need to check versions - proceed directly to logs
-
-        # Base query for this prompt's logs (use prompt_id directly for better performance)
-        logs_query = select(ProductAPILog).where(
-            and_(
-                ProductAPILog.prompt_id == prompt_id,
-                ProductAPILog.created_at >= cutoff_time
-            )
+        # Filter on prompt_id directly for better performance
+        conditions = (
+            ProductAPILog.prompt_id == prompt_id,
+            ProductAPILog.created_at >= cutoff_time
         )
 
-        result = await self.session.execute(logs_query)
-        logs = result.scalars().all()
-
-        total_requests = len(logs)
-        successful_requests = len([log for log in logs if log.is_success])
+        result = await self.session.execute(select(*self._totals_columns()).where(and_(*conditions)))
 
         # Overall stats
         stats = {
@@ -109,65 +120,37 @@ class StatisticsService:
             "prompt_name": prompt.name,
             "prompt_slug": prompt.slug,
             "period_hours": hours,
-            "total_requests": total_requests,
-            "successful_requests": successful_requests,
-            "success_rate_percent": round((successful_requests / total_requests * 100) if total_requests > 0 else 0, 2),
-            "average_latency_ms": round(
-                sum(log.latency_ms or 0 for log in logs) / total_requests) if total_requests > 0 else 0,
+            **self._totals_stats(result.one()),
         }
 
         # Group by source (from request body)
-        source_stats = {}
-        for log in logs:
-            source_name = "unknown"
-            if log.request_body and isinstance(log.request_body, dict):
-                source_name = log.request_body.get("source_name", "unknown")
-
-            if source_name not in source_stats:
-                source_stats[source_name] = {"total": 0, "successful": 0}
-
-            source_stats[source_name]["total"] += 1
-            if log.is_success:
-                source_stats[source_name]["successful"] += 1
-
-        stats["requests_by_source"] = source_stats
-
-        # Version breakdown - simplified (group by version_id from logs)
-        version_stats = {}
-        for log in logs:
-            if log.prompt_version_id:
-                version_id = str(log.prompt_version_id)
-                if version_id not in version_stats:
-                    version_stats[version_id] = {
-                        "version_id": version_id,
-                        "total_requests": 0,
-                        "successful_requests": 0,
-                        "latencies": []
-                    }
-
-                version_stats[version_id]["total_requests"] += 1
-                if log.is_success:
-                    version_stats[version_id]["successful_requests"] += 1
-                if log.latency_ms:
-                    version_stats[version_id]["latencies"].append(log.latency_ms)
-
-        version_breakdown = []
-        for version_data in version_stats.values():
-            total = version_data["total_requests"]
-            successful = version_data["successful_requests"]
-            latencies = version_data["latencies"]
-
-            version_breakdown.append({
-                "version_id": version_data["version_id"],
-                "total_requests": total,
-                "successful_requests": successful,
-                "success_rate_percent": round((successful / total * 100) if total > 0 else 0, 2),
-                "average_latency_ms": round(sum(latencies) / len(latencies)) if latencies else 0,
-            })
+        stats["requests_by_source"] = await self._grouped_counts(self._source_name(), *conditions)
+
+        # Version breakdown (average over logs with a recorded latency)
+        result = await self.session.execute(
+            select(
+                ProductAPILog.prompt_version_id,
+                func.count().label("total_requests"),
+                func.count().filter(ProductAPILog.is_success.is_(True)).label("successful_requests"),
+                func.avg(func.nullif(ProductAPILog.latency_ms, 0)).label("average_latency_ms"),
+            ).where(
+                and_(*conditions, ProductAPILog.prompt_version_id.isnot(None))
+            ).group_by(
+                ProductAPILog.prompt_version_id
+            ).order_by(func.count().desc())
+        )
 
-        # Sort by total requests desc
-        version_breakdown.sort(key=lambda x: x["total_requests"], reverse=True)
-        stats["version_breakdown"] = version_breakdown
+        stats["version_breakdown"] = [
+            {
+                "version_id": str(row.prompt_version_id),
+                "total_requests": row.total_requests,
+                "successful_requests": row.successful_requests,
+                "success_rate_percent": round(
+                    (row.successful_requests / row.total_requests * 100) if row.total_requests > 0 else 0, 2),
+                "average_latency_ms": round(row.average_latency_ms) if row.average_latency_ms is not None else 0,
+            }
+            for row in result
+        ]
 
         return stats
 
@@ -234,60 +217,26 @@ class StatisticsService:
         if not api_key:
             return {"error": "API key not found"}
 
-        # Get logs for this API key
-        logs_query = select(ProductAPILog).where(
-            and_(
-                ProductAPILog.api_key_id == api_key_id,
-                ProductAPILog.created_at >= cutoff_time
-            )
+        conditions = (
+            ProductAPILog.api_key_id == api_key_id,
+            ProductAPILog.created_at >= cutoff_time
         )
 
-        result = await self.session.execute(logs_query)
-        logs = result.scalars().all()
-
-        total_requests = len(logs)
-        successful_requests = len([log for log in logs if log.is_success])
+        result = await self.session.execute(select(*self._totals_columns()).where(and_(*conditions)))
 
         stats = {
             "api_key_id": str(api_key_id),
             "api_key_name": api_key.name,
             "api_key_prefix": api_key.key_prefix,
             "period_hours": hours,
-            "total_requests": total_requests,
-            "successful_requests": successful_requests,
-            "success_rate_percent": round((successful_requests / total_requests * 100) if total_requests > 0 else 0, 2),
-            "average_latency_ms": round(
-                sum(log.latency_ms or 0 for log in logs) / total_requests) if total_requests > 0 else 0,
+            **self._totals_stats(result.one()),
         }
 
         # Group by endpoint
-        endpoint_stats = {}
-        for log in logs:
-            endpoint = log.endpoint
-            if endpoint not in endpoint_stats:
-                endpoint_stats[endpoint] = {"total": 0, "successful": 0}
-
-            endpoint_stats[endpoint]["total"] += 1
-            if log.is_success:
-                endpoint_stats[endpoint]["successful"] += 1
-
-        stats["requests_by_endpoint"] = endpoint_stats
+        stats["requests_by_endpoint"] = await self._grouped_counts(ProductAPILog.endpoint, *conditions)
 
         # Group by source (from request body)
-        source_stats = {}
-        for log in logs:
-            source_name = "unknown"
-            if log.request_body and isinstance(log.request_body, dict):
-                source_name = log.request_body.get("source_name", "unknown")
-
-            if source_name not in source_stats:
-                source_stats[source_name] = {"total": 0, "successful": 0}
-
-            source_stats[source_name]["total"] += 1
-            if log.is_success:
-                source_stats[source_name]["successful"] += 1
-
-        stats["requests_by_source"] = source_stats
+        stats["requests_by_source"] = await self._grouped_counts(self._source_name(), *conditions)
 
         return stats
 
@@ -325,63 +274,35 @@ class StatisticsService:
 
         cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
 
-        # Build base query
-        logs_query = select(ProductAPILog).where(
-            ProductAPILog.created_at >= cutoff_time
-        )
+        conditions = [ProductAPILog.created_at >= cutoff_time]
 
         # If user_id is provided, filter by user's API keys
         if user_id:
-            # Get user's API keys
-            api_keys_query = select(ProductAPIKey.id).where(ProductAPIKey.user_id == user_id)
-            result = await self.session.execute(api_keys_query)
-            user_api_key_ids = [row[0] for row in result.fetchall()]
-
-            if user_api_key_ids:
-                logs_query = logs_query.where(ProductAPILog.api_key_id.in_(user_api_key_ids))
-            else:
-                # User has no API keys
-                return {
-                    "period_hours": hours,
-                    "total_requests": 0,
-                    "successful_requests": 0,
-                    "success_rate_percent": 0,
-                    "average_latency_ms": 0,
-                    "unique_api_keys": 0,
-                    "unique_prompts": 0,
-                    "unique_users": 0
-                }
-
-        result = await self.session.execute(logs_query)
-        logs = result.scalars().all()
-
-        total_requests = len(logs)
-        successful_requests = len([log for log in logs if log.is_success])
-
-        # Unique counts
-        unique_api_keys = len(set(log.api_key_id for log in logs))
-        unique_prompts = len(set(log.prompt_id for log in logs if log.prompt_id))
-
-        # Get unique users count
-        unique_users = 0
-        if logs:
-            api_key_ids = list(set(log.api_key_id for log in logs))
-            users_query = select(func.count(func.distinct(ProductAPIKey.user_id))).where(
-                ProductAPIKey.id.in_(api_key_ids)
+            conditions.append(
+                ProductAPILog.api_key_id.in_(
+                    select(ProductAPIKey.id).where(ProductAPIKey.user_id == user_id)
+                )
             )
-            result = await self.session.execute(users_query)
-            unique_users = result.scalar() or 0
+
+        # One pass over the window; users come from the joined key owners
+        result = await self.session.execute(
+            select(
+                *self._totals_columns(),
+                func.count(func.distinct(ProductAPILog.api_key_id)).label("unique_api_keys"),
+                func.count(func.distinct(ProductAPILog.prompt_id)).label("unique_prompts"),
+                func.count(func.distinct(ProductAPIKey.user_id)).label("unique_users"),
+            ).select_from(ProductAPILog).outerjoin(
+                ProductAPIKey, ProductAPIKey.id == ProductAPILog.api_key_id
+            ).where(and_(*conditions))
+        )
+        row = result.one()
 
         stats = {
             "period_hours": hours,
-            "total_requests": total_requests,
-            "successful_requests": successful_requests,
-            "success_rate_percent": round((successful_requests / total_requests * 100) if total_requests > 0 else 0, 2),
-            "average_latency_ms": round(
-                sum(log.latency_ms or 0 for log in logs) / total_requests) if total_requests > 0 else 0,
-            "unique_api_keys": unique_api_keys,
-            "unique_prompts": unique_prompts,
-            "unique_users": unique_users
+            **self._totals_stats(row),
+            "unique_api_keys": row.unique_api_keys,
+            "unique_prompts": row.unique_prompts,
+            "unique_users": row.unique_users
         }
 
         return stats
@@ -402,6 +323,10 @@ class StatisticsService:
         if hours_24:
             # Get recent 24h stats (real-time from logs)
             result["last_24_hours"] = await self.get_prompt_stats(prompt_id, 24)
+            if "error" not in result["last_24_hours"]:
+                result["last_24_hours"]["latency_percentiles"] = await self.get_latency_percentiles(
+                    prompt_id, datetime.now(timezone.utc) - timedelta(hours=24)
+                )
 
         if all_time:
             # Get all-time stats from aggregated data + recent logs
@@ -412,8 +337,10 @@ class StatisticsService:
     async def _get_all_time_stats(self, prompt_id: UUID) -> Dict[str, Any]:
         """Get all-time statistics using cached aggregated data plus recent logs"""
 
-        # Get aggregated stats from PromptStats table
-        stats_query = select(PromptStats).where(PromptStats.prompt_id == prompt_id)
+        # Get aggregated stats from PromptStats table (hourly rows; daily rows cover the same logs)
+        stats_query = select(PromptStats).where(
+            and_(PromptStats.prompt_id == prompt_id, PromptStats.period_type == "hour")
+        )
         result = await self.session.execute(stats_query)
         cached_stats = result.scalars().all()
 
@@ -462,16 +389,193 @@ class StatisticsService:
             "success_rate_percent": round((overall_successful / overall_total * 100) if overall_total > 0 else 0, 2),
             "requests_by_source": source_totals,
             "requests_by_version": version_totals,
-            "status_breakdown": status_breakdown
+            "status_breakdown": status_breakdown,
+            "latency_percentiles": LatencySketch.merged(stat.latency_sketch for stat in cached_stats).percentiles()
         }
 
+    async def get_latency_percentiles(
+            self,
+            prompt_id: UUID,
+            start_time: datetime,
+            end_time: Optional[datetime] = None
+    ) -> Dict[str, Optional[int]]:
+        """
+        p50/p95/p99 latency of a prompt over any range, merged from the hourly PromptStats sketches.
+        Hours are included whole; logs after the hourly watermark (not aggregated yet) are
+        bucketed directly, which only touches the most recent minutes of logs.
+        """
+        end_time = end_time or datetime.now(timezone.utc)
+
+        result = await self.session.execute(
+            select(StatsAggregationWatermark.watermark).where(StatsAggregationWatermark.period_type == "hour")
+        )
+        watermark = result.scalar() or self._period_floor(start_time, "hour")
+        watermark = min(max(watermark, self._period_floor(start_time, "hour")), end_time)
+
+        result = await self.session.execute(
+            select(PromptStats.latency_sketch).where(
+                and_(
+                    PromptStats.prompt_id == prompt_id,
+                    PromptStats.period_type == "hour",
+                    PromptStats.period_start >= self._period_floor(start_time, "hour"),
+                    PromptStats.period_start < watermark
+                )
+            )
+        )
+        sketch = LatencySketch.merged(result.scalars())
+
+        # Not yet aggregated tail
+        bucket_index = cast(func.ceil(func.ln(ProductAPILog.latency_ms) / LN_GAMMA), Integer)
+        result = await self.session.execute(
+            select(bucket_index, func.count()).where(
+                and_(
+                    ProductAPILog.prompt_id == prompt_id,
+                    ProductAPILog.created_at >= watermark,
+                    ProductAPILog.created_at < end_time,
+                    ProductAPILog.latency_ms > 0
+                )
+            ).group_by(bucket_index)
+        )
+        sketch.merge({index: count for index, count in result})
+
+        return sketch.percentiles()
+
+    @staticmethod
+    def _period_floor(moment: datetime, period_type: str) -> datetime:
+        """Start of the UTC hour/day containing moment"""
+        moment = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        if period_type == "day":
+            moment = moment.replace(hour=0)
+        return moment
+
+    async def _upsert_period_stats(
+            self,
+            period_type: str,
+            period_start: datetime,
+            period_end: datetime
+    ) -> int:
+        """
+        Aggregate logs in [period_start, period_end) into one PromptStats row per
+        prompt/version/source/period with a single INSERT ... SELECT ... GROUP BY ... ON CONFLICT.
+        Periods are whole UTC hours/days, so re-running a range replaces its rows instead of adding to them.
+        """
+        # date_trunc on the UTC wall clock, independent of the session time zone
+        bucket = func.timezone("UTC", func.date_trunc(period_type, func.timezone("UTC", ProductAPILog.created_at)))
+        period_length = literal_column("interval '1 day'" if period_type == "day" else "interval '1 hour'")
+        source_name = func.left(self._source_name(), 100)
+        latency = func.nullif(ProductAPILog.latency_ms, 0)  # Logs without a latency don't count towards it
+        tracked_statuses = (200, 400, 401, 403, 404, 422, 500)
+
+        def status_count(code):
+            return func.count().filter(ProductAPILog.status_code == code)
+
+        log_filter = and_(
+            ProductAPILog.created_at >= period_start,
+            ProductAPILog.created_at < period_end,
+            ProductAPILog.prompt_id.isnot(None),  # Only logs with prompt tracking
+            ProductAPILog.prompt_version_id.isnot(None)
+        )
+        group_columns = (ProductAPILog.prompt_id, ProductAPILog.prompt_version_id, source_name, bucket)
+
+        aggregated = select(
+            ProductAPILog.prompt_id.label("prompt_id"),
+            ProductAPILog.prompt_version_id.label("prompt_version_id"),
+            source_name.label("source_name"),
+            bucket.label("period_start"),
+            func.count().label("total_requests"),
+            func.count().filter(ProductAPILog.is_success.is_(True)).label("successful_requests"),
+            func.count().filter(ProductAPILog.is_success.isnot(True)).label("failed_requests"),
+            *[status_count(code).label(f"status_{code}_count") for code in tracked_statuses],
+            func.count().filter(ProductAPILog.status_code.notin_(tracked_statuses)).label("status_other_count"),
+            func.coalesce(func.sum(latency), 0).label("total_latency_ms"),
+            func.coalesce(func.sum(latency) // func.nullif(func.count(latency), 0), 0).label("avg_latency_ms"),
+            func.min(latency).label("min_latency_ms"),
+            func.max(latency).label("max_latency_ms"),
+        ).where(log_filter).group_by(*group_columns).subquery("aggregated")
+
+        # Latency sketch per group: log-bucket counts folded into {"<bucket index>": count}
+        latency_bucket = cast(func.ceil(func.ln(ProductAPILog.latency_ms) / LN_GAMMA), Integer)
+        sketch_buckets = select(
+            ProductAPILog.prompt_id.label("prompt_id"),
+            ProductAPILog.prompt_version_id.label("prompt_version_id"),
+            source_name.label("source_name"),
+            bucket.label("period_start"),
+            latency_bucket.label("bucket_index"),
+            func.count().label("bucket_count"),
+        ).where(
+            and_(log_filter, ProductAPILog.latency_ms > 0)
+        ).group_by(*group_columns, latency_bucket).subquery("sketch_buckets")
+
+        sketches = select(
+            sketch_buckets.c.prompt_id,
+            sketch_buckets.c.prompt_version_id,
+            sketch_buckets.c.source_name,
+            sketch_buckets.c.period_start,
+            func.jsonb_object_agg(
+                cast(sketch_buckets.c.bucket_index, String), sketch_buckets.c.bucket_count
+            ).label("latency_sketch"),
+        ).group_by(
+            sketch_buckets.c.prompt_id,
+            sketch_buckets.c.prompt_version_id,
+            sketch_buckets.c.source_name,
+            sketch_buckets.c.period_start
+        ).subquery("sketches")
+
+        metric_columns = [
+            "total_requests", "successful_requests", "failed_requests",
+            "status_200_count", "status_400_count", "status_401_count", "status_403_count",
+            "status_404_count", "status_422_count", "status_500_count", "status_other_count",
+            "total_latency_ms", "avg_latency_ms", "min_latency_ms", "max_latency_ms",
+        ]
+        rows = select(
+            func.gen_random_uuid(),
+            aggregated.c.prompt_id,
+            aggregated.c.prompt_version_id,
+            aggregated.c.source_name,
+            literal(period_type),
+            aggregated.c.period_start,
+            aggregated.c.period_start + period_length,
+            *[aggregated.c[column] for column in metric_columns],
+            sketches.c.latency_sketch,
+        ).select_from(
+            aggregated.outerjoin(
+                sketches,
+                and_(
+                    sketches.c.prompt_id == aggregated.c.prompt_id,
+                    sketches.c.prompt_version_id == aggregated.c.prompt_version_id,
+                    sketches.c.source_name == aggregated.c.source_name,
+                    sketches.c.period_start == aggregated.c.period_start
+                )
+            )
+        )
+
+        stmt = insert(PromptStats).from_select(
+            ["id", "prompt_id", "prompt_version_id", "source_name", "period_type", "period_start", "period_end",
+             *metric_columns, "latency_sketch"],
+            rows
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="_prompt_stats_unique",
+            set_={
+                **{column: stmt.excluded[column] for column in metric_columns},
+                "latency_sketch": stmt.excluded.latency_sketch,
+                "updated_at": func.now(),
+            }
+        )
+
+        result = await self.session.execute(stmt)
+        return max(result.rowcount or 0, 0)
+
     async def aggregate_stats_for_period(
             self,
             period_type: str = "hour",  # "hour" or "day"
             period_start: datetime = None,
             period_end: datetime = None
     ) -> int:
-        """Aggregate raw logs into PromptStats table for a specific period"""
+        """
+        Aggregate raw logs into PromptStats table for a specific period.
+        The range may span several hours/days (e.g. historical backfills); it is still one statement.
+        """
 
         if not period_start:
             if period_type == "hour":
@@ -489,122 +593,61 @@ class StatisticsService:
             else:
                 period_end = period_start + timedelta(days=1)
 
-        # Get logs for this period
-        logs_query = select(ProductAPILog).where(
-            and_(
-                ProductAPILog.created_at >= period_start,
-                ProductAPILog.created_at < period_end,
-                ProductAPILog.prompt_id.isnot(None)  # Only logs with prompt tracking
-            )
-        )
+        aggregated_count = await self._upsert_period_stats(period_type, period_start, period_end)
 
-        result = await self.session.execute(logs_query)
-        logs = result.scalars().all()
+        await self.session.commit()
+        return aggregated_count
 
-        if not logs:
-            return 0
+    async def _initial_watermark(self, period_type: str) -> Optional[datetime]:
+        """Where aggregation starts without a persisted watermark: after existing stats, else at the first log"""
+        result = await self.session.execute(
+            select(func.max(PromptStats.period_end)).where(PromptStats.period_type == period_type)
+        )
+        last_aggregated = result.scalar()
+        if last_aggregated:
+            return last_aggregated
 
-        # Group by prompt_id, prompt_version_id, source_name
-        groups = {}
-        for log in logs:
-            source_name = "unknown"
-            if log.request_body and isinstance(log.request_body, dict):
-                source_name = log.request_body.get("source_name", "unknown")
-
-            key = (log.prompt_id, log.prompt_version_id, source_name)
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(log)
-
-        aggregated_count = 0
-
-        for (prompt_id, prompt_version_id, source_name), group_logs in groups.items():
-            # Calculate aggregated metrics
-            total_requests = len(group_logs)
-            successful_requests = len([l for l in group_logs if l.is_success])
-            failed_requests = total_requests - successful_requests
-
-            # Status code breakdown
-            status_counts = {
-                200: 0, 400: 0, 401: 0, 403: 0, 404: 0, 422: 0, 500: 0, "other": 0
-            }
+        result = await self.session.execute(
+            select(func.min(ProductAPILog.created_at)).where(ProductAPILog.prompt_id.isnot(None))
+        )
+        first_log = result.scalar()
+        return self._period_floor(first_log, period_type) if first_log else None
+
+    async def aggregate_incremental(self, period_type: str = "hour") -> int:
+        """
+        Aggregate every closed period since the persisted watermark and advance it.
+
+        The watermark row is locked for the duration, so concurrent runs (several workers,
+        the scheduler and a manual trigger) neither skip nor double count a period; after
+        downtime the first run catches up all missed periods in one statement.
+        Periods close STATS_AGGREGATION_LAG_SECONDS after their end so that log rows still
+        in the writer queue are included.
+        """
+        upper = self._period_floor(
+            datetime.now(timezone.utc) - timedelta(seconds=settings.STATS_AGGREGATION_LAG_SECONDS),
+            period_type
+        )
 
-            latencies = []
-            for log in group_logs:
-                status = log.status_code
-                if status in status_counts:
-                    status_counts[status] += 1
-                else:
-                    status_counts["other"] += 1
-
-                if log.latency_ms:
-                    latencies.append(log.latency_ms)
-
-            # Calculate latency stats
-            total_latency = sum(latencies)
-            avg_latency = int(total_latency / len(latencies)) if latencies else 0
-            min_latency = min(latencies) if latencies else None
-            max_latency = max(latencies) if latencies else None
-
-            # Check if stats already exist for this combination
-            existing_query = select(PromptStats).where(
-                and_(
-                    PromptStats.prompt_id == prompt_id,
-                    PromptStats.prompt_version_id == prompt_version_id,
-                    PromptStats.source_name == source_name,
-                    PromptStats.period_type == period_type,
-                    PromptStats.period_start == period_start
-                )
+        watermark_query = select(StatsAggregationWatermark).where(
+            StatsAggregationWatermark.period_type == period_type
+        ).with_for_update()
+
+        state = (await self.session.execute(watermark_query)).scalar_one_or_none()
+        if state is None:
+            initial = await self._initial_watermark(period_type) or upper
+            await self.session.execute(
+                insert(StatsAggregationWatermark)
+                .values(period_type=period_type, watermark=initial)
+                .on_conflict_do_nothing()
             )
-            existing_result = await self.session.execute(existing_query)
-            existing_stat = existing_result.scalar_one_or_none()
-
-            if existing_stat:
-                # Update existing record
-                existing_stat.total_requests = total_requests
-                existing_stat.successful_requests = successful_requests
-                existing_stat.failed_requests = failed_requests
-                existing_stat.status_200_count = status_counts[200]
-                existing_stat.status_400_count = status_counts[400]
-                existing_stat.status_401_count = status_counts[401]
-                existing_stat.status_403_count = status_counts[403]
-                existing_stat.status_404_count = status_counts[404]
-                existing_stat.status_422_count = status_counts[422]
-                existing_stat.status_500_count = status_counts[500]
-                existing_stat.status_other_count = status_counts["other"]
-                existing_stat.total_latency_ms = total_latency
-                existing_stat.avg_latency_ms = avg_latency
-                existing_stat.min_latency_ms = min_latency
-                existing_stat.max_latency_ms = max_latency
-                existing_stat.updated_at = datetime.now(timezone.utc)
-            else:
-                # Create new record
-                stat = PromptStats(
-                    prompt_id=prompt_id,
-                    prompt_version_id=prompt_version_id,
-                    source_name=source_name,
-                    period_type=period_type,
-                    period_start=period_start,
-                    period_end=period_end,
-                    total_requests=total_requests,
-                    successful_requests=successful_requests,
-                    failed_requests=failed_requests,
-                    status_200_count=status_counts[200],
-                    status_400_count=status_counts[400],
-                    status_401_count=status_counts[401],
-                    status_403_count=status_counts[403],
-                    status_404_count=status_counts[404],
-                    status_422_count=status_counts[422],
-                    status_500_count=status_counts[500],
-                    status_other_count=status_counts["other"],
-                    total_latency_ms=total_latency,
-                    avg_latency_ms=avg_latency,
-                    min_latency_ms=min_latency,
-                    max_latency_ms=max_latency
-                )
-                self.session.add(stat)
+            state = (await self.session.execute(watermark_query)).scalar_one()
+
+        if state.watermark >= upper:
+            await self.session.commit()
+            return 0
 
-            aggregated_count += 1
+        aggregated_count = await self._upsert_period_stats(period_type, state.watermark, upper)
+        state.watermark = upper
 
         await self.session.commit()
         return aggregated_count
@@ -0,0 +1,77 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import secrets
+from typing import Optional, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+
+# Signed trace ids: "tr1_" + base64url(workspace id | prompt id | version id | nonce | mac).
+# They carry the context of the get-prompt call that issued them, so events can be
+# attributed without a lookup (92 characters, within the String(100) trace_id
+# columns). Older "evt_" ids are resolved through Redis.
+TRACE_ID_PREFIX = "tr1_"
+
+NONCE_BYTES = 6  # Keeps ids unique per call; events are deduplicated by trace id
+MAC_BYTES = 12
+PAYLOAD_BYTES = 16 * 3 + NONCE_BYTES
+
+# (workspace_id, prompt_id, prompt_version_id)
+TraceContext = Tuple[UUID, UUID, UUID]
+
+
+def _key() -> bytes:
+    secret = settings.TRACE_ID_SECRET or settings.SECRET_KEY
+    # Derived so the raw secret is never used for a second purpose
+    return hashlib.sha256(b"xr2-trace-id:" + secret.encode()).digest()
+
+
+def _mac(key: bytes, payload: bytes) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+class TraceIdCodec:
+    """Encodes and verifies signed trace ids; the derived key is computed once"""
+
+    def __init__(self):
+        self._key: Optional[bytes] = None
+
+    @property
+    def key(self) -> bytes:
+        if self._key is None:
+            self._key = _key()
+        return self._key
+
+    def generate(self, workspace_id: UUID, prompt_id: UUID, prompt_version_id: UUID) -> str:
+        """Trace id for one get-prompt response"""
+        payload = workspace_id.bytes + prompt_id.bytes + prompt_version_id.bytes + secrets.token_bytes(NONCE_BYTES)
+        token = base64.urlsafe_b64encode(payload + _mac(self.key, payload)).rstrip(b"=")
+        return TRACE_ID_PREFIX + token.decode()
+
+    def decode(self, trace_id: str) -> Optional[TraceContext]:
+        """Context of a signed trace id, or None if it is not one or its signature does not match"""
+        if not trace_id.startswith(TRACE_ID_PREFIX):
+            return None
+
+        token = trace_id[len(TRACE_ID_PREFIX):]
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        except (binascii.Error, ValueError):
+            return None
+        if len(raw) != PAYLOAD_BYTES + MAC_BYTES:
+            return None
+
+        payload, mac = raw[:PAYLOAD_BYTES], raw[PAYLOAD_BYTES:]
+        if not hmac.compare_digest(mac, _mac(self.key, payload)):
+            return None
+        return UUID(bytes=payload[0:16]), UUID(bytes=payload[16:32]), UUID(bytes=payload[32:48])
+
+
+def is_signed_trace_id(trace_id: str) -> bool:
+    return trace_id.startswith(TRACE_ID_PREFIX)
+
+
+# Global trace id codec instance
+trace_id_codec = TraceIdCodec()
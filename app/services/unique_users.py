@@ -0,0 +1,164 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from redis.client import NEVER_DECODE
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.analytics import PromptMetricsHourly
+from app.services.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis keeps the registers of recently active buckets; prompt_metrics_hourly keeps them for good
+HLL_TTL_SECONDS = 86400
+
+# Registers loaded into Redis per PFMERGE when counting over many buckets
+MERGE_CHUNK_SIZE = 500
+
+# (workspace_id, prompt_id, prompt_version_id, hour_bucket), as in update_hourly_metrics
+Bucket = Tuple[UUID, Optional[UUID], Optional[UUID], datetime]
+
+
+def hll_key(bucket: Bucket) -> str:
+    workspace_id, prompt_id, prompt_version_id, hour_bucket = bucket
+    return f"unique_users_hll:{workspace_id}:{prompt_id}:{prompt_version_id}:{hour_bucket.isoformat()}"
+
+
+async def _load_registers(db: AsyncSession, buckets: List[Bucket]) -> Dict[Bucket, bytes]:
+    """Stored registers of the given buckets (those that have any)"""
+    result = await db.execute(
+        select(
+            PromptMetricsHourly.workspace_id,
+            PromptMetricsHourly.prompt_id,
+            PromptMetricsHourly.prompt_version_id,
+            PromptMetricsHourly.hour_bucket,
+            PromptMetricsHourly.unique_users_hll
+        ).where(
+            or_(*(
+                and_(
+                    PromptMetricsHourly.workspace_id == workspace_id,
+                    # prompt / version ids may be NULL (events without a resolved version)
+                    PromptMetricsHourly.prompt_id.is_not_distinct_from(prompt_id),
+                    PromptMetricsHourly.prompt_version_id.is_not_distinct_from(prompt_version_id),
+                    PromptMetricsHourly.hour_bucket == hour_bucket
+                )
+                for workspace_id, prompt_id, prompt_version_id, hour_bucket in buckets
+            )),
+            PromptMetricsHourly.unique_users_hll.isnot(None)
+        )
+    )
+    return {tuple(row[:4]): row[4] for row in result}
+
+
+async def add_unique_users(db: AsyncSession, bucket_users: Dict[Bucket, Set[str]]) -> Dict[Bucket, Tuple[int, bytes]]:
+    """
+    PFADD each bucket's user ids into its HyperLogLog and return
+    {bucket: (estimated unique users, registers)} to store with the bucket's row.
+
+    A bucket whose Redis key has expired (or was never in this Redis) is first
+    seeded from the registers stored in the database, so counts keep accumulating
+    across restarts and late events. Three round-trips per batch, whatever its size.
+    """
+    buckets = list(bucket_users)
+    keys = [hll_key(bucket) for bucket in buckets]
+
+    pipe = await redis_client.pipeline()
+    for key in keys:
+        pipe.exists(key)
+    present = await pipe.execute()
+
+    missing = [bucket for bucket, exists in zip(buckets, present) if not exists]
+    stored = await _load_registers(db, missing) if missing else {}
+
+    pipe = await redis_client.pipeline()
+    for bucket, key in zip(buckets, keys):
+        if bucket in stored:
+            # NX: another worker may have seeded and added to it in the meantime
+            pipe.set(key, stored[bucket], ex=HLL_TTL_SECONDS, nx=True)
+        pipe.pfadd(key, *bucket_users[bucket])
+        pipe.expire(key, HLL_TTL_SECONDS)
+        pipe.pfcount(key)
+        # Registers are binary; skip the client's UTF-8 decoding
+        pipe.execute_command("GET", key, **{NEVER_DECODE: []})
+    results = await pipe.execute()
+
+    counted = {}
+    position = 0
+    for bucket in buckets:
+        if bucket in stored:
+            position += 1
+        counted[bucket] = (results[position + 2], results[position + 3])
+        position += 4
+    return counted
+
+
+async def count_unique_users(
+        db: AsyncSession,
+        workspace_id: UUID,
+        start_date: datetime,
+        end_date: datetime,
+        prompt_id: Optional[UUID] = None,
+        prompt_version_id: Optional[UUID] = None
+) -> int:
+    """
+    Distinct users over every hourly bucket in the range, by PFMERGE of the stored
+    registers (summing unique_users would count a returning user once per hour).
+    Buckets recorded before registers were stored only contribute their count.
+    """
+    conditions = [
+        PromptMetricsHourly.workspace_id == workspace_id,
+        PromptMetricsHourly.hour_bucket >= start_date,
+        PromptMetricsHourly.hour_bucket <= end_date,
+    ]
+    if prompt_id is not None:
+        conditions.append(PromptMetricsHourly.prompt_id == prompt_id)
+    if prompt_version_id is not None:
+        conditions.append(PromptMetricsHourly.prompt_version_id == prompt_version_id)
+
+    totals = await db.execute(
+        select(
+            func.coalesce(func.sum(PromptMetricsHourly.unique_users), 0),
+            func.coalesce(
+                func.sum(PromptMetricsHourly.unique_users).filter(PromptMetricsHourly.unique_users_hll.is_(None)), 0
+            )
+        ).where(and_(*conditions))
+    )
+    summed_users, legacy_users = (int(value) for value in totals.one())
+
+    merged_key = f"unique_users_hll:merge:{uuid.uuid4().hex}"
+    registers = await db.stream(
+        select(PromptMetricsHourly.unique_users_hll)
+        .where(and_(*conditions, PromptMetricsHourly.unique_users_hll.isnot(None)))
+        .execution_options(yield_per=MERGE_CHUNK_SIZE)
+    )
+    try:
+        merged = False
+        async for chunk in registers.partitions():
+            chunk_keys = [f"{merged_key}:{index}" for index in range(len(chunk))]
+            pipe = await redis_client.pipeline()
+            for key, (value,) in zip(chunk_keys, chunk):
+                pipe.set(key, value, ex=60)
+            pipe.pfmerge(merged_key, *chunk_keys)
+            pipe.expire(merged_key, 60)
+            pipe.delete(*chunk_keys)
+            await pipe.execute()
+            merged = True
+
+        if not merged:
+            return legacy_users
+
+        pipe = await redis_client.pipeline()
+        pipe.pfcount(merged_key)
+        pipe.delete(merged_key)
+        count, _ = await pipe.execute()
+        return legacy_users + count
+    except Exception as e:
+        # Without Redis, fall back to the per-hour sum (an upper bound)
+        logger.warning(f"Unique user merge failed, using the sum of hourly counts: {e}")
+        return summed_users
+    finally:
+        await registers.close()
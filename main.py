@@ -3,7 +3,6 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from contextlib import asynccontextmanager
 import uvicorn
 from dotenv import load_dotenv
@@ -14,13 +13,16 @@ logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.pool').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.dialects').setLevel(logging.WARNING)
 
-from app.core.database import init_db
-from app.core.config import settings
+from app.core.database import init_db, bootstrap_db, DB_INITIALIZED_ENV
+from app.core.config import settings, get_worker_count
 from app.api import router as api_router
 from app.middleware.product_logging import ProductAPILoggingMiddleware
 from app.middleware.rate_limiter import RateLimitMiddleware, rate_limiter
 from app.middleware.swagger_auth import SwaggerAuthMiddleware
 from app.middleware.security import SecurityMiddleware
+from app.middleware.proxy_headers import ProxyHeadersMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.core.metrics import metrics_response
 from fastapi import Form
 from fastapi.responses import RedirectResponse, Response
 
@@ -57,12 +59,52 @@ async def lifespan(app: FastAPI):
     # Startup events
     from app.core.database import engine
     from app.services.scheduler import scheduler
+    from app.services.prompt_cache import prompt_cache
+    from app.services.event_registry import event_registry
+    from app.core.product_auth import api_key_usage_recorder, principal_cache
+    from app.services.quota import quota_engine
+    from app.services.api_log_writer import api_log_writer
+    from app.services.event_pipeline import event_pipeline
+    from app.services.alerts import alert_evaluator
+    from app.services.ab_testing import ab_test_assigner
+    from app.core.metrics import metrics_sampler
     
     app.state.db_engine = engine
-    await init_db()
+    if not os.environ.get(DB_INITIALIZED_ENV):
+        await init_db()
     
     # Start statistics aggregation scheduler
     await scheduler.start()
+
+    # Listen for prompt cache invalidations from other workers
+    await prompt_cache.start()
+
+    # Listen for event definition changes from other workers
+    await event_registry.start()
+
+    # Listen for API key / user / limits changes from other workers
+    await principal_cache.start()
+
+    # Batch writer for API key usage statistics
+    await api_key_usage_recorder.start()
+
+    # Write daily quota counters back to user_api_usage
+    await quota_engine.start()
+
+    # Background writer for product API request logs
+    await api_log_writer.start()
+
+    # Consume stored product events in micro-batches (hourly metrics, alerts)
+    await event_pipeline.start()
+
+    # Evaluate alert thresholds against rolling outcome counters (one worker at a time)
+    await alert_evaluator.start()
+
+    # Reconcile A/B test counters to ab_tests
+    await ab_test_assigner.start()
+
+    # Keep DB pool / log queue gauges of this worker current for /metrics
+    await metrics_sampler.start()
     
     print("✅ Database initialized")
     print("📊 Statistics scheduler started")
@@ -76,6 +118,16 @@ async def lifespan(app: FastAPI):
     # Shutdown events
     from app.services.scheduler import scheduler
     await scheduler.stop()
+    await prompt_cache.stop()
+    await event_registry.stop()
+    await principal_cache.stop()
+    await api_key_usage_recorder.stop()
+    await quota_engine.stop()
+    await ab_test_assigner.stop()
+    await api_log_writer.stop()
+    await event_pipeline.stop()
+    await alert_evaluator.stop()
+    await metrics_sampler.stop()
     print("🛑 Shutting down xR2 Platform")
 
 
@@ -96,7 +148,7 @@ app.add_middleware(SecurityMiddleware)
 
 app.add_middleware(
     TrustedHostMiddleware,
-    allowed_hosts=["xr2.uk", "www.xr2.uk", "localhost", "127.0.0.1"]
+    allowed_hosts=["xr2.uk", "www.xr2.uk", "localhost", "127.0.0.1", "app"]  # "app": Prometheus scrapes app:8000
 )
 
 # Add Swagger authentication middleware (protects admin docs)
@@ -110,18 +162,6 @@ app.add_middleware(ProductAPILoggingMiddleware)
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
 
 # Proxy headers middleware - Trust nginx proxy headers
-from starlette.middleware.base import BaseHTTPMiddleware
-
-class ProxyHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # Trust X-Forwarded-* headers from nginx
-        if "x-forwarded-proto" in request.headers:
-            request.scope["scheme"] = request.headers["x-forwarded-proto"]
-        if "x-forwarded-host" in request.headers:
-            request.scope["server"] = (request.headers["x-forwarded-host"], 443 if request.scope.get("scheme") == "https" else 80)
-        response = await call_next(request)
-        return response
-
 app.add_middleware(ProxyHeadersMiddleware)
 
 # Add CORS middleware
@@ -131,8 +171,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Trace-Id"],
 )
 
+# Request latency histograms (outermost, so it times the whole middleware stack)
+app.add_middleware(MetricsMiddleware)
+
 
 # Include only public API routes (2 methods) in main app
 app.include_router(public_api_router, prefix="/api/v1")
@@ -234,7 +278,27 @@ async def health_check():
     return {"status": "healthy", "service": "xR2 Platform"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (merged across workers when PROMETHEUS_MULTIPROC_DIR is set)"""
+    return metrics_response()
+
+
 if __name__ == "__main__":
+    workers = get_worker_count()
+    if settings.WORKER_PROCESSES != 1 and settings.SHARED_STATE_BACKEND == "memory":
+        print("⚠️ SHARED_STATE_BACKEND=memory cannot be shared between workers, starting a single worker")
+    if workers > 1 and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Workers inherit the environment; each writes its metrics here for /metrics to merge
+        import tempfile
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="xr2-metrics-")
+
+    if workers > 1:
+        # Create tables, partitions and the admin user once, before the workers start
+        import asyncio
+        asyncio.run(bootstrap_db())
+        os.environ[DB_INITIALIZED_ENV] = "1"
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
@@ -243,4 +307,5 @@ if __name__ == "__main__":
         proxy_headers=True,
         forwarded_allow_ips="*",
         reload=False,
+        workers=workers,
     )
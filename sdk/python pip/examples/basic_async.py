@@ -3,8 +3,7 @@ from xr2_sdk.client import AsyncxR2Client
 
 
 async def main() -> None:
-    client = AsyncxR2Client(api_key="YOUR_API_KEY")
-    try:
+    async with AsyncxR2Client(api_key="YOUR_API_KEY") as client:
         # Get a prompt
         prompt = await client.get_prompt(slug="welcome")
         print("Prompt version:", prompt.version_number)
@@ -22,8 +21,6 @@ async def main() -> None:
             fields={"user_id": "u-1"},
         )
         print("Event recorded:", event.event_id)
-    finally:
-        await client.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Throughput of AsyncxR2Client at many concurrent get_prompt calls
+
+Starts a local stub of POST /api/v1/get-prompt (HTTP/1.1 keep-alive, a fixed
+per-request latency, and optionally a share of 429 responses with Retry-After),
+then fires --requests concurrent get_prompt calls for each --concurrency limit
+(max_concurrency of a client with --connections pooled connections; 0 = no limit).
+For every run it reports wall time, calls per second, latency percentiles,
+retried and failed calls, and the worst event loop lag seen meanwhile: a blocking
+sleep in the retry path shows up there directly.
+
+Client and stub share one process (and event loop), so the numbers include the
+stub's own CPU time; they compare settings rather than measure a real server.
+
+Usage:
+    python examples/benchmark_async.py [--requests=1000] [--connections=20] [--concurrency=20,100,0]
+                                       [--latency-ms=5] [--error-rate=0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from xr2_sdk.client import AsyncxR2Client
+
+PROMPT = json.dumps({
+    "slug": "welcome",
+    "source_name": "python_sdk",
+    "version_number": 3,
+    "status": "production",
+    "system_prompt": "You are a helpful assistant.",
+    "user_prompt": "Greet {name} and offer help with {topic}.",
+    "variables": [{"name": "name"}, {"name": "topic"}],
+    "model_config": {"model": "gpt-4o-mini", "temperature": 0.2},
+    "created_at": "2024-01-01T00:00:00",
+    "updated_at": "2024-01-01T00:00:00",
+    "trace_id": "tr1_benchmark",
+}).encode()
+
+
+class StubServer:
+    def __init__(self, latency: float, error_rate: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.rejected = 0
+        self.rng = random.Random(42)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                if self.rng.random() < self.error_rate:
+                    self.rejected += 1
+                    writer.write(b"HTTP/1.1 429 Too Many Requests\r\nRetry-After: 0\r\nContent-Length: 0\r\n\r\n")
+                else:
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        b"Content-Length: " + str(len(PROMPT)).encode() + b"\r\n\r\n" + PROMPT
+                    )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def loop_lag(stop: asyncio.Event, worst: list):
+    """Worst delay of a 10 ms sleep while the run is in progress"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst[0] = max(worst[0], time.perf_counter() - started - 0.01)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(base_url: str, stub: StubServer, requests: int, connections: int, concurrency: int):
+    latencies = []
+    failures = []
+
+    async def call(client: AsyncxR2Client):
+        started = time.perf_counter()
+        try:
+            await client.get_prompt(slug="welcome")
+        except Exception as e:
+            failures.append(type(e).__name__)
+            return
+        latencies.append(time.perf_counter() - started)
+
+    stub.requests = stub.rejected = 0
+    stop, worst = asyncio.Event(), [0.0]
+    async with AsyncxR2Client("benchmark", base_url=base_url, max_connections=connections,
+                              max_concurrency=concurrency, backoff_factor=0.01, cache_size=0) as client:
+        lag = asyncio.create_task(loop_lag(stop, worst))
+        started = time.perf_counter()
+        await asyncio.gather(*(call(client) for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await lag
+
+    print(
+        f"{concurrency or 'none':>12}{elapsed:>9.2f}s{len(latencies) / elapsed:>11.0f}"
+        f"{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.99) * 1000:>9.1f}"
+        f"{stub.rejected:>9}{len(failures):>8}{worst[0] * 1000:>12.1f}"
+        + (f"  ({', '.join(sorted(set(failures)))})" if failures else "")
+    )
+
+
+async def main_async(args):
+    stub = StubServer(args.latency_ms / 1000, args.error_rate)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    print(f"{args.requests} concurrent get_prompt calls over {args.connections} connections, "
+          f"{args.latency_ms} ms stub latency, {args.error_rate:.0%} answered 429 (Retry-After: 0)")
+    print(f"{'concurrency':>12}{'wall':>10}{'calls/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'retried':>9}{'failed':>8}{'loop lag ms':>12}")
+    async with server:
+        for concurrency in args.concurrency:
+            await run(f"http://127.0.0.1:{port}", stub, args.requests, args.connections, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AsyncxR2Client against a local stub server")
+    parser.add_argument("--requests", type=int, default=1000, help="Concurrent get_prompt calls per run")
+    parser.add_argument("--connections", type=int, default=20, help="max_connections of the client")
+    parser.add_argument("--concurrency", default="20,100,0", help="Comma-separated max_concurrency values (0 = unlimited)")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Stub server latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="Share of requests answered with 429")
+    args = parser.parse_args()
+    args.concurrency = [int(value) for value in args.concurrency.split(",")]
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from .models import PromptContentResponse
+
+
+class CachedPrompt:
+    __slots__ = ("response", "etag", "fetched_at")
+
+    def __init__(self, response: PromptContentResponse, etag: Optional[str], fetched_at: float) -> None:
+        self.response = response
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class PromptCache:
+    """
+    Bounded LRU of get_prompt responses, keyed by (slug, version_number, status).
+
+    An entry younger than ``ttl`` seconds is fresh and served without a request.
+    For ``stale_ttl`` more seconds it is served as is while the client revalidates
+    it in the background; after that the caller waits for the revalidation. Every
+    revalidation is a conditional request, so an unchanged prompt costs a 304.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 0.0, stale_ttl: float = 0.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, CachedPrompt]" = OrderedDict()
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, key: Hashable) -> Optional[CachedPrompt]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, response: PromptContentResponse, etag: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = CachedPrompt(response, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def is_fresh(self, entry: CachedPrompt) -> bool:
+        return time.monotonic() - entry.fetched_at < self.ttl
+
+    def is_servable_stale(self, entry: CachedPrompt) -> bool:
+        return time.monotonic() - entry.fetched_at < self.ttl + self.stale_ttl
+
+    def begin_refresh(self, key: Hashable) -> bool:
+        """Claim the background revalidation of key; False if one is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: Hashable) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
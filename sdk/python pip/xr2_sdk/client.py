@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-import time
-from typing import Optional
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterable, List, Optional, Set, Tuple, Union
 
 import httpx
 import requests
@@ -10,14 +15,137 @@ from urllib3.util.retry import Retry
 
 from .models import (
     GetPromptRequest,
+    GetPromptsRequest,
+    GetPromptsResponse,
     PromptContentResponse,
+    PromptSelector,
     EventRequest,
     EventResponse,
+    EventBatchRequest,
+    EventBatchResponse,
 )
+from .cache import CachedPrompt, PromptCache
 from .config import BASE_URL
+from .sink import (
+    AsyncEventSink,
+    EventSink,
+    DEFAULT_EVENT_BATCH_SIZE,
+    DEFAULT_EVENT_BUFFER_SIZE,
+    DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS,
+)
 
 
 DEFAULT_TIMEOUT_SECONDS = 10.0
+# httpx scans its whole pool for every queued request, so a small pool with callers
+# queued in front of it (max_concurrency) outperforms a large one; see examples/benchmark_async.py
+DEFAULT_MAX_CONNECTIONS = 20
+MAX_BACKOFF_SECONDS = 30.0  # Also the longest Retry-After the async client waits for
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+MAX_EVENTS_PER_BATCH = 1000  # Server limit of POST /api/v1/events/batch
+MAX_PROMPTS_PER_CALL = 100  # Server limit of POST /api/v1/get-prompts
+# Servers without POST /api/v1/events/batch get buffered events as concurrent single posts
+BATCH_MISSING_STATUSES = (404, 405)
+EVENT_FALLBACK_CONCURRENCY = 8
+DEFAULT_PROMPT_CACHE_SIZE = 256
+TRACE_ID_HEADER = "X-Trace-Id"  # Fresh trace ID of every get-prompt response, including 304s
+
+
+def _conditional_headers(headers: dict, entry: Optional[CachedPrompt]) -> dict:
+    if entry is None or not entry.etag:
+        return headers
+    return {**headers, "If-None-Match": entry.etag}
+
+
+def _prompt_from_response(resp, entry: Optional[CachedPrompt]) -> Tuple[PromptContentResponse, Optional[str]]:
+    """(prompt, etag) of a get-prompt response; a 304 reuses the cached body with the new trace ID"""
+    if resp.status_code == 304 and entry is not None:
+        trace_id = resp.headers.get(TRACE_ID_HEADER, entry.response.trace_id)
+        return entry.response.model_copy(update={"trace_id": trace_id}), resp.headers.get("ETag", entry.etag)
+    resp.raise_for_status()
+    return PromptContentResponse.model_validate(resp.json()), resp.headers.get("ETag")
+
+
+def _event_batches(events: Iterable[Union[EventRequest, dict]]) -> List[List[EventRequest]]:
+    batch: List[EventRequest] = []
+    batches = [batch]
+    for event in events:
+        if len(batch) == MAX_EVENTS_PER_BATCH:
+            batch = []
+            batches.append(batch)
+        batch.append(event if isinstance(event, EventRequest) else EventRequest.model_validate(event))
+    return batches if batch else []
+
+
+def _merge_batch_responses(responses: List[EventBatchResponse]) -> EventBatchResponse:
+    """Combine the responses of consecutive batches; result indexes refer to the full event list"""
+    merged = responses[0].model_copy(deep=True)
+    offset = MAX_EVENTS_PER_BATCH
+    for response in responses[1:]:
+        merged.created += response.created
+        merged.duplicates += response.duplicates
+        merged.errors += response.errors
+        merged.timestamp = response.timestamp
+        for result in response.results:
+            merged.results.append(result.model_copy(update={"index": result.index + offset}))
+        offset += MAX_EVENTS_PER_BATCH
+    return merged
+
+
+def _prompt_batches(prompts: Iterable[Union[PromptSelector, dict, str]]) -> List[List[PromptSelector]]:
+    selectors = []
+    for prompt in prompts:
+        if isinstance(prompt, str):
+            prompt = PromptSelector(slug=prompt)
+        elif not isinstance(prompt, PromptSelector):
+            prompt = PromptSelector.model_validate(prompt)
+        selectors.append(prompt)
+    return [selectors[start:start + MAX_PROMPTS_PER_CALL] for start in range(0, len(selectors), MAX_PROMPTS_PER_CALL)]
+
+
+def _merge_prompt_responses(responses: List[GetPromptsResponse]) -> GetPromptsResponse:
+    """Combine the responses of consecutive calls; result indexes refer to the full selector list"""
+    merged = responses[0].model_copy(deep=True)
+    offset = MAX_PROMPTS_PER_CALL
+    for response in responses[1:]:
+        merged.resolved += response.resolved
+        merged.errors += response.errors
+        for result in response.results:
+            merged.results.append(result.model_copy(update={"index": result.index + offset}))
+        offset += MAX_PROMPTS_PER_CALL
+    return merged
+
+
+def _retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """Delay asked for by a Retry-After header (delta-seconds or HTTP-date), if any"""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _backoff_seconds(backoff_factor: float, attempt: int) -> float:
+    """Exponential backoff with full jitter, so clients that failed together do not retry together"""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, backoff_factor * (2 ** attempt)))
+
+
+def _is_rejection(status_code: int) -> bool:
+    """A 4xx answer to an event that sending it again will not change"""
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+def _event_payload(trace_id: str, event_name: str, category: str, fields: Optional[dict]) -> dict:
+    return {"trace_id": trace_id, "event_name": event_name, "category": category, "fields": fields or {}}
 
 
 def _build_requests_session(total_retries: int, backoff_factor: float) -> requests.Session:
@@ -27,7 +155,7 @@ def _build_requests_session(total_retries: int, backoff_factor: float) -> reques
         read=total_retries,
         connect=total_retries,
         backoff_factor=backoff_factor,
-        status_forcelist=(429, 500, 502, 503, 504),
+        status_forcelist=RETRY_STATUSES,
         allowed_methods=("HEAD", "GET", "POST", "PUT", "DELETE", "OPTIONS", "TRACE", "PATCH"),
         raise_on_status=False,
     )
@@ -42,18 +170,41 @@ class xR2Client:
         self,
         api_key: str,
         *,
+        base_url: Optional[str] = None,
         timeout: float = DEFAULT_TIMEOUT_SECONDS,
         total_retries: int = 3,
         backoff_factor: float = 0.5,
+        cache_size: int = DEFAULT_PROMPT_CACHE_SIZE,
+        cache_ttl: float = 0.0,
+        cache_stale_ttl: float = 0.0,
+        event_batch_size: int = DEFAULT_EVENT_BATCH_SIZE,
+        event_flush_interval: float = DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS,
+        event_buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
     ) -> None:
-        self.base_url = BASE_URL.rstrip("/")
+        self.base_url = (base_url or BASE_URL).rstrip("/")
         self.timeout = timeout
         self._session = _build_requests_session(total_retries, backoff_factor)
+        self.prompt_cache = PromptCache(cache_size, cache_ttl, cache_stale_ttl)
         self._headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
+        self._event_sink_options = (min(event_batch_size, MAX_EVENTS_PER_BATCH), event_flush_interval, event_buffer_size)
+        self.event_sink: Optional[EventSink] = None  # Started by the first emit_event()
+        self._events_batch_missing = False
+
+    def __enter__(self) -> "xR2Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Send the events still buffered by emit_event(), then release the connections"""
+        if self.event_sink is not None:
+            self.event_sink.close()
+        self._session.close()
 
     def get_prompt(
         self,
@@ -69,10 +220,52 @@ class xR2Client:
             status=status,
         ).model_dump(exclude_none=True)
 
+        key = (slug, version_number, status)
+        entry = self.prompt_cache.get(key)
+        if entry is not None:
+            if self.prompt_cache.is_fresh(entry):
+                return entry.response
+            if self.prompt_cache.is_servable_stale(entry):
+                if self.prompt_cache.begin_refresh(key):
+                    threading.Thread(target=self._refresh_prompt, args=(key, payload, entry), daemon=True).start()
+                return entry.response
+        return self._fetch_prompt(key, payload, entry)
+
+    def _fetch_prompt(self, key: tuple, payload: dict, entry: Optional[CachedPrompt]) -> PromptContentResponse:
         url = f"{self.base_url}/api/v1/get-prompt"
-        resp = self._session.post(url, json=payload, headers=self._headers, timeout=self.timeout)
-        resp.raise_for_status()
-        return PromptContentResponse.model_validate(resp.json())
+        headers = _conditional_headers(self._headers, entry)
+        resp = self._session.post(url, json=payload, headers=headers, timeout=self.timeout)
+        prompt, etag = _prompt_from_response(resp, entry)
+        self.prompt_cache.put(key, prompt, etag)
+        return prompt
+
+    def _refresh_prompt(self, key: tuple, payload: dict, entry: CachedPrompt) -> None:
+        try:
+            self._fetch_prompt(key, payload, entry)
+        except Exception:
+            # Keep serving the stale entry; a caller revalidates in line once it is too old
+            pass
+        finally:
+            self.prompt_cache.end_refresh(key)
+
+    def get_prompts(self, prompts: Iterable[Union[PromptSelector, dict, str]]) -> GetPromptsResponse:
+        """
+        Resolve many prompts (slugs, dicts with get_prompt's arguments or PromptSelector)
+        with one call per 100. A prompt that fails does not raise: its result carries
+        the status code and error instead.
+        """
+        batches = _prompt_batches(prompts)
+        if not batches:
+            raise ValueError("get_prompts() needs at least one prompt")
+
+        url = f"{self.base_url}/api/v1/get-prompts"
+        responses = []
+        for batch in batches:
+            payload = GetPromptsRequest(source_name="python_sdk", prompts=batch).model_dump(exclude_none=True)
+            resp = self._session.post(url, json=payload, headers=self._headers, timeout=self.timeout)
+            resp.raise_for_status()
+            responses.append(GetPromptsResponse.model_validate(resp.json()))
+        return _merge_prompt_responses(responses)
 
     def track_event(
         self,
@@ -94,43 +287,166 @@ class xR2Client:
         resp.raise_for_status()
         return EventResponse.model_validate(resp.json())
 
+    def track_events(self, events: Iterable[Union[EventRequest, dict]]) -> EventBatchResponse:
+        """Send many events (EventRequest or dicts with the track_event fields) with one call per 1000"""
+        batches = _event_batches(events)
+        if not batches:
+            raise ValueError("track_events() needs at least one event")
+
+        url = f"{self.base_url}/api/v1/events/batch"
+        responses = []
+        for batch in batches:
+            payload = EventBatchRequest(events=batch).model_dump()
+            resp = self._session.post(url, json=payload, headers=self._headers, timeout=self.timeout)
+            resp.raise_for_status()
+            responses.append(EventBatchResponse.model_validate(resp.json()))
+        return _merge_batch_responses(responses)
+
+    def emit_event(
+        self,
+        *,
+        trace_id: str,
+        event_name: str,
+        category: str,
+        fields: Optional[dict] = None,
+    ) -> None:
+        """
+        Queue an event for a background thread to send in batches, instead of a
+        request per event like track_event(). Returns at once; delivery failures
+        are retried and never raised here (see ``event_sink.stats()``).
+        """
+        sink = self.event_sink
+        if sink is None:
+            sink = self.event_sink = EventSink(self._deliver_events, *self._event_sink_options)
+        sink.emit(_event_payload(trace_id, event_name, category, fields))
+
+    def flush_events(self) -> None:
+        """Send the events buffered by emit_event() now"""
+        if self.event_sink is not None:
+            self.event_sink.flush()
+
+    def _deliver_events(self, events: List[dict]) -> int:
+        if not self._events_batch_missing:
+            url = f"{self.base_url}/api/v1/events/batch"
+            resp = self._session.post(url, json={"events": events}, headers=self._headers, timeout=self.timeout)
+            if resp.status_code in BATCH_MISSING_STATUSES:
+                self._events_batch_missing = True
+            elif _is_rejection(resp.status_code):
+                return len(events)
+            else:
+                resp.raise_for_status()
+                return resp.json()["errors"]
+        with ThreadPoolExecutor(EVENT_FALLBACK_CONCURRENCY) as pool:
+            return sum(pool.map(self._deliver_event, events))
+
+    def _deliver_event(self, event: dict) -> int:
+        url = f"{self.base_url}/api/v1/events"
+        resp = self._session.post(url, json=event, headers=self._headers, timeout=self.timeout)
+        if _is_rejection(resp.status_code):
+            return 1
+        resp.raise_for_status()
+        return 0
+
 
 class AsyncxR2Client:
+    """
+    Non-blocking client for asyncio services.
+
+    All calls share one pooled httpx.AsyncClient (HTTP/2 when the server offers it)
+    and at most ``max_concurrency`` of them (default: ``max_connections``, 0 for no
+    limit) are in flight at once; the others wait their turn. Connection errors
+    and 429/5xx responses are retried after ``asyncio.sleep`` with jittered exponential
+    backoff, or after the server's Retry-After. Use it as ``async with AsyncxR2Client(...)``
+    or call ``aclose()`` when done.
+    """
+
     def __init__(
         self,
         api_key: str,
         *,
+        base_url: Optional[str] = None,
         timeout: float = DEFAULT_TIMEOUT_SECONDS,
         total_retries: int = 3,
         backoff_factor: float = 0.5,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_concurrency: Optional[int] = None,
+        http2: bool = True,
+        http_client: Optional[httpx.AsyncClient] = None,
+        cache_size: int = DEFAULT_PROMPT_CACHE_SIZE,
+        cache_ttl: float = 0.0,
+        cache_stale_ttl: float = 0.0,
+        event_batch_size: int = DEFAULT_EVENT_BATCH_SIZE,
+        event_flush_interval: float = DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS,
+        event_buffer_size: int = DEFAULT_EVENT_BUFFER_SIZE,
     ) -> None:
-        self.base_url = BASE_URL.rstrip("/")
+        self.base_url = (base_url or BASE_URL).rstrip("/")
         self.timeout = timeout
         self._headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
             "Accept": "application/json",
         }
-        # httpx has no built-in urllib3 Retry; implement lightweight retry
         self._total_retries = total_retries
         self._backoff_factor = backoff_factor
-        self._client = httpx.AsyncClient(timeout=self.timeout)
+        # A client passed in stays owned by the caller and is not closed by aclose()
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._max_concurrency = max_connections if max_concurrency is None else max_concurrency
+        self._limiter: Optional[asyncio.Semaphore] = None  # Created in the event loop that uses it
+        self.prompt_cache = PromptCache(cache_size, cache_ttl, cache_stale_ttl)
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._event_sink_options = (min(event_batch_size, MAX_EVENTS_PER_BATCH), event_flush_interval, event_buffer_size)
+        self.event_sink: Optional[AsyncEventSink] = None  # Started by the first emit_event()
+        self._events_batch_missing = False
+
+    async def __aenter__(self) -> "AsyncxR2Client":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
 
     async def aclose(self) -> None:
-        await self._client.aclose()
+        if self.event_sink is not None:
+            await self.event_sink.aclose()
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def _send(self, url: str, json: dict, headers: dict) -> httpx.Response:
+        if not self._max_concurrency:
+            return await self._client.post(url, json=json, headers=headers)
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self._max_concurrency)
+        async with self._limiter:
+            return await self._client.post(url, json=json, headers=headers)
 
-    async def _post_with_retry(self, url: str, json: dict) -> httpx.Response:
+    async def _post_with_retry(self, url: str, json: dict, headers: Optional[dict] = None) -> httpx.Response:
+        headers = headers or self._headers
         attempt = 0
         while True:
             try:
-                return await self._client.post(url, json=json, headers=self._headers)
-            except (httpx.ConnectError, httpx.ReadError, httpx.RemoteProtocolError, httpx.HTTPStatusError) as exc:
+                resp = await self._send(url, json, headers)
+            except RETRY_EXCEPTIONS:
                 if attempt >= self._total_retries:
                     raise
-                sleep_s = self._backoff_factor * (2 ** attempt)
-                await httpx.AsyncClient().aclose()  # no-op to satisfy lint; not used
-                time.sleep(sleep_s)
-                attempt += 1
+                delay = _backoff_seconds(self._backoff_factor, attempt)
+            else:
+                if resp.status_code not in RETRY_STATUSES or attempt >= self._total_retries:
+                    return resp
+                retry_after = _retry_after_seconds(resp)
+                if retry_after is not None and retry_after > MAX_BACKOFF_SECONDS:
+                    # E.g. the daily quota: not worth holding the call open for
+                    return resp
+                delay = retry_after if retry_after is not None else _backoff_seconds(self._backoff_factor, attempt)
+                await resp.aclose()
+            # The limiter slot is free while waiting, so other calls proceed
+            await asyncio.sleep(delay)
+            attempt += 1
 
     async def get_prompt(
         self,
@@ -146,10 +462,53 @@ class AsyncxR2Client:
             status=status,
         ).model_dump(exclude_none=True)
 
+        key = (slug, version_number, status)
+        entry = self.prompt_cache.get(key)
+        if entry is not None:
+            if self.prompt_cache.is_fresh(entry):
+                return entry.response
+            if self.prompt_cache.is_servable_stale(entry):
+                if self.prompt_cache.begin_refresh(key):
+                    task = asyncio.create_task(self._refresh_prompt(key, payload, entry))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_tasks.discard)
+                return entry.response
+        return await self._fetch_prompt(key, payload, entry)
+
+    async def _fetch_prompt(self, key: tuple, payload: dict, entry: Optional[CachedPrompt]) -> PromptContentResponse:
         url = f"{self.base_url}/api/v1/get-prompt"
-        resp = await self._post_with_retry(url, json=payload)
-        resp.raise_for_status()
-        return PromptContentResponse.model_validate(resp.json())
+        resp = await self._post_with_retry(url, json=payload, headers=_conditional_headers(self._headers, entry))
+        prompt, etag = _prompt_from_response(resp, entry)
+        self.prompt_cache.put(key, prompt, etag)
+        return prompt
+
+    async def _refresh_prompt(self, key: tuple, payload: dict, entry: CachedPrompt) -> None:
+        try:
+            await self._fetch_prompt(key, payload, entry)
+        except Exception:
+            # Keep serving the stale entry; a caller revalidates in line once it is too old
+            pass
+        finally:
+            self.prompt_cache.end_refresh(key)
+
+    async def get_prompts(self, prompts: Iterable[Union[PromptSelector, dict, str]]) -> GetPromptsResponse:
+        """
+        Resolve many prompts (slugs, dicts with get_prompt's arguments or PromptSelector)
+        with one call per 100. A prompt that fails does not raise: its result carries
+        the status code and error instead.
+        """
+        batches = _prompt_batches(prompts)
+        if not batches:
+            raise ValueError("get_prompts() needs at least one prompt")
+
+        url = f"{self.base_url}/api/v1/get-prompts"
+        responses = []
+        for batch in batches:
+            payload = GetPromptsRequest(source_name="python_sdk", prompts=batch).model_dump(exclude_none=True)
+            resp = await self._post_with_retry(url, json=payload)
+            resp.raise_for_status()
+            responses.append(GetPromptsResponse.model_validate(resp.json()))
+        return _merge_prompt_responses(responses)
 
     async def track_event(
         self,
@@ -171,4 +530,81 @@ class AsyncxR2Client:
         resp.raise_for_status()
         return EventResponse.model_validate(resp.json())
 
+    async def track_events(self, events: Iterable[Union[EventRequest, dict]]) -> EventBatchResponse:
+        """Send many events (EventRequest or dicts with the track_event fields) with one call per 1000"""
+        batches = _event_batches(events)
+        if not batches:
+            raise ValueError("track_events() needs at least one event")
+
+        url = f"{self.base_url}/api/v1/events/batch"
+        responses = []
+        for batch in batches:
+            payload = EventBatchRequest(events=batch).model_dump()
+            resp = await self._post_with_retry(url, json=payload)
+            resp.raise_for_status()
+            responses.append(EventBatchResponse.model_validate(resp.json()))
+        return _merge_batch_responses(responses)
+
+    def emit_event(
+        self,
+        *,
+        trace_id: str,
+        event_name: str,
+        category: str,
+        fields: Optional[dict] = None,
+    ) -> None:
+        """
+        Queue an event for a background task to send in batches, instead of a
+        request per event like track_event(). A plain call that returns at once;
+        delivery failures are retried and never raised here (see ``event_sink.stats()``).
+        """
+        sink = self.event_sink
+        if sink is None:
+            sink = self.event_sink = AsyncEventSink(
+                self._deliver_events, self._deliver_events_at_exit, *self._event_sink_options
+            )
+        sink.emit(_event_payload(trace_id, event_name, category, fields))
+
+    async def flush_events(self) -> None:
+        """Send the events buffered by emit_event() now"""
+        if self.event_sink is not None:
+            await self.event_sink.flush()
+
+    async def _deliver_events(self, events: List[dict]) -> int:
+        if not self._events_batch_missing:
+            resp = await self._post_with_retry(f"{self.base_url}/api/v1/events/batch", json={"events": events})
+            if resp.status_code in BATCH_MISSING_STATUSES:
+                self._events_batch_missing = True
+            elif _is_rejection(resp.status_code):
+                return len(events)
+            else:
+                resp.raise_for_status()
+                return resp.json()["errors"]
+        # Concurrency is capped by the client's limiter
+        return sum(await asyncio.gather(*(self._deliver_event(event) for event in events)))
+
+    async def _deliver_event(self, event: dict) -> int:
+        resp = await self._post_with_retry(f"{self.base_url}/api/v1/events", json=event)
+        if _is_rejection(resp.status_code):
+            return 1
+        resp.raise_for_status()
+        return 0
 
+    def _deliver_events_at_exit(self, events: List[dict]) -> int:
+        """Blocking delivery for the atexit hook, once the event loop and its connections are gone"""
+        with httpx.Client(timeout=self.timeout) as client:
+            if not self._events_batch_missing:
+                resp = client.post(f"{self.base_url}/api/v1/events/batch", json={"events": events}, headers=self._headers)
+                if resp.status_code not in BATCH_MISSING_STATUSES:
+                    if _is_rejection(resp.status_code):
+                        return len(events)
+                    resp.raise_for_status()
+                    return resp.json()["errors"]
+            rejected = 0
+            for event in events:
+                resp = client.post(f"{self.base_url}/api/v1/events", json=event, headers=self._headers)
+                if _is_rejection(resp.status_code):
+                    rejected += 1
+                else:
+                    resp.raise_for_status()
+            return rejected
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class GetPromptRequest(BaseModel):
@@ -13,6 +13,9 @@ class GetPromptRequest(BaseModel):
 
 
 class PromptContentResponse(BaseModel):
+    # "model_config" is reserved by pydantic, so the LLM settings are exposed as llm_config
+    model_config = ConfigDict(populate_by_name=True)
+
     slug: str
     source_name: str
     version_number: int
@@ -23,7 +26,7 @@ class PromptContentResponse(BaseModel):
     assistant_prompt: Optional[str] = None
 
     variables: List[Dict[str, Any]] = Field(default_factory=list)
-    model_config: Dict[str, Any] = Field(default_factory=dict)
+    llm_config: Dict[str, Any] = Field(default_factory=dict, alias="model_config")
     deployed_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
@@ -34,6 +37,31 @@ class PromptContentResponse(BaseModel):
     ab_test_variant: Optional[str] = None
 
 
+class PromptSelector(BaseModel):
+    slug: str
+    version_number: Optional[int] = None
+    status: Optional[str] = Field(default=None, description="draft | testing | production | inactive | deprecated")
+
+
+class GetPromptsRequest(BaseModel):
+    source_name: str
+    prompts: List[PromptSelector]
+
+
+class PromptResult(BaseModel):
+    index: int
+    slug: str
+    status_code: int = Field(description="200, or the status get_prompt() would have failed with")
+    prompt: Optional[PromptContentResponse] = None
+    error: Optional[Any] = None
+
+
+class GetPromptsResponse(BaseModel):
+    resolved: int
+    errors: int
+    results: List[PromptResult] = Field(default_factory=list)
+
+
 class EventRequest(BaseModel):
     trace_id: str
     event_name: str
@@ -51,3 +79,24 @@ class EventResponse(BaseModel):
     is_duplicate: bool
 
 
+class EventBatchRequest(BaseModel):
+    events: List[EventRequest]
+
+
+class EventBatchItemResult(BaseModel):
+    index: int
+    status: str = Field(description="created | duplicate | error")
+    event_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EventBatchResponse(BaseModel):
+    status: str
+    created: int
+    duplicates: int
+    errors: int
+    timestamp: str
+    results: List[EventBatchItemResult] = Field(default_factory=list)
+
+
+
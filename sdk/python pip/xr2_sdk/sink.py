@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("xr2_sdk")
+
+DEFAULT_EVENT_BATCH_SIZE = 500
+DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS = 1.0
+DEFAULT_EVENT_BUFFER_SIZE = 10000
+DEFAULT_CLOSE_TIMEOUT_SECONDS = 5.0
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+# Delivers a batch of events (dicts with the track_event fields); returns how many
+# the server rejected, raises when the batch should be retried
+Deliver = Callable[[List[dict]], int]
+AsyncDeliver = Callable[[List[dict]], Awaitable[int]]
+
+
+def _warn_every(count: int, message: str, every: int = 1000) -> None:
+    """Warn on the 1st and then every `every`-th occurrence (count is the running total)"""
+    if count == 1 or count % every == 0:
+        logger.warning(message)
+
+
+def _retry_delay(failures: int) -> float:
+    return random.uniform(0, min(MAX_RETRY_DELAY_SECONDS, 0.5 * (2 ** failures)))
+
+
+class _EventBuffer:
+    """
+    Bounded in-memory queue shared by the sinks. Events that do not fit (including
+    failed batches put back while the buffer refilled) are dropped and counted.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_size: int) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._events: deque = deque()
+        self._lock = threading.Lock()
+        self._failures = 0
+
+        # Counters
+        self.emitted = 0
+        self.sent = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _add(self, event: dict) -> bool:
+        """Queue an event; True when a full batch is waiting"""
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+                _warn_every(self.dropped, f"xR2 event buffer full, dropped {self.dropped} events so far")
+                return False
+            self._events.append(event)
+            self.emitted += 1
+            return len(self._events) >= self.batch_size
+
+    def _take(self) -> List[dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._events))
+            return [self._events.popleft() for _ in range(count)]
+
+    def _delivered(self, batch: List[dict], rejected: int) -> None:
+        self._failures = 0
+        self.sent += len(batch) - rejected
+        self.rejected += rejected
+
+    def _requeue(self, batch: List[dict], error: Exception) -> float:
+        """Put a failed batch back in front; returns how long to wait before the next attempt"""
+        self.failed_flushes += 1
+        self._failures += 1
+        with self._lock:
+            keep = batch[:max(0, self.max_size - len(self._events))]
+            self._events.extendleft(reversed(keep))
+            self.dropped += len(batch) - len(keep)
+        _warn_every(self.failed_flushes, f"xR2 event flush failed ({self.failed_flushes} so far), will retry: {error}", 100)
+        return _retry_delay(self._failures)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "buffered": len(self._events),
+            "emitted": self.emitted,
+            "sent": self.sent,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+class EventSink(_EventBuffer):
+    """
+    Buffered event delivery for xR2Client.
+
+    emit() only appends to the buffer; a daemon thread sends batches every
+    flush_interval seconds, or as soon as batch_size events are waiting. Failed
+    batches are retried with jittered backoff (the server deduplicates
+    trace_id + event_name + category, so a batch sent twice is counted once).
+    Whatever is still buffered is flushed by close(), and at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        batch_size: int = DEFAULT_EVENT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS,
+        max_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+    ) -> None:
+        super().__init__(batch_size, flush_interval, max_size)
+        self._deliver = deliver
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.running = False
+
+    def emit(self, event: dict) -> None:
+        if self._add(event):
+            self._wake.set()
+        if self._thread is None:
+            self._start()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.running = True
+            self._thread = threading.Thread(target=self._run, name="xr2-event-sink", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while self.running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            delay = self.flush()
+            if delay:
+                # Backing off; close() still interrupts the wait
+                self._wake.wait(delay)
+
+    def flush(self, deadline: Optional[float] = None) -> float:
+        """Send everything buffered; returns the backoff delay if a batch failed, else 0"""
+        with self._flush_lock:
+            while len(self) and (deadline is None or time.monotonic() < deadline):
+                batch = self._take()
+                try:
+                    self._delivered(batch, self._deliver(batch))
+                except Exception as e:
+                    return self._requeue(batch, e)
+        return 0.0
+
+    def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS) -> None:
+        """Stop the thread and flush what is left, giving up after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        self.running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            atexit.unregister(self.close)
+        self.flush(deadline)
+        if len(self):
+            logger.warning(f"xR2 event sink closed with {len(self)} events not sent")
+
+
+class AsyncEventSink(_EventBuffer):
+    """
+    Buffered event delivery for AsyncxR2Client: the same batching and retries as
+    EventSink, run by an asyncio task of the loop that first emits. aclose() sends
+    what is left; events still buffered when the interpreter exits without it are
+    posted synchronously by an atexit hook.
+    """
+
+    def __init__(
+        self,
+        deliver: AsyncDeliver,
+        deliver_at_exit: Deliver,
+        batch_size: int = DEFAULT_EVENT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_EVENT_FLUSH_INTERVAL_SECONDS,
+        max_size: int = DEFAULT_EVENT_BUFFER_SIZE,
+    ) -> None:
+        super().__init__(batch_size, flush_interval, max_size)
+        self._deliver = deliver
+        self._deliver_at_exit = deliver_at_exit
+        self._wake: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+        atexit.register(self._flush_at_exit)
+
+    def emit(self, event: dict) -> None:
+        full = self._add(event)
+        if self.task is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Outside a loop: kept until aclose() or exit
+                return
+            self.running = True
+            self._wake = asyncio.Event()
+            self.task = loop.create_task(self._run())
+        if full:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while self.running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            delay = await self.flush()
+            if delay:
+                await asyncio.sleep(delay)
+
+    async def flush(self) -> float:
+        """Send everything buffered; returns the backoff delay if a batch failed, else 0"""
+        while len(self):
+            batch = self._take()
+            try:
+                self._delivered(batch, await self._deliver(batch))
+            except Exception as e:
+                return self._requeue(batch, e)
+        return 0.0
+
+    async def aclose(self, timeout: float = DEFAULT_CLOSE_TIMEOUT_SECONDS) -> None:
+        """Stop the task and flush what is left, giving up after timeout seconds"""
+        self.running = False
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        atexit.unregister(self._flush_at_exit)
+        if len(self):
+            logger.warning(f"xR2 event sink closed with {len(self)} events not sent")
+
+    def _flush_at_exit(self) -> None:
+        deadline = time.monotonic() + DEFAULT_CLOSE_TIMEOUT_SECONDS
+        while len(self) and time.monotonic() < deadline:
+            batch = self._take()
+            try:
+                self._delivered(batch, self._deliver_at_exit(batch))
+            except Exception as e:
+                self._requeue(batch, e)
+                break
+        if len(self):
+            logger.warning(f"xR2 event sink exited with {len(self)} events not sent")